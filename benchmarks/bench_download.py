@@ -0,0 +1,114 @@
+"""Loopback download benchmark: zero-copy sendfile vs. chunked reads.
+
+Serves one generated file from EQS's Flask app on 127.0.0.1 and downloads it
+from a separate client process, so the CPU time measured here is the server's
+alone.
+
+    python benchmarks/bench_download.py --size-mib 1024 --rounds 5 --json results.json
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import eqs_server
+
+# Runs in its own process: fetches one URL and discards the body
+CLIENT_SCRIPT = r"""
+import socket, sys, time
+port, path = int(sys.argv[1]), sys.argv[2]
+sock = socket.create_connection(("127.0.0.1", port))
+start = time.perf_counter()
+sock.sendall(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+buf = bytearray(1 << 20)
+total = 0
+while True:
+    n = sock.recv_into(buf)
+    if not n:
+        break
+    total += n
+print(total, time.perf_counter() - start)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_payload(size_bytes):
+    fd, path = tempfile.mkstemp(prefix="eqs_bench_", suffix=".bin")
+    block = os.urandom(1 << 20)
+    with os.fdopen(fd, "wb") as f:
+        remaining = size_bytes
+        while remaining > 0:
+            f.write(block[:min(len(block), remaining)])
+            remaining -= len(block)
+    return path
+
+
+def share_file(path):
+    eqs_server.shared_registry.clear()
+    item, = eqs_server.shared_registry.add_many([(os.path.basename(path), os.path.getsize(path), path, None, None)])
+    return f"/download/{item['uid']}"
+
+
+def run_round(port, url_path):
+    cpu_before = time.process_time()
+    out = subprocess.run([sys.executable, "-c", CLIENT_SCRIPT, str(port), url_path],
+                         check=True, capture_output=True, text=True).stdout
+    server_cpu = time.process_time() - cpu_before
+    received, elapsed = out.split()
+    return int(received), float(elapsed), server_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mib", type=int, default=512, help="size of the served file (default: 512)")
+    parser.add_argument("--rounds", type=int, default=3, help="downloads per mode (default: 3)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    payload = make_payload(args.size_mib * 1024 * 1024)
+    try:
+        url_path = share_file(payload)
+        port = free_port()
+        server = eqs_server.ServerThread(eqs_server.flask_app, host="127.0.0.1", port=port)
+        server.start()
+        run_round(port, url_path) # Warm the page cache before measuring
+
+        results = []
+        for mode, use_sendfile in (("sendfile", True), ("chunked", False)):
+            eqs_server.DOWNLOAD_USE_SENDFILE = use_sendfile
+            rounds = [run_round(port, url_path) for _ in range(args.rounds)]
+            gib = rounds[0][0] / (1 << 30)
+            results.append({
+                'mode': mode,
+                'bytes': rounds[0][0],
+                'throughput_mib_s': statistics.median(r[0] / r[1] / (1 << 20) for r in rounds),
+                'server_cpu_s_per_gib': statistics.median(r[2] / gib for r in rounds),
+            })
+        server.shutdown()
+    finally:
+        os.remove(payload)
+        eqs_server.remove_upload_staging_dirs()
+
+    print(f"{'mode':<10} {'throughput':>14} {'server CPU':>14}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['throughput_mib_s']:>9.1f} MiB/s {r['server_cpu_s_per_gib']:>9.3f} s/GiB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'benchmark': 'download', 'size_mib': args.size_mib, 'rounds': args.rounds, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Index page benchmark: GET / and GET /api/files latency as the share grows.
+
+For each share size the registry is filled with synthetic entries (the files need not exist to
+be listed) and the server is asked for:
+
+  cold   GET / right after the share changed, so the page is rebuilt
+  warm   GET / with the cached page
+  304    GET / with If-None-Match, answered from the cached ETag
+  api    GET /api/files, first page
+
+    python benchmarks/bench_index.py --sizes 1000,10000,100000 --rounds 20 --json results.json
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import time
+
+from common import start_server
+import eqs_server
+
+
+def fill_registry(count):
+    eqs_server.shared_registry.clear()
+    eqs_server.shared_registry.add_many(
+        (f"file_{i:06d}.dat", i * 1024, os.path.join(os.sep, "bench", f"dir_{i // 1000:03d}", f"file_{i:06d}.dat"),
+         f"bench/dir_{i // 1000:03d}/file_{i:06d}.dat", None)
+        for i in range(count)
+    )
+
+
+def timed_get(conn, path, headers=None):
+    start = time.perf_counter()
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    return time.perf_counter() - start, response, body
+
+
+def measure(conn, rounds):
+    cold = []
+    for i in range(rounds):
+        # Any change to the share invalidates the cached page and listing
+        eqs_server.shared_registry.add_many([(f"extra_{i}", 0, os.path.join(os.sep, "bench", "extra", str(time.perf_counter_ns())), None, None)])
+        cold.append(timed_get(conn, "/")[0])
+    elapsed, response, body = timed_get(conn, "/")
+    etag = response.getheader("ETag")
+    warm = [timed_get(conn, "/")[0] for _ in range(rounds)]
+    not_modified = [timed_get(conn, "/", {"If-None-Match": etag})[0] for _ in range(rounds)]
+    api = [timed_get(conn, "/api/files?limit=100")[0] for _ in range(rounds)]
+    return {
+        'page_bytes': len(body),
+        'cold_ms': statistics.median(cold) * 1000,
+        'warm_ms': statistics.median(warm) * 1000,
+        'not_modified_ms': statistics.median(not_modified) * 1000,
+        'api_first_page_ms': statistics.median(api) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated share sizes (default: 1000,10000,100000)")
+    parser.add_argument("--rounds", type=int, default=10, help="requests per measurement (default: 10)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    server, port = start_server()
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    results = []
+    try:
+        for size in sizes:
+            fill_registry(size)
+            results.append({'name': f"index-{size}", 'items': size, **measure(conn, args.rounds)})
+    finally:
+        conn.close()
+        server.shutdown()
+        eqs_server.shared_registry.clear()
+        eqs_server.remove_upload_staging_dirs()
+
+    print(f"{'items':>8} {'cold':>10} {'warm':>10} {'304':>10} {'api page':>10}")
+    for r in results:
+        print(f"{r['items']:>8} {r['cold_ms']:>7.2f} ms {r['warm_ms']:>7.2f} ms "
+              f"{r['not_modified_ms']:>7.2f} ms {r['api_first_page_ms']:>7.2f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'benchmark': 'index', 'rounds': args.rounds, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Ingestion benchmark: sharing a folder of many files, and how long the UI thread stalls meanwhile.
+
+A folder tree with the requested number of empty files (100 per sub-folder) is generated once per
+size, then scanned the way "Add Folder" does it: FolderScanThread walks it and every batch goes
+into the shared registry. While that runs, a heartbeat on the main thread records the longest
+gap between ticks, i.e. the longest time the UI could not repaint or react to input.
+
+With PyQt6 installed, the scan is driven through the real window (EQSApp.start_folder_scan on an
+offscreen platform) and the heartbeat is a QTimer in the Qt event loop ('gui' stall). Without it
+the batches are consumed by a plain loop on the main thread ('main-thread' stall), which still
+shows the cost of registry updates and GIL contention with the scanner.
+
+    python benchmarks/bench_ingest.py --sizes 10000,100000 --json results.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import eqs_server
+
+FILES_PER_DIR = 100
+HEARTBEAT_INTERVAL = 0.005 # Seconds
+
+
+def make_tree(root, count):
+    for i in range(count):
+        directory = os.path.join(root, f"dir_{i // FILES_PER_DIR:05d}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory)
+        open(os.path.join(directory, f"file_{i:07d}.dat"), "wb").close()
+
+
+def ingest_plain(root):
+    # Returns (seconds, files added, heartbeat gaps); the main thread plays the GUI thread
+    batches = queue.Queue()
+    scan = eqs_server.FolderScanThread(root, batches.put, lambda *_: None, lambda *_: batches.put(None))
+    gaps = []
+    added = 0
+    start = last_tick = time.perf_counter()
+    scan.start()
+    while True:
+        try:
+            batch = batches.get(timeout=HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            batch = ()
+        if batch is None:
+            break
+        added += len(eqs_server.shared_registry.add_many(batch))
+        now = time.perf_counter()
+        gaps.append(now - last_tick)
+        last_tick = now
+    return time.perf_counter() - start, added, gaps
+
+
+def ingest_gui(root):
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    import eqs_gui
+
+    app = QApplication.instance() or QApplication([])
+    window = eqs_gui.EQSApp()
+    gaps = []
+    last_tick = [0.0]
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append(now - last_tick[0])
+        last_tick[0] = now
+
+    heartbeat = QTimer()
+    heartbeat.setInterval(int(HEARTBEAT_INTERVAL * 1000))
+    heartbeat.timeout.connect(tick)
+    window.scan_finished_signal.connect(lambda *_: QTimer.singleShot(0, app.quit))
+    start = last_tick[0] = time.perf_counter()
+    heartbeat.start()
+    window.start_folder_scan(root)
+    app.exec()
+    heartbeat.stop()
+    elapsed = time.perf_counter() - start
+    added = window._scan_added_count
+    window.shared_files_model.clear()
+    window.deleteLater()
+    return elapsed, added, gaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated file counts (default: 10000,100000)")
+    parser.add_argument("--rounds", type=int, default=3, help="scans per size (default: 3)")
+    parser.add_argument("--no-gui", action="store_true", help="use the plain main-thread consumer even if PyQt6 is installed")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    use_gui = not args.no_gui and importlib.util.find_spec("PyQt6") is not None
+    if use_gui:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    ingest = ingest_gui if use_gui else ingest_plain
+    stall_kind = "gui" if use_gui else "main-thread"
+
+    results = []
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory(prefix="eqs_bench_") as root:
+                make_tree(root, size)
+                rounds = []
+                for _ in range(args.rounds):
+                    eqs_server.shared_registry.clear()
+                    elapsed, added, gaps = ingest(root)
+                    if added != size:
+                        raise RuntimeError(f"expected {size} files to be added, got {added}")
+                    rounds.append((elapsed, max(gaps, default=0.0),
+                                   sum(gap - HEARTBEAT_INTERVAL for gap in gaps if gap > HEARTBEAT_INTERVAL)))
+            results.append({
+                'name': f"ingest-{size}",
+                'files': size,
+                'stall': stall_kind,
+                'elapsed_s': statistics.median(r[0] for r in rounds),
+                'files_per_s': statistics.median(size / r[0] for r in rounds),
+                'max_stall_ms': statistics.median(r[1] for r in rounds) * 1000,
+                'total_stall_ms': statistics.median(r[2] for r in rounds) * 1000,
+            })
+    finally:
+        eqs_server.shared_registry.clear()
+        eqs_server.remove_upload_staging_dirs()
+
+    print(f"{'files':>8} {'elapsed':>10} {'files/s':>10} {'max stall':>11} {'total stall':>12}  ({stall_kind})")
+    for r in results:
+        print(f"{r['files']:>8} {r['elapsed_s']:>8.2f} s {r['files_per_s']:>10.0f} "
+              f"{r['max_stall_ms']:>8.1f} ms {r['total_stall_ms']:>9.1f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'benchmark': 'ingest', 'rounds': args.rounds, 'stall': stall_kind, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Startup benchmark: how long EQS takes to become usable, in fresh interpreters.
+
+Every round starts a new Python process, so nothing is cached in-process:
+
+  help        python EQS.py --help (only the entry point and argparse)
+  server      import eqs_server (Flask, werkzeug and the routes)
+  serve       python EQS.py serve ... until the first HTTP response on loopback
+  gui-import  import eqs_gui (PyQt6 plus the server); skipped if PyQt6 is not installed
+
+    python benchmarks/bench_startup.py --rounds 10 --json results.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY = os.path.join(ROOT, "EQS.py")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_command(args):
+    start = time.perf_counter()
+    subprocess.run(args, check=True, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def time_import(module):
+    # Importing eqs_server creates a fallback upload folder; remove it so runs leave nothing behind
+    return time_command([sys.executable, "-c", f"import {module}, eqs_server; eqs_server.remove_upload_staging_dirs()"])
+
+
+def time_serve(share_dir, recv_dir):
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, ENTRY, "serve", "--share", share_dir, "--recv", recv_dir,
+         "--host", "127.0.0.1", "--port", str(port), "--api-token", "bench"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/files", timeout=1) as response:
+                    response.read()
+                return time.perf_counter() - start
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("eqs serve exited before answering")
+                time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def serve_loads_qt():
+    code = ("import sys, eqs_server; eqs_server.remove_upload_staging_dirs(); "
+            "print(any(name.startswith('PyQt6') for name in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT, capture_output=True, text=True).stdout
+    return out.strip() == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5, help="runs per measurement (default: 5)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="eqs_bench_") as tmp:
+        share_dir = os.path.join(tmp, "share")
+        recv_dir = os.path.join(tmp, "recv")
+        os.makedirs(share_dir)
+        os.makedirs(recv_dir)
+        with open(os.path.join(share_dir, "hello.txt"), "w") as f:
+            f.write("hello\n")
+
+        measurements = {
+            'help': lambda: time_command([sys.executable, ENTRY, "--help"]),
+            'server': lambda: time_import("eqs_server"),
+            'serve': lambda: time_serve(share_dir, recv_dir),
+        }
+        if importlib.util.find_spec("PyQt6") is not None:
+            measurements['gui-import'] = lambda: time_import("eqs_gui")
+
+        results = []
+        for name, measure in measurements.items():
+            measure() # Warm the OS file cache
+            samples = [measure() for _ in range(args.rounds)]
+            results.append({'name': name, 'median_s': statistics.median(samples), 'min_s': min(samples)})
+        qt_loaded = serve_loads_qt()
+
+    print(f"{'measurement':<12} {'median':>10} {'min':>10}")
+    for r in results:
+        print(f"{r['name']:<12} {r['median_s'] * 1000:>7.1f} ms {r['min_s'] * 1000:>7.1f} ms")
+    print(f"headless server imports PyQt6: {'yes' if qt_loaded else 'no'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'benchmark': 'startup', 'rounds': args.rounds, 'python': sys.version.split()[0],
+                       'headless_imports_qt': qt_loaded, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Transfer benchmark: download and upload throughput over loopback.
+
+  download-1    one client downloading a generated file
+  download-N    N clients downloading it at the same time (aggregate throughput)
+  upload-put    PUT /upload/<name> with the raw file as the body
+  upload-post   POST /upload with the file as a multipart/form-data part
+
+Clients run in separate processes. Uploads are received by a headless receiver that leaves them
+pending, and are discarded after each round, so nothing is written to the receiving folder.
+
+    python benchmarks/bench_transfer.py --size-mib 256 --clients 4 --rounds 3 --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import make_payload, run_client, start_server
+import eqs_server
+
+# Fetches one URL and discards the body
+DOWNLOAD_SCRIPT = r"""
+import socket, sys, time
+port, path = int(sys.argv[1]), sys.argv[2]
+sock = socket.create_connection(("127.0.0.1", port))
+start = time.perf_counter()
+sock.sendall(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+buf = bytearray(1 << 20)
+total = 0
+while True:
+    n = sock.recv_into(buf)
+    if not n:
+        break
+    total += n
+print(total, time.perf_counter() - start)
+"""
+
+# Uploads one file, as a raw PUT body or as a multipart POST, and waits for the response
+UPLOAD_SCRIPT = r"""
+import os, socket, sys, time
+port, mode, path = int(sys.argv[1]), sys.argv[2], sys.argv[3]
+size = os.path.getsize(path)
+name = os.path.basename(path)
+if mode == "put":
+    head = f"PUT /upload/{name} HTTP/1.1\r\nHost: bench\r\nContent-Length: {size}\r\nConnection: close\r\n\r\n".encode()
+    prefix = suffix = b""
+else:
+    boundary = "eqsbenchboundary"
+    prefix = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+              f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    suffix = f"\r\n--{boundary}--\r\n".encode()
+    head = (f"POST /upload HTTP/1.1\r\nHost: bench\r\nContent-Type: multipart/form-data; boundary={boundary}\r\n"
+            f"Content-Length: {len(prefix) + size + len(suffix)}\r\nConnection: close\r\n\r\n").encode()
+sock = socket.create_connection(("127.0.0.1", port))
+start = time.perf_counter()
+sock.sendall(head + prefix)
+with open(path, "rb") as f:
+    sock.sendfile(f)
+sock.sendall(suffix)
+response = b""
+while True:
+    chunk = sock.recv(65536)
+    if not chunk:
+        break
+    response += chunk
+elapsed = time.perf_counter() - start
+status = response.split(b" ", 2)[1].decode()
+print(size, elapsed, status)
+"""
+
+
+def share_file(path):
+    eqs_server.shared_registry.clear()
+    item, = eqs_server.shared_registry.add_many([(os.path.basename(path), os.path.getsize(path), path, None, None)])
+    return f"/download/{item['uid']}"
+
+
+def download_round(port, url_path, clients):
+    # Returns (total bytes, wall seconds) with every client started at once
+    start = time.perf_counter()
+    procs = [subprocess.Popen([sys.executable, "-c", DOWNLOAD_SCRIPT, str(port), url_path],
+                              stdout=subprocess.PIPE, text=True) for _ in range(clients)]
+    total = 0
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode:
+            raise RuntimeError("download client failed")
+        total += int(out.split()[0])
+    return total, time.perf_counter() - start
+
+
+def upload_round(port, mode, payload, receiver):
+    size, elapsed, status = run_client(UPLOAD_SCRIPT, port, mode, payload)
+    if not status.startswith("2"):
+        raise RuntimeError(f"upload ({mode}) answered HTTP {status}")
+    for entry in receiver.pending_files():
+        receiver.reject(entry['id'])
+    return int(size), float(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mib", type=int, default=256, help="size of the transferred file (default: 256)")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients for download-N (default: 4)")
+    parser.add_argument("--rounds", type=int, default=3, help="runs per measurement (default: 3)")
+    parser.add_argument("--backend", help="HTTP server backend: pool or threaded (default: pool)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="eqs_bench_") as tmp:
+        payload = make_payload(args.size_mib * 1024 * 1024, directory=tmp)
+        recv_dir = os.path.join(tmp, "recv")
+        os.makedirs(recv_dir)
+        eqs_server.set_upload_staging_dir(recv_dir)
+        receiver = eqs_server.HeadlessReceiver(recv_dir, eqs_server.AutoAcceptPolicy())
+        server, port = start_server(backend=args.backend)
+        receiver.server_thread = server
+        eqs_server.upload_receiver = receiver
+        try:
+            url_path = share_file(payload)
+            download_round(port, url_path, 1) # Warm the page cache before measuring
+            for clients in sorted({1, args.clients}):
+                rounds = [download_round(port, url_path, clients) for _ in range(args.rounds)]
+                results.append({
+                    'name': f"download-{clients}",
+                    'clients': clients,
+                    'throughput_mib_s': statistics.median(total / elapsed / (1 << 20) for total, elapsed in rounds),
+                })
+            for mode in ("put", "post"):
+                rounds = [upload_round(port, mode, payload, receiver) for _ in range(args.rounds)]
+                results.append({
+                    'name': f"upload-{mode}",
+                    'clients': 1,
+                    'throughput_mib_s': statistics.median(size / elapsed / (1 << 20) for size, elapsed in rounds),
+                })
+        finally:
+            eqs_server.upload_receiver = None
+            server.shutdown()
+            receiver.finalize_pool.shutdown(wait=True)
+            eqs_server.shared_registry.clear()
+            eqs_server.remove_upload_staging_dirs()
+
+    print(f"{'measurement':<14} {'throughput':>14}")
+    for r in results:
+        print(f"{r['name']:<14} {r['throughput_mib_s']:>9.1f} MiB/s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'benchmark': 'transfer', 'size_mib': args.size_mib, 'rounds': args.rounds,
+                       'backend': args.backend or eqs_server.SERVER_BACKEND, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
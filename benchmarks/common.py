@@ -0,0 +1,44 @@
+"""Helpers shared by the benchmark scripts. Everything runs on 127.0.0.1; no network is needed."""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_payload(size_bytes, directory=None):
+    fd, path = tempfile.mkstemp(prefix="eqs_bench_", suffix=".bin", dir=directory)
+    block = os.urandom(1 << 20)
+    with os.fdopen(fd, "wb") as f:
+        remaining = size_bytes
+        while remaining > 0:
+            f.write(block[:min(len(block), remaining)])
+            remaining -= len(block)
+    return path
+
+
+def start_server(**options):
+    # Starts eqs_server's Flask app on a free loopback port; returns (server_thread, port)
+    import logging
+    import eqs_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = eqs_server.ServerThread(eqs_server.flask_app, host="127.0.0.1", port=0, **options)
+    server.start()
+    return server, server.port
+
+
+def run_client(script, *args):
+    # Runs a client script in its own interpreter, so its CPU time is not charged to the server;
+    # returns the script's stdout split into fields
+    out = subprocess.run([sys.executable, "-c", script, *map(str, args)],
+                         check=True, capture_output=True, text=True).stdout
+    return out.split()
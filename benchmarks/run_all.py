@@ -0,0 +1,137 @@
+"""Runs every benchmark and collects the results into one JSON file, optionally checking for regressions.
+
+Each bench_*.py script is run in its own process with --json. The combined file records the git
+commit, Python version and platform next to every benchmark's results, so runs from different
+releases can be compared:
+
+    python benchmarks/run_all.py --json baseline.json
+    python benchmarks/run_all.py --json current.json --compare baseline.json --threshold 0.15
+
+With --compare, every metric that got worse by more than the threshold (a fraction) is listed
+and the exit status is 1. Metrics ending in _ms, _s or _s_per_gib are lower-is-better;
+throughput (_mib_s, _per_s) is higher-is-better; anything else is informational.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Arguments for a quick run (--quick) and a full one; sizes are kept moderate so a full run
+# finishes in a few minutes on a laptop
+BENCHMARKS = {
+    'startup': {'full': ["--rounds", "5"], 'quick': ["--rounds", "2"]},
+    'index': {'full': ["--sizes", "1000,10000,100000", "--rounds", "10"], 'quick': ["--sizes", "1000,10000", "--rounds", "3"]},
+    'download': {'full': ["--size-mib", "512", "--rounds", "3"], 'quick': ["--size-mib", "64", "--rounds", "1"]},
+    'transfer': {'full': ["--size-mib", "256", "--clients", "4", "--rounds", "3"],
+                 'quick': ["--size-mib", "32", "--clients", "2", "--rounds", "1"]},
+    'ingest': {'full': ["--sizes", "10000,100000", "--rounds", "3"], 'quick': ["--sizes", "10000", "--rounds", "1"]},
+}
+HIGHER_IS_BETTER = ("_mib_s", "_per_s")
+LOWER_IS_BETTER = ("_ms", "_s", "_s_per_gib")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(name, args):
+    with tempfile.TemporaryDirectory(prefix="eqs_bench_") as tmp:
+        out_path = os.path.join(tmp, "result.json")
+        subprocess.run([sys.executable, os.path.join(HERE, f"bench_{name}.py"), *args, "--json", out_path],
+                       check=True, cwd=HERE)
+        with open(out_path) as f:
+            return json.load(f)
+
+
+def metric_direction(key):
+    # 1 = higher is better, -1 = lower is better, 0 = not compared
+    if key.endswith(HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def result_key(result):
+    return result.get('name') or result.get('mode')
+
+
+def compare(old, new, threshold):
+    # Returns a list of (benchmark, result, metric, old, new, change) for regressions beyond threshold
+    regressions = []
+    for bench_name, new_bench in new['benchmarks'].items():
+        old_bench = old.get('benchmarks', {}).get(bench_name)
+        if not old_bench:
+            continue
+        old_results = {result_key(r): r for r in old_bench.get('results', [])}
+        for new_result in new_bench.get('results', []):
+            old_result = old_results.get(result_key(new_result))
+            if not old_result:
+                continue
+            for metric, new_value in new_result.items():
+                direction = metric_direction(metric)
+                old_value = old_result.get(metric)
+                if not direction or not isinstance(new_value, (int, float)) or not old_value:
+                    continue
+                change = (new_value - old_value) / old_value
+                if change * direction < -threshold:
+                    regressions.append((bench_name, result_key(new_result), metric, old_value, new_value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer rounds, for a smoke test")
+    parser.add_argument("--json", metavar="PATH", help="write the combined results as JSON")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="report regressions against an earlier combined result")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default: 0.10)")
+    args = parser.parse_args()
+
+    names = [name for name in (args.only.split(",") if args.only else BENCHMARKS) if name]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    combined = {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'started': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'quick': args.quick,
+        'benchmarks': {},
+    }
+    for name in names:
+        print(f"== {name} ==", flush=True)
+        combined['benchmarks'][name] = run_benchmark(name, BENCHMARKS[name]['quick' if args.quick else 'full'])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(combined, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        regressions = compare(old, combined, args.threshold)
+        print(f"\nCompared with {args.compare} (commit {old.get('commit') or 'unknown'}), threshold {args.threshold:.0%}:")
+        for bench_name, key, metric, old_value, new_value, change in regressions:
+            print(f"  REGRESSION {bench_name}/{key} {metric}: {old_value:.4g} -> {new_value:.4g} ({change:+.1%})")
+        if regressions:
+            return 1
+        print("  no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
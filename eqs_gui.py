@@ -0,0 +1,1155 @@
+import sys
+import os
+import webbrowser
+import tempfile
+import concurrent.futures
+import logging
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
+    QGroupBox, QPushButton, QLabel, QLineEdit, QPlainTextEdit, QTableView, QStyledItemDelegate,
+    QStyleOptionProgressBar, QStyle, QComboBox, QFormLayout, QHeaderView,
+    QAbstractItemView, QFileDialog, QMessageBox, QMenu, QCheckBox, QSpinBox
+)
+from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QTimer, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QIcon
+import eqs_server
+# Settings the window changes at runtime (upload_receiver, auto_accept_policy, DOWNLOAD_USE_SENDFILE,
+# DOWNLOAD_COMPRESSION, UPLOAD_TEMP_DIR) are read and written through the module, not imported by name
+from eqs_server import (
+    format_size, format_duration, get_local_ip, icon_ico_path, logger, log_buffer, LOG_LEVELS,
+    LOG_FILE_PATH, LOG_FILE_MAX_BYTES, LOG_FLUSH_INTERVAL_MS, LOG_VIEW_MAX_LINES, set_log_level,
+    enable_file_logging, disable_file_logging, shared_registry, flask_app, incoming_files_buffer,
+    set_upload_staging_dir, remove_upload_staging_dirs, save_incoming_file, FINALIZE_WORKERS,
+    AutoAcceptPolicy, FolderScanThread, FolderWatcher, ServerThread, SERVER_BACKEND, SERVER_BACKENDS, SERVER_WORKERS,
+    transfers, TRANSFER_REFRESH_INTERVAL_MS, content_hasher
+)
+from eqs_hashing import file_identity
+
+
+# --- Table Models ---
+# The GUI tables are views over these models, so a row costs a few Python references rather than
+# a QTableWidgetItem per cell (and a QProgressBar widget per pending row). Only visible rows are
+# ever formatted or painted, and bulk changes are announced to the view once.
+class SharedFilesModel(QAbstractTableModel):
+    HEADERS = ["Name", "Size", "Path"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = [] # Registry item dicts (never mutated by the registry), in display order
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self._items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return item['name']
+            if column == 1:
+                return format_size(item['size_bytes'])
+            return item['path']
+        if role == Qt.ItemDataRole.ToolTipRole:
+            digest = content_hasher.digest_for_item(item['uid']) # Looked up on hover, so it's never stale
+            return f"{item['path']}\n{content_hasher.algorithm.upper()}: {digest}" if digest else item['path']
+        if role == Qt.ItemDataRole.UserRole:
+            return item['uid']
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def append_items(self, items):
+        if not items:
+            return
+        first_row = len(self._items)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(items) - 1)
+        self._items.extend(items)
+        self.endInsertRows()
+
+    def uids_for_rows(self, rows):
+        return [self._items[row]['uid'] for row in rows if 0 <= row < len(self._items)]
+
+    def remove_uids(self, uids):
+        uids = set(uids)
+        if not uids:
+            return
+        # One reset for the whole selection instead of a removeRows round-trip per row
+        self.beginResetModel()
+        self._items = [item for item in self._items if item['uid'] not in uids]
+        self.endResetModel()
+
+    def replace_items(self, items):
+        # Swaps in updated registry items (same uid, new size) and repaints just those rows
+        by_uid = {item['uid']: item for item in items}
+        rows = [row for row, item in enumerate(self._items) if item['uid'] in by_uid]
+        for row in rows:
+            self._items[row] = by_uid[self._items[row]['uid']]
+        if rows:
+            self.dataChanged.emit(self.index(rows[0], 0), self.index(rows[-1], len(self.HEADERS) - 1))
+
+    def clear(self):
+        self.beginResetModel()
+        self._items = []
+        self.endResetModel()
+
+
+PENDING_STATUS = "Pending Confirmation"
+
+class PendingReceivesModel(QAbstractTableModel):
+    HEADERS = ["Filename", "Status", "Size", "Received/Progress"]
+    PROGRESS_COLUMN = 3
+    PROGRESS_ROLE = Qt.ItemDataRole.UserRole + 1
+    # Row layout: [pending_id, filename, status, size_bytes, percent, progress_text]
+    _ID, _FILENAME, _STATUS, _SIZE, _PERCENT, _PROGRESS_TEXT = range(6)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._row_by_id = {}
+        self.pending_count = 0 # Rows still awaiting a decision, kept up to date for the tab title
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return row[self._FILENAME]
+            if column == 1:
+                return row[self._STATUS]
+            if column == 2:
+                return format_size(row[self._SIZE])
+            return row[self._PROGRESS_TEXT]
+        if role == self.PROGRESS_ROLE and column == self.PROGRESS_COLUMN:
+            return row[self._PERCENT]
+        if role == Qt.ItemDataRole.UserRole:
+            return row[self._ID]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def add_rows(self, entries):
+        # entries: iterable of (pending_id, filename, size_bytes); announced as one insertion
+        new_rows = [[pending_id, filename, PENDING_STATUS, size, 0, "0%"] for pending_id, filename, size in entries]
+        if not new_rows:
+            return
+        first_row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(new_rows) - 1)
+        for row_index, row in enumerate(new_rows, start=first_row):
+            self._row_by_id[row[self._ID]] = row_index
+        self._rows.extend(new_rows)
+        self.pending_count += len(new_rows)
+        self.endInsertRows()
+
+    def __contains__(self, pending_id):
+        return pending_id in self._row_by_id
+
+    def pending_ids(self):
+        return [row[self._ID] for row in self._rows if row[self._STATUS] == PENDING_STATUS]
+
+    def pending_id_at(self, row_index):
+        return self._rows[row_index][self._ID] if 0 <= row_index < len(self._rows) else None
+
+    def filename(self, pending_id):
+        row_index = self._row_by_id.get(pending_id)
+        return self._rows[row_index][self._FILENAME] if row_index is not None else None
+
+    def status(self, pending_id):
+        row_index = self._row_by_id.get(pending_id)
+        return self._rows[row_index][self._STATUS] if row_index is not None else None
+
+    def set_status(self, pending_id, status):
+        row_index = self._row_by_id.get(pending_id)
+        if row_index is None:
+            return
+        row = self._rows[row_index]
+        if row[self._STATUS] == status:
+            return
+        if row[self._STATUS] == PENDING_STATUS:
+            self.pending_count -= 1
+        elif status == PENDING_STATUS:
+            self.pending_count += 1
+        row[self._STATUS] = status
+        cell = self.index(row_index, 1)
+        self.dataChanged.emit(cell, cell, [Qt.ItemDataRole.DisplayRole])
+
+    def set_progress(self, pending_id, percent=None, text=None):
+        row_index = self._row_by_id.get(pending_id)
+        if row_index is None:
+            return
+        row = self._rows[row_index]
+        if percent is not None:
+            row[self._PERCENT] = percent
+        if text is not None:
+            row[self._PROGRESS_TEXT] = text
+        cell = self.index(row_index, self.PROGRESS_COLUMN)
+        self.dataChanged.emit(cell, cell, [Qt.ItemDataRole.DisplayRole, self.PROGRESS_ROLE])
+
+
+TRANSFER_DIRECTIONS = {'download': "Download", 'upload': "Upload", 'save': "Saving"}
+
+class TransfersModel(QAbstractTableModel):
+    # Rows are TransferRegistry snapshots, replaced wholesale on every refresh tick, so the number
+    # of view updates per second is fixed no matter how many transfers are running
+    HEADERS = ["Direction", "Name", "Peer", "Progress", "Speed", "ETA"]
+    PROGRESS_COLUMN = 3
+    PROGRESS_ROLE = PendingReceivesModel.PROGRESS_ROLE # Painted by the same delegate
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return TRANSFER_DIRECTIONS.get(row['direction'], row['direction'])
+            if column == 1:
+                return row['name']
+            if column == 2:
+                return row['peer']
+            if column == 3:
+                if row['finished']:
+                    return f"{'Done' if row['ok'] else 'Failed'} ({format_size(row['done'])})"
+                if row['total']:
+                    return f"{row['done'] * 100 // row['total']}% ({format_size(row['done'])}/{format_size(row['total'])})"
+                return format_size(row['done'])
+            if column == 4:
+                return f"{format_size(row['rate'])}/s"
+            return format_duration(row['eta']) if row['eta'] is not None else ""
+        if role == self.PROGRESS_ROLE and column == self.PROGRESS_COLUMN:
+            if row['finished']:
+                return 100 if row['ok'] else None
+            return row['done'] * 100 // row['total'] if row['total'] else None
+        if role == Qt.ItemDataRole.ToolTipRole and column == 1:
+            return row['name']
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def set_rows(self, rows):
+        if [row['id'] for row in rows] == [row['id'] for row in self._rows]:
+            self._rows = rows
+            if rows: # Same transfers as last time: one change notification for every cell
+                self.dataChanged.emit(self.index(0, 0), self.index(len(rows) - 1, len(self.HEADERS) - 1))
+            return
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def active_count(self):
+        return sum(1 for row in self._rows if not row['finished'])
+
+
+class ProgressBarDelegate(QStyledItemDelegate):
+    # Paints a progress bar into the cell, so the table needs no per-row QProgressBar widget
+    def paint(self, painter, option, index):
+        percent = index.data(PendingReceivesModel.PROGRESS_ROLE)
+        if percent is None:
+            super().paint(painter, option, index)
+            return
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Horizontal
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = max(0, min(100, percent))
+        bar.text = index.data(Qt.ItemDataRole.DisplayRole) or ""
+        bar.textVisible = True
+        bar.textAlignment = Qt.AlignmentFlag.AlignCenter
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ProgressBar, bar, painter, option.widget)
+
+
+# --- Main Application Class ---
+class EQSApp(QMainWindow):
+    # Sizes are qint64: a plain int signal argument wraps around for files over 2 GiB
+    incoming_file_signal = pyqtSignal(str, str, 'qint64', str)
+    incoming_batch_signal = pyqtSignal(str, list) # batch_id, [(pending_id, relative_path, size, sender_ip), ...]
+    transfer_progress_signal = pyqtSignal(str, 'qint64', 'qint64')
+    scan_batch_signal = pyqtSignal(list)
+    scan_progress_signal = pyqtSignal(int, 'qint64')
+    scan_finished_signal = pyqtSignal(int, bool, int)
+    folder_change_signal = pyqtSignal(list, list, list)
+    transfer_finished_signal = pyqtSignal(str, bool, str)
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("EQS")
+        if os.path.exists(icon_ico_path):
+            self.setWindowIcon(QIcon(icon_ico_path))
+        else:
+            print(f"Warning: Window icon file not found at {icon_ico_path}", file=sys.stderr)
+
+        self.setGeometry(100, 100, 850, 650)
+        eqs_server.upload_receiver = self
+        self.server_thread = None
+        self.server_port = 8080
+        self.default_receiving_folder = os.path.expanduser("~/Downloads")
+        if not os.path.exists(self.default_receiving_folder):
+            try:
+                os.makedirs(self.default_receiving_folder, exist_ok=True)
+            except OSError:
+                self.default_receiving_folder = tempfile.gettempdir() # Fallback
+                print(f"Warning: Could not create default Downloads folder. Using temp: {self.default_receiving_folder}")
+
+        self.shared_files_model = SharedFilesModel(self)
+        self.transfers_model = TransfersModel(self)
+        self.finalize_pool = concurrent.futures.ThreadPoolExecutor(max_workers=FINALIZE_WORKERS, thread_name_prefix="EQS-finalize")
+        self.pending_receives_model = PendingReceivesModel(self)
+        self.folder_scan_thread = None
+        self.folder_watchers = [] # One per shared folder, keeping the list current
+        self._scan_added_count = 0
+        self.tab_widget = QTabWidget()
+        self.setCentralWidget(self.tab_widget)
+        self._create_shared_files_tab()
+        self._create_pending_receives_tab()
+        self._create_transfers_tab()
+        self._create_logs_tab()
+        self._create_settings_tab()
+        self._connect_signals()
+        # Connect signals defined in the class
+        self.incoming_file_signal.connect(self.handle_incoming_file_signal)
+        self.incoming_batch_signal.connect(self.handle_incoming_batch_signal)
+        self.transfer_progress_signal.connect(self.handle_transfer_progress)
+        self.transfer_finished_signal.connect(self.handle_transfer_finished)
+        self.scan_batch_signal.connect(self.handle_scan_batch)
+        self.scan_progress_signal.connect(self.handle_scan_progress)
+        self.scan_finished_signal.connect(self.handle_scan_finished)
+        self.folder_change_signal.connect(self.handle_folder_change)
+        self.le_receiving_folder.setText(self.default_receiving_folder)
+        if eqs_server.CONTENT_HASHING:
+            content_hasher.start()
+        self.log_message("Application initialized.")
+
+    def _create_shared_files_tab(self):
+        self.shared_files_tab = QWidget()
+        layout = QVBoxLayout(self.shared_files_tab)
+        layout.setContentsMargins(10, 10, 10, 10)
+        # Server Control Group
+        server_control_group = QGroupBox("Server Control")
+        server_control_layout = QVBoxLayout()
+        server_buttons_layout = QHBoxLayout()
+        self.btn_toggle_server = QPushButton("Start Server")
+        self.btn_open_browser = QPushButton("Open in Browser")
+        self.btn_open_browser.setEnabled(False)
+        server_buttons_layout.addWidget(self.btn_toggle_server)
+        server_buttons_layout.addWidget(self.btn_open_browser)
+        server_buttons_layout.addStretch()
+        server_info_layout = QFormLayout()
+        server_info_layout.setLabelAlignment(Qt.AlignmentFlag.AlignLeft)
+        self.lbl_status_value = QLabel("Stopped")
+        self.lbl_status_value.setStyleSheet("color: red;")
+        self.lbl_url_value = QLabel("N/A")
+        self.lbl_url_value.setTextInteractionFlags(Qt.TextInteractionFlag.TextBrowserInteraction)
+        self.lbl_url_value.setOpenExternalLinks(True)
+        server_info_layout.addRow(QLabel("Status:"), self.lbl_status_value)
+        server_info_layout.addRow(QLabel("URL:"), self.lbl_url_value)
+        server_control_layout.addLayout(server_buttons_layout)
+        server_control_layout.addLayout(server_info_layout)
+        server_control_group.setLayout(server_control_layout)
+        layout.addWidget(server_control_group)
+        # Shared Files Group
+        shared_files_group = QGroupBox("Shared Files")
+        shared_files_group_layout = QVBoxLayout()
+        shared_buttons_layout = QHBoxLayout()
+        self.btn_add_files = QPushButton("Add Files")
+        self.btn_add_folder = QPushButton("Add Folder")
+        self.btn_remove_selected = QPushButton("Remove Selected")
+        self.btn_clear_all_shared = QPushButton("Clear All")
+        shared_buttons_layout.addWidget(self.btn_add_files)
+        shared_buttons_layout.addWidget(self.btn_add_folder)
+        shared_buttons_layout.addWidget(self.btn_remove_selected)
+        shared_buttons_layout.addWidget(self.btn_clear_all_shared)
+        shared_buttons_layout.addStretch()
+        self.lbl_scan_status = QLabel()
+        self.lbl_scan_status.setVisible(False)
+        self.btn_cancel_scan = QPushButton("Cancel Scan")
+        self.btn_cancel_scan.setVisible(False)
+        shared_buttons_layout.addWidget(self.lbl_scan_status)
+        shared_buttons_layout.addWidget(self.btn_cancel_scan)
+        self.tbl_shared_files = QTableView()
+        self.tbl_shared_files.setModel(self.shared_files_model)
+        self._configure_table_view(self.tbl_shared_files)
+        self.tbl_shared_files.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.tbl_shared_files.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Interactive)
+        self.tbl_shared_files.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.tbl_shared_files.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tbl_shared_files.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tbl_shared_files.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        shared_files_group_layout.addLayout(shared_buttons_layout)
+        shared_files_group_layout.addWidget(self.tbl_shared_files)
+        shared_files_group.setLayout(shared_files_group_layout)
+        layout.addWidget(shared_files_group)
+        self.tab_widget.addTab(self.shared_files_tab, "Shared Files")
+
+    def _create_pending_receives_tab(self):
+        self.pending_receives_tab = QWidget()
+        layout = QVBoxLayout(self.pending_receives_tab)
+        layout.setContentsMargins(10, 10, 10, 10)
+        instruction_label = QLabel("Review incoming receives. Select one or more items and right-click (or use the buttons) to Accept or Reject.")
+        layout.addWidget(instruction_label)
+        pending_buttons_layout = QHBoxLayout()
+        self.btn_accept_selected = QPushButton("Accept Selected")
+        self.btn_reject_selected = QPushButton("Reject Selected")
+        self.btn_accept_all_pending = QPushButton("Accept All")
+        pending_buttons_layout.addWidget(self.btn_accept_selected)
+        pending_buttons_layout.addWidget(self.btn_reject_selected)
+        pending_buttons_layout.addWidget(self.btn_accept_all_pending)
+        pending_buttons_layout.addStretch()
+        layout.addLayout(pending_buttons_layout)
+        self.tbl_pending_receives = QTableView()
+        self.tbl_pending_receives.setModel(self.pending_receives_model)
+        self._configure_table_view(self.tbl_pending_receives)
+        self.tbl_pending_receives.setItemDelegateForColumn(PendingReceivesModel.PROGRESS_COLUMN, ProgressBarDelegate(self.tbl_pending_receives))
+        self.tbl_pending_receives.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.tbl_pending_receives.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Interactive)
+        self.tbl_pending_receives.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Interactive)
+        self.tbl_pending_receives.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        self.tbl_pending_receives.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tbl_pending_receives.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tbl_pending_receives.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.tbl_pending_receives.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.tbl_pending_receives.customContextMenuRequested.connect(self.show_pending_receive_context_menu)
+        layout.addWidget(self.tbl_pending_receives)
+        self.tab_widget.addTab(self.pending_receives_tab, "Pending Receives")
+
+    def _create_transfers_tab(self):
+        self.transfers_tab = QWidget()
+        layout = QVBoxLayout(self.transfers_tab)
+        layout.setContentsMargins(10, 10, 10, 10)
+        self.tbl_transfers = QTableView()
+        self.tbl_transfers.setModel(self.transfers_model)
+        self._configure_table_view(self.tbl_transfers)
+        self.tbl_transfers.setItemDelegateForColumn(TransfersModel.PROGRESS_COLUMN, ProgressBarDelegate(self.tbl_transfers))
+        header = self.tbl_transfers.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        self.tbl_transfers.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tbl_transfers.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.tbl_transfers)
+        self.tab_widget.addTab(self.transfers_tab, "Transfers")
+        # Server threads never signal the window about progress; this timer polls the transfer
+        # registry instead, so the redraw rate stays fixed however many transfers are running
+        self.transfer_refresh_timer = QTimer(self)
+        self.transfer_refresh_timer.setInterval(TRANSFER_REFRESH_INTERVAL_MS)
+        self.transfer_refresh_timer.timeout.connect(self.refresh_transfers)
+        self.transfer_refresh_timer.start()
+
+    def _configure_table_view(self, view):
+        # Fixed row heights let the view lay out any number of rows without measuring each one
+        view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        view.verticalHeader().setDefaultSectionSize(view.fontMetrics().height() + 10)
+        view.setWordWrap(False)
+
+    def _create_logs_tab(self):
+        self.logs_tab = QWidget()
+        layout = QVBoxLayout(self.logs_tab)
+        layout.setContentsMargins(10, 10, 10, 10)
+        self.txt_logs = QPlainTextEdit()
+        self.txt_logs.setReadOnly(True)
+        self.txt_logs.setMaximumBlockCount(LOG_VIEW_MAX_LINES) # Oldest lines are discarded past this
+        layout.addWidget(self.txt_logs)
+        # Log controls
+        bottom_layout = QHBoxLayout()
+        bottom_layout.addWidget(QLabel("Log Level:"))
+        self.cmb_log_level = QComboBox()
+        self.cmb_log_level.addItems(["NOTSET", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
+        self.cmb_log_level.setCurrentText(logging.getLevelName(logger.getEffectiveLevel())) # Default log level
+        bottom_layout.addWidget(self.cmb_log_level)
+        self.chk_log_to_file = QCheckBox("Write to file")
+        self.chk_log_to_file.setChecked(eqs_server._log_file_handler is not None)
+        self.chk_log_to_file.setToolTip(f"Also write the log to {LOG_FILE_PATH} (rotated at {format_size(LOG_FILE_MAX_BYTES)})")
+        bottom_layout.addWidget(self.chk_log_to_file)
+        bottom_layout.addStretch()
+        self.btn_clear_logs = QPushButton("Clear Logs")
+        bottom_layout.addWidget(self.btn_clear_logs)
+        layout.addLayout(bottom_layout)
+        self.tab_widget.addTab(self.logs_tab, "Logs")
+        # Drain the log buffer into the view in batches
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self.log_flush_timer.timeout.connect(self.flush_log_view)
+        self.log_flush_timer.start()
+
+    def _create_settings_tab(self):
+        self.settings_tab = QWidget()
+        main_layout = QVBoxLayout(self.settings_tab)
+        main_layout.setContentsMargins(10, 10, 10, 10)
+        main_layout.setAlignment(Qt.AlignmentFlag.AlignTop) # Align group boxes to top
+        settings_group = QGroupBox("General Settings")
+        form_layout = QFormLayout()
+        # Receiving Folder
+        self.le_receiving_folder = QLineEdit()
+        self.le_receiving_folder.setPlaceholderText(f"Default: {os.path.expanduser('~/Downloads')}")
+        self.btn_browse_recv_folder = QPushButton("Browse...")
+        recv_folder_layout = QHBoxLayout()
+        recv_folder_layout.addWidget(self.le_receiving_folder)
+        recv_folder_layout.addWidget(self.btn_browse_recv_folder)
+        form_layout.addRow(QLabel("Receiving Folder:"), recv_folder_layout)
+        # Download mode
+        self.chk_sendfile = QCheckBox("Zero-copy downloads (sendfile)")
+        self.chk_sendfile.setChecked(eqs_server.DOWNLOAD_USE_SENDFILE)
+        self.chk_sendfile.setToolTip("Let the operating system send file data directly to the network. Disable if downloads misbehave.")
+        self.chk_compress = QCheckBox("Compress text files")
+        self.chk_compress.setChecked(eqs_server.DOWNLOAD_COMPRESSION)
+        self.chk_compress.setToolTip("Send logs, CSV, JSON and other text gzip-compressed to browsers that accept it. Compressed copies are cached.")
+        downloads_layout = QHBoxLayout()
+        downloads_layout.addWidget(self.chk_sendfile)
+        downloads_layout.addWidget(self.chk_compress)
+        form_layout.addRow(QLabel("Downloads:"), downloads_layout)
+        self.chk_hashing = QCheckBox("Compute checksums of shared files")
+        self.chk_hashing.setChecked(eqs_server.CONTENT_HASHING)
+        self.chk_hashing.setToolTip("Hash shared files in the background so recipients can verify downloads. Checksums are cached.")
+        form_layout.addRow(QLabel("Checksums:"), self.chk_hashing)
+        # Server backend; takes effect the next time the server starts
+        self.cmb_server_backend = QComboBox()
+        self.cmb_server_backend.addItems(list(SERVER_BACKENDS))
+        self.cmb_server_backend.setCurrentText(SERVER_BACKEND)
+        self.cmb_server_backend.setToolTip("pool: bounded worker threads with keep-alive. threaded: development server, one thread per connection.")
+        form_layout.addRow(QLabel("Server backend:"), self.cmb_server_backend)
+        self.spn_server_workers = QSpinBox()
+        self.spn_server_workers.setRange(1, 512)
+        self.spn_server_workers.setValue(SERVER_WORKERS)
+        self.spn_server_workers.setToolTip("Connections the pool backend serves at once. Applies when the server is next started.")
+        form_layout.addRow(QLabel("Worker threads:"), self.spn_server_workers)
+        settings_group.setLayout(form_layout)
+        main_layout.addWidget(settings_group)
+        # Auto-accept rules
+        self.grp_auto_accept = QGroupBox("Auto-Accept Incoming Files")
+        self.grp_auto_accept.setCheckable(True)
+        self.grp_auto_accept.setChecked(eqs_server.auto_accept_policy.enabled)
+        auto_accept_layout = QFormLayout()
+        self.le_auto_accept_senders = QLineEdit()
+        self.le_auto_accept_senders.setPlaceholderText("Any sender (e.g. 192.168.1.0/24, 10.0.0.5)")
+        auto_accept_layout.addRow(QLabel("From addresses:"), self.le_auto_accept_senders)
+        self.spn_auto_accept_max_size = QSpinBox()
+        self.spn_auto_accept_max_size.setRange(0, 1024 * 1024)
+        self.spn_auto_accept_max_size.setSuffix(" MiB")
+        self.spn_auto_accept_max_size.setSpecialValueText("No limit")
+        auto_accept_layout.addRow(QLabel("Up to size:"), self.spn_auto_accept_max_size)
+        self.le_auto_accept_extensions = QLineEdit()
+        self.le_auto_accept_extensions.setPlaceholderText("Any type (e.g. jpg, png, pdf)")
+        auto_accept_layout.addRow(QLabel("File types:"), self.le_auto_accept_extensions)
+        auto_accept_layout.addRow(QLabel("Matching files are saved straight into the receiving folder; existing files are never overwritten."))
+        self.grp_auto_accept.setLayout(auto_accept_layout)
+        main_layout.addWidget(self.grp_auto_accept)
+        self.tab_widget.addTab(self.settings_tab, "Settings")
+        # Initialize with default
+        self.le_receiving_folder.setText(self.default_receiving_folder)
+
+    def _connect_signals(self):
+        self.btn_add_files.clicked.connect(self.add_files_action)
+        self.btn_add_folder.clicked.connect(self.add_folder_action)
+        self.btn_cancel_scan.clicked.connect(self.cancel_folder_scan_action)
+        self.btn_remove_selected.clicked.connect(self.remove_selected_shared_files_action)
+        self.btn_clear_all_shared.clicked.connect(self.clear_all_shared_files_action)
+        self.btn_toggle_server.clicked.connect(self.toggle_server_action)
+        self.btn_open_browser.clicked.connect(self.open_browser_action)
+        self.btn_clear_logs.clicked.connect(self.clear_logs_action)
+        self.cmb_log_level.currentTextChanged.connect(self.set_log_level_action)
+        self.chk_log_to_file.toggled.connect(self.toggle_log_file_action)
+        self.btn_browse_recv_folder.clicked.connect(self.browse_receiving_folder_action)
+        self.chk_sendfile.toggled.connect(self.toggle_sendfile_action)
+        self.chk_compress.toggled.connect(self.toggle_compression_action)
+        self.chk_hashing.toggled.connect(self.toggle_hashing_action)
+        self.btn_accept_selected.clicked.connect(self.accept_selected_action)
+        self.btn_reject_selected.clicked.connect(self.reject_selected_action)
+        self.btn_accept_all_pending.clicked.connect(self.accept_all_pending_action)
+        self.grp_auto_accept.toggled.connect(self.update_auto_accept_policy)
+        self.le_auto_accept_senders.editingFinished.connect(self.update_auto_accept_policy)
+        self.spn_auto_accept_max_size.valueChanged.connect(self.update_auto_accept_policy)
+        self.le_auto_accept_extensions.editingFinished.connect(self.update_auto_accept_policy)
+
+    def log_message(self, message, level="INFO"):
+        # Safe from any thread: the record is buffered and shown on the next flush_log_view
+        logger.log(LOG_LEVELS.get(level.upper(), logging.INFO), message)
+
+    def flush_log_view(self):
+        records, dropped = log_buffer.drain()
+        if not records:
+            return
+        lines = [log_buffer.format(record) for record in records]
+        if dropped:
+            lines.insert(0, f"... {dropped} older message(s) dropped ...")
+        scrollbar = self.txt_logs.verticalScrollBar()
+        follow = scrollbar.value() >= scrollbar.maximum() # Only auto-scroll if already at the bottom
+        self.txt_logs.appendPlainText("\n".join(lines))
+        if follow:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def set_log_level_action(self, text):
+        set_log_level(text)
+        self.log_message(f"Log level set to {text}.")
+
+    def toggle_log_file_action(self, enabled):
+        if enabled:
+            try:
+                path = enable_file_logging()
+                self.log_message(f"Writing log to {path}")
+            except OSError as e:
+                self.log_message(f"Could not open log file {LOG_FILE_PATH}: {e}", level="ERROR")
+                self.chk_log_to_file.setChecked(False)
+        else:
+            disable_file_logging()
+            self.log_message("Stopped writing log file.")
+
+    def accepting_uploads(self):
+        return bool(self.server_thread and self.server_thread.is_alive())
+
+    def notify_incoming(self, batch_id, entries):
+        # Called from server threads; the signals hand the files over to the GUI thread
+        if batch_id is None:
+            self.incoming_file_signal.emit(*entries[0])
+        else:
+            self.incoming_batch_signal.emit(batch_id, entries)
+
+    def handle_incoming_file_signal(self, pending_id, filename, size, sender_ip):
+        self.log_message(f"Incoming file '{filename}' ({format_size(size)}) from {sender_ip}. Pending ID: {pending_id}", level="INFO")
+        self._add_pending_receive_row(pending_id, filename, size)
+        self._mark_pending_tab()
+        self._apply_auto_accept([(pending_id, filename, size, sender_ip)])
+
+    def handle_incoming_batch_signal(self, batch_id, entries):
+        total_size = sum(size for _, _, size, _ in entries)
+        sender_ips = sorted({sender_ip for _, _, _, sender_ip in entries})
+        self.log_message(f"Incoming batch of {len(entries)} files ({format_size(total_size)}) from {', '.join(sender_ips)}. Batch ID: {batch_id}", level="INFO")
+        # The whole batch is one model insertion
+        self.pending_receives_model.add_rows((pending_id, relative_path, size) for pending_id, relative_path, size, _ in entries)
+        self._mark_pending_tab()
+        self._apply_auto_accept(entries)
+
+    def _apply_auto_accept(self, entries):
+        # entries: (pending_id, filename, size, sender_ip) tuples
+        policy = eqs_server.auto_accept_policy
+        if not policy.enabled:
+            return
+        matched = [pending_id for pending_id, filename, size, sender_ip in entries if policy.matches(filename, size, sender_ip)]
+        if matched:
+            self.log_message(f"Auto-accepting {len(matched)} of {len(entries)} incoming file(s).", level="INFO")
+            self.accept_files_to_folder(matched)
+
+    def _add_pending_receive_row(self, pending_id, filename, size):
+        self.pending_receives_model.add_rows([(pending_id, filename, size)])
+
+    def _mark_pending_tab(self):
+        # Notify user by changing tab text if not active
+        if self.tab_widget.currentWidget() != self.pending_receives_tab:
+            pending_tab_index = self.tab_widget.indexOf(self.pending_receives_tab)
+            self.tab_widget.setTabText(pending_tab_index, f"Pending Receives ({self.pending_receives_model.pending_count})*")
+
+
+    def refresh_transfers(self):
+        rows = transfers.snapshot()
+        if not rows and not self.transfers_model.rowCount():
+            return
+        self.transfers_model.set_rows(rows)
+        for row in rows:
+            # Accepted files being moved into place also show their progress in the pending list
+            if row['direction'] == 'save' and not row['finished']:
+                self.handle_transfer_progress(row['id'], row['done'], row['total'], row['rate'])
+        active_count = self.transfers_model.active_count()
+        self.tab_widget.setTabText(self.tab_widget.indexOf(self.transfers_tab),
+                                   f"Transfers ({active_count})" if active_count else "Transfers")
+
+    def handle_transfer_progress(self, pending_id, current_bytes, total_bytes, rate=0.0):
+        if pending_id in self.pending_receives_model:
+            if total_bytes > 0:
+                percentage = int((current_bytes / total_bytes) * 100)
+                text = f"{percentage}% ({format_size(current_bytes)}/{format_size(total_bytes)})"
+                if 0 < current_bytes < total_bytes and rate > 0:
+                    text += f" - {format_size(rate)}/s, ETA {format_duration((total_bytes - current_bytes) / rate)}"
+                self.pending_receives_model.set_progress(pending_id, percentage, text)
+            self.pending_receives_model.set_status(pending_id, "Saving...")
+
+
+    def handle_transfer_finished(self, pending_id, success, message_or_path):
+        model = self.pending_receives_model
+        if pending_id in model:
+            if success:
+                model.set_status(pending_id, "Completed")
+                model.set_progress(pending_id, 100, f"Completed: {os.path.basename(message_or_path)}")
+                self.log_message(f"File '{model.filename(pending_id)}' received. Saved to: {message_or_path}", level="INFO")
+            else:
+                model.set_status(pending_id, "Failed")
+                model.set_progress(pending_id, text=f"Failed: {message_or_path}")
+                self.log_message(f"Failed to receive '{model.filename(pending_id)}': {message_or_path}", level="ERROR")
+
+            # Clean up the temporary file from incoming_files_buffer if it still exists
+            if pending_id in incoming_files_buffer:
+                temp_file_info = incoming_files_buffer.pop(pending_id, None)
+                if temp_file_info and os.path.exists(temp_file_info['temp_path']):
+                    try:
+                        os.remove(temp_file_info['temp_path'])
+                        self.log_message(f"Cleaned temp file {temp_file_info['temp_path']} for {pending_id}", level="DEBUG")
+                    except OSError as e:
+                        self.log_message(f"Error removing temp file {temp_file_info['temp_path']}: {e}", level="WARNING")
+            
+            # Update tab text if no more items are "Pending Confirmation"
+            active_pending_count = model.pending_count
+            pending_tab_idx = self.tab_widget.indexOf(self.pending_receives_tab)
+            if active_pending_count > 0:
+                self.tab_widget.setTabText(pending_tab_idx, f"Pending Receives ({active_pending_count})*")
+            else:
+                self.tab_widget.setTabText(pending_tab_idx, "Pending Receives")
+
+
+    def show_pending_receive_context_menu(self, position: QPoint):
+        pending_ids = self._selected_pending_ids()
+        if not pending_ids:
+            # Don't show menu if nothing selected is in a state to be actioned
+            return
+
+        menu = QMenu()
+        save_as_action = None
+        if len(pending_ids) == 1:
+            save_as_action = menu.addAction("Accept File As...")
+            accept_action = menu.addAction("Accept to Receiving Folder")
+            reject_action = menu.addAction("Reject File")
+        else:
+            accept_action = menu.addAction(f"Accept {len(pending_ids)} Files to Receiving Folder")
+            reject_action = menu.addAction(f"Reject {len(pending_ids)} Files")
+
+        action = menu.exec(self.tbl_pending_receives.viewport().mapToGlobal(position))
+
+        if action is None:
+            return
+        if action == save_as_action:
+            self.accept_file_action(pending_ids[0])
+        elif action == accept_action:
+            self.accept_files_to_folder(pending_ids)
+        elif action == reject_action:
+            self.reject_files(pending_ids)
+
+    def _selected_pending_ids(self):
+        # Selected rows that are still awaiting a decision, in table order
+        model = self.pending_receives_model
+        rows = sorted(index.row() for index in self.tbl_pending_receives.selectionModel().selectedRows())
+        return [pending_id for pending_id in map(model.pending_id_at, rows) if model.status(pending_id) == PENDING_STATUS]
+
+    def _receiving_folder(self):
+        save_dir = self.le_receiving_folder.text()
+        if not os.path.isdir(save_dir): # Fallback if dir is invalid
+            save_dir = self.default_receiving_folder
+            self.le_receiving_folder.setText(save_dir) # Update UI
+        os.makedirs(save_dir, exist_ok=True) # Ensure it exists
+        return save_dir
+
+    def accept_selected_action(self):
+        pending_ids = self._selected_pending_ids()
+        if not pending_ids:
+            self.log_message("No pending files selected to accept.", level="WARNING")
+            return
+        self.accept_files_to_folder(pending_ids)
+
+    def reject_selected_action(self):
+        pending_ids = self._selected_pending_ids()
+        if not pending_ids:
+            self.log_message("No pending files selected to reject.", level="WARNING")
+            return
+        self.reject_files(pending_ids)
+
+    def accept_all_pending_action(self):
+        pending_ids = self.pending_receives_model.pending_ids()
+        if not pending_ids:
+            self.log_message("No files are waiting to be accepted.", level="INFO")
+            return
+        self.accept_files_to_folder(pending_ids)
+
+    def accept_files_to_folder(self, pending_ids):
+        # Saves straight into the receiving folder (keeping sub-folders of folder uploads) without
+        # a dialog. Existing files are kept; new ones get "name (1).ext" style names instead.
+        save_dir = self._receiving_folder()
+        queued = 0
+        for pending_id in pending_ids:
+            pending_info = incoming_files_buffer.get(pending_id)
+            if pending_info is None:
+                self.log_message(f"No data for pending ID {pending_id} to accept.", level="ERROR")
+                self.pending_receives_model.set_status(pending_id, "Error: Data lost")
+                continue
+            relative_path = pending_info.get('relative_path', pending_info['original_filename'])
+            final_save_path = os.path.join(save_dir, *relative_path.split('/'))
+            self.pending_receives_model.set_status(pending_id, "Queued")
+            self.finalize_pool.submit(self._process_accepted_file, pending_id, final_save_path, True)
+            queued += 1
+        if queued:
+            self.log_message(f"Accepting {queued} file(s) into '{save_dir}'", level="INFO")
+
+    def reject_files(self, pending_ids):
+        for pending_id in pending_ids:
+            self.reject_file_action(pending_id)
+
+    def accept_file_action(self, pending_id):
+        if pending_id not in incoming_files_buffer:
+            self.log_message(f"No data for pending ID {pending_id} to accept.", level="ERROR")
+            self.pending_receives_model.set_status(pending_id, "Error: Data lost")
+            return
+
+        pending_info = incoming_files_buffer[pending_id]
+        original_filename = pending_info['original_filename']
+
+        save_dir = self._receiving_folder()
+        suggested_path = os.path.join(save_dir, *pending_info.get('relative_path', original_filename).split('/'))
+
+        final_save_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Incoming File As...", suggested_path, f"Files (*{os.path.splitext(original_filename)[1] if '.' in original_filename else '.*'});;All Files (*.*)"
+        )
+
+        if final_save_path:
+            self.log_message(f"Accepting '{original_filename}' to '{final_save_path}'", level="INFO")
+            self.pending_receives_model.set_status(pending_id, "Accepted. Saving...")
+            # Move the file on the finalizer pool to keep UI responsive
+            self.finalize_pool.submit(self._process_accepted_file, pending_id, final_save_path)
+        else:
+            self.log_message(f"Acceptance of '{original_filename}' cancelled by user.", level="INFO")
+            # Status remains "Pending Confirmation"
+
+    def _process_accepted_file(self, pending_id, final_save_path, unique_name=False):
+        try:
+            total_size = incoming_files_buffer[pending_id]['size']
+            # Initial progress update; progress in between is picked up by refresh_transfers
+            self.transfer_progress_signal.emit(pending_id, 0, total_size)
+            final_save_path = save_incoming_file(pending_id, final_save_path, unique_name)
+            # Final progress update
+            self.transfer_progress_signal.emit(pending_id, total_size, total_size)
+            self.transfer_finished_signal.emit(pending_id, True, final_save_path)
+        except Exception as e:
+            self.log_message(f"Error processing accepted file {pending_id}: {e}", level="ERROR")
+            self.transfer_finished_signal.emit(pending_id, False, str(e))
+
+    def reject_file_action(self, pending_id):
+        original_filename = self.pending_receives_model.filename(pending_id) or "Unknown file"
+
+        if pending_id in incoming_files_buffer:
+            temp_info = incoming_files_buffer.pop(pending_id) # Remove from buffer
+            try:
+                if os.path.exists(temp_info['temp_path']):
+                    os.remove(temp_info['temp_path'])
+                self.log_message(f"Rejected and deleted temp file for '{original_filename}' (ID: {pending_id})", level="INFO")
+            except OSError as e:
+                self.log_message(f"Error deleting temp file {temp_info['temp_path']} on reject: {e}", level="WARNING")
+        else:
+            self.log_message(f"No temp data found for ID {pending_id} to reject. File might have been processed or data lost.", level="WARNING")
+
+        self.pending_receives_model.set_status(pending_id, "Rejected by User")
+        self.pending_receives_model.set_progress(pending_id, text="Rejected")
+        # Use transfer_finished to potentially clear the entry or mark as fully processed
+        self.transfer_finished_signal.emit(pending_id, False, "Rejected by user")
+
+
+    def _add_item_to_shared_table(self, file_name, file_size_bytes, file_path, rel_path=None):
+        if self._add_items_to_shared_table([(file_name, file_size_bytes, file_path, rel_path, None)]):
+            return True # Indicate success
+        self.log_message(f"File already shared: {file_path}", level="WARNING")
+        return False # Indicate that the file was not added
+
+    def _add_items_to_shared_table(self, entries):
+        # Bulk add of (name, size_bytes, path, rel_path, identity) tuples; duplicates are skipped by the registry
+        new_items = shared_registry.add_many(entries)
+        if not new_items:
+            return 0
+        self.shared_files_model.append_items(new_items) # One model insertion per batch
+        return len(new_items)
+
+
+    def add_files_action(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Select Files to Share", "", "All Files (*.*)")
+        if file_paths:
+            entries = []
+            for file_path in file_paths:
+                if os.path.isfile(file_path):
+                    file_name = os.path.basename(file_path)
+                    st = os.stat(file_path)
+                    entries.append((file_name, st.st_size, file_path, None, file_identity(st)))
+            added_count = self._add_items_to_shared_table(entries)
+            if added_count > 0:
+                self.log_message(f"Added {added_count} file(s) to shared list.")
+            else:
+                self.log_message("No new files were added (perhaps duplicates or invalid selections).")
+
+
+    def add_folder_action(self):
+        if self.folder_scan_thread and self.folder_scan_thread.is_alive():
+            self.log_message("A folder is already being scanned. Wait for it to finish or cancel it.", level="WARNING")
+            return
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Folder to Share Files From", "")
+        if folder_path:
+            self.start_folder_scan(folder_path)
+
+    def start_folder_scan(self, folder_path):
+        # Files (including those in sub-folders) appear in the list batch by batch as the scan runs
+        self._scan_added_count = 0
+        self.folder_scan_thread = FolderScanThread(
+            folder_path, self.scan_batch_signal.emit, self.scan_progress_signal.emit, self.scan_finished_signal.emit
+        )
+        self.btn_add_folder.setEnabled(False)
+        self.btn_cancel_scan.setVisible(True)
+        self.lbl_scan_status.setText(f"Scanning '{os.path.basename(folder_path)}'...")
+        self.lbl_scan_status.setVisible(True)
+        self.log_message(f"Scanning folder '{folder_path}'...")
+        # Watching starts with the scan, so files created meanwhile aren't missed
+        watcher = FolderWatcher(folder_path, self.folder_change_signal.emit)
+        watcher.start()
+        self.folder_watchers.append(watcher)
+        self.folder_scan_thread.start()
+
+    def cancel_folder_scan_action(self):
+        if self.folder_scan_thread and self.folder_scan_thread.is_alive():
+            self.folder_scan_thread.cancel()
+            self.lbl_scan_status.setText("Cancelling scan...")
+
+    def handle_scan_batch(self, entries):
+        self._scan_added_count += self._add_items_to_shared_table(entries)
+
+    def handle_scan_progress(self, file_count, total_bytes):
+        self.lbl_scan_status.setText(f"Scanning: {file_count:,} files ({format_size(total_bytes)})...")
+
+    def handle_scan_finished(self, file_count, cancelled, error_count):
+        folder_name = os.path.basename(os.path.normpath(self.folder_scan_thread.root)) if self.folder_scan_thread else ""
+        self.folder_scan_thread = None
+        self.btn_add_folder.setEnabled(True)
+        self.btn_cancel_scan.setVisible(False)
+        self.lbl_scan_status.setVisible(False)
+        if error_count:
+            self.log_message(f"{error_count} entries in '{folder_name}' could not be read and were skipped.", level="WARNING")
+        if cancelled:
+            if self.folder_watchers:
+                self.folder_watchers.pop().stop() # A partly shared folder isn't kept up to date
+            self.log_message(f"Scan of '{folder_name}' cancelled after {file_count} file(s); {self._scan_added_count} added.", level="WARNING")
+        elif self._scan_added_count > 0:
+            self.log_message(f"Added {self._scan_added_count} file(s) from folder '{folder_name}'.")
+        else:
+            self.log_message(f"No new files from folder '{folder_name}' were added (perhaps duplicates or folder is empty/contains no files).")
+
+    def handle_folder_change(self, added, removed, updated):
+        # Changes a FolderWatcher already applied to the registry; mirrored into the table
+        self.shared_files_model.remove_uids(item['uid'] for item in removed)
+        self.shared_files_model.append_items(added)
+        self.shared_files_model.replace_items(updated)
+
+    def remove_selected_shared_files_action(self):
+        selected_rows = [index.row() for index in self.tbl_shared_files.selectionModel().selectedRows()]
+        if not selected_rows:
+            self.log_message("No files selected to remove.", level="WARNING")
+            return
+
+        uids = self.shared_files_model.uids_for_rows(selected_rows)
+        removed_count = len(shared_registry.remove_many(uids)) # One registry update for the whole selection
+        self.shared_files_model.remove_uids(uids)               # ...and one model update
+
+        if removed_count > 0:
+            self.log_message(f"Removed {removed_count} file(s) from shared list.")
+
+
+    def clear_all_shared_files_action(self):
+        if not len(shared_registry):
+            self.log_message("Shared files list is already empty.", level="INFO")
+            return
+
+        reply = QMessageBox.question(self, "Confirm Clear", "Are you sure you want to remove all shared files?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                     QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            self._stop_folder_watchers()
+            self.shared_files_model.clear()     # Clear table
+            shared_registry.clear()             # Clear internal data (Flask reads the same registry)
+            self.log_message("Cleared all shared files.")
+
+    def _stop_folder_watchers(self):
+        for watcher in self.folder_watchers:
+            watcher.stop()
+        self.folder_watchers = []
+
+    def toggle_server_action(self):
+        if self.server_thread and self.server_thread.is_alive():
+            self.stop_server()
+        else:
+            self.start_server()
+
+    def start_server(self):
+        if self.server_thread and self.server_thread.is_alive():
+            self.log_message("Server is already running.", level="WARNING")
+            return
+        try:
+            self._update_upload_staging_dir()
+            host_ip = get_local_ip()
+            backend = self.cmb_server_backend.currentText()
+            options = {'workers': self.spn_server_workers.value()} if backend == 'pool' else {}
+            self.server_thread = ServerThread(flask_app, host=host_ip, port=self.server_port, backend=backend, **options)
+            self.server_thread.start()
+
+            self.lbl_status_value.setText("Running")
+            self.lbl_status_value.setStyleSheet("color: green;")
+            url = f"http://{host_ip}:{self.server_port}"
+            self.lbl_url_value.setText(f"<a href='{url}'>{url}</a>")
+            self.btn_toggle_server.setText("Stop Server")
+            self.btn_open_browser.setEnabled(True)
+            self.log_message(f"Server started ({backend} backend). Listening on {url}")
+            self.log_message(f"Upload endpoints available at POST {url}/upload and PUT {url}/upload/<name>", level="DEBUG")
+
+        except Exception as e:
+            self.log_message(f"Failed to start server: {e}", level="ERROR")
+            QMessageBox.critical(self, "Server Start Error", f"Could not start the server: {e}")
+            self.lbl_status_value.setText("Error")
+            self.lbl_status_value.setStyleSheet("color: red;")
+            self.lbl_url_value.setText("N/A")
+            self.btn_toggle_server.setText("Start Server")
+            self.btn_open_browser.setEnabled(False)
+
+
+    def stop_server(self):
+        if self.server_thread and self.server_thread.is_alive():
+            try:
+                self.log_message("Stopping server...", level="INFO")
+                self.server_thread.shutdown()
+                self.server_thread.join(timeout=5) # Wait for thread to finish
+                if self.server_thread.is_alive():
+                    self.log_message("Server thread did not stop gracefully. It might take a moment.", level="WARNING")
+                    # Further action might be needed if it's truly stuck
+                else:
+                    self.log_message("Server stopped successfully.", level="INFO")
+            except Exception as e:
+                self.log_message(f"Error stopping server: {e}", level="ERROR")
+            finally:
+                self.server_thread = None # Clear the reference
+                self.lbl_status_value.setText("Stopped")
+                self.lbl_status_value.setStyleSheet("color: red;")
+                self.lbl_url_value.setText("N/A")
+                self.btn_toggle_server.setText("Start Server")
+                self.btn_open_browser.setEnabled(False)
+        else:
+            self.log_message("Server is not running.", level="WARNING")
+
+
+    def open_browser_action(self):
+        if self.server_thread and self.server_thread.is_alive():
+            url = f"http://{self.server_thread.host}:{self.server_thread.port}"
+            try:
+                webbrowser.open(url)
+                self.log_message(f"Opened '{url}' in browser.")
+            except Exception as e:
+                self.log_message(f"Failed to open browser: {e}", level="ERROR")
+                QMessageBox.warning(self, "Browser Error", f"Could not open URL: {e}")
+        else:
+            self.log_message("Cannot open in browser: Server not running.", level="WARNING")
+
+
+    def clear_logs_action(self):
+        log_buffer.drain() # Also discard anything not shown yet
+        self.txt_logs.clear()
+
+    def browse_receiving_folder_action(self):
+        current_path = self.le_receiving_folder.text()
+        if not current_path or not os.path.isdir(current_path):
+            current_path = self.default_receiving_folder # Use default if current is invalid
+
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Default Receiving Folder", current_path)
+        if folder_path: # If user selected a folder
+            self.le_receiving_folder.setText(folder_path)
+            self.default_receiving_folder = folder_path # Update the actual default
+            self.log_message(f"Default receiving folder set to: {folder_path}")
+            if self.server_thread and self.server_thread.is_alive():
+                self._update_upload_staging_dir()
+
+    def _update_upload_staging_dir(self):
+        # Stage new uploads on the receiving folder's filesystem so accepting them is a rename
+        receiving_folder = self.le_receiving_folder.text()
+        if not os.path.isdir(receiving_folder):
+            receiving_folder = self.default_receiving_folder
+        staging_dir = set_upload_staging_dir(receiving_folder)
+        self.log_message(f"Staging uploads in {staging_dir}", level="DEBUG")
+
+
+    def update_auto_accept_policy(self, *_):
+        try:
+            policy = AutoAcceptPolicy.from_text(
+                self.grp_auto_accept.isChecked(), self.le_auto_accept_senders.text(),
+                self.spn_auto_accept_max_size.value(), self.le_auto_accept_extensions.text()
+            )
+        except ValueError as e:
+            self.log_message(f"Invalid auto-accept address: {e}", level="WARNING")
+            return
+        eqs_server.auto_accept_policy = policy
+        self.log_message(f"Auto-accept {'enabled' if policy.enabled else 'disabled'}.", level="DEBUG")
+
+    def toggle_sendfile_action(self, checked):
+        eqs_server.DOWNLOAD_USE_SENDFILE = checked
+        self.log_message(f"Zero-copy downloads {'enabled' if checked else 'disabled'}.")
+
+    def toggle_compression_action(self, checked):
+        eqs_server.DOWNLOAD_COMPRESSION = checked
+        self.log_message(f"Compressed downloads {'enabled' if checked else 'disabled'}.")
+
+    def toggle_hashing_action(self, checked):
+        eqs_server.CONTENT_HASHING = checked
+        if checked:
+            content_hasher.start()
+        else:
+            content_hasher.stop()
+        self.log_message(f"Checksums {'enabled' if checked else 'disabled'}.")
+
+
+    def closeEvent(self, event):
+        self.log_message("Application closing. Attempting to stop server if running...")
+        if self.folder_scan_thread and self.folder_scan_thread.is_alive():
+            self.folder_scan_thread.cancel()
+        self.finalize_pool.shutdown(wait=False, cancel_futures=True) # Queued accepts are dropped; a running move finishes
+        content_hasher.stop()
+        self._stop_folder_watchers()
+        self.stop_server()
+        # Cleanup the upload staging folders
+        try:
+            remove_upload_staging_dirs()
+            self.log_message("Cleaned up temporary upload directories.", level="DEBUG")
+        except Exception as e:
+            self.log_message(f"Error cleaning up temp directories: {e}", level="WARNING")
+        event.accept()
+
+
+def run_gui(argv=None):
+    # Ensure the upload staging folder exists (though mkdtemp should create it)
+    if not os.path.exists(eqs_server.UPLOAD_TEMP_DIR):
+        os.makedirs(eqs_server.UPLOAD_TEMP_DIR, exist_ok=True)
+
+    app = QApplication(sys.argv if argv is None else argv)
+    if os.path.exists(icon_ico_path):
+        app.setWindowIcon(QIcon(icon_ico_path))
+    else:
+        print(f"Warning: Application icon file not found at {icon_ico_path}", file=sys.stderr)
+
+    # Apply a basic style if desired (optional)
+    # app.setStyle("Fusion")
+    main_window = EQSApp()
+    main_window.show()
+    return app.exec()
@@ -0,0 +1,37 @@
+import os
+import hashlib
+
+try:
+    import blake3 # Optional and much faster; SHA-256 is used without it
+except ImportError:
+    blake3 = None
+
+# File hashing for the shared files. This module is what the hashing worker processes import,
+# so it must only need the standard library (and blake3 when installed): eqs_server, Flask and
+# PyQt6 are never loaded in the workers.
+HASH_ALGORITHM = 'blake3' if blake3 is not None else 'sha256'
+HASH_READ_SIZE = 1024 * 1024
+
+
+def file_identity(st):
+    # A file's content can only have changed if one of these did
+    return f"{st.st_dev:x}:{st.st_ino:x}:{st.st_size:x}:{st.st_mtime_ns:x}"
+
+
+def new_hash(algorithm=HASH_ALGORITHM):
+    return blake3.blake3() if algorithm == 'blake3' else hashlib.new(algorithm)
+
+
+def hash_file(path, algorithm=HASH_ALGORITHM):
+    # Returns (hex digest, identity of the file after reading it); the caller only keeps the
+    # digest if the identity still matches the one it saw before, i.e. the file didn't change
+    digest = new_hash(algorithm)
+    buf = bytearray(HASH_READ_SIZE)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buf)
+            if not count:
+                break
+            digest.update(view[:count])
+        return digest.hexdigest(), file_identity(os.fstat(f.fileno()))
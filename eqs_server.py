@@ -0,0 +1,4181 @@
+import sys
+import os
+import socket
+import threading
+import shutil
+import tempfile
+import time
+import html
+import json
+import base64
+import array
+import bisect
+import hashlib
+import hmac
+import signal
+import re
+import select
+import stat
+import struct
+import tarfile
+import zipfile
+import itertools
+import collections
+import mimetypes
+import urllib.parse
+import uuid
+import errno
+import io
+import zlib
+import queue
+import ctypes
+import ctypes.util
+import ipaddress
+import concurrent.futures
+import multiprocessing
+import sqlite3
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from eqs_hashing import HASH_ALGORITHM, file_identity, hash_file
+from flask import Flask, send_from_directory, jsonify, abort, request, make_response
+from werkzeug.serving import make_server, BaseWSGIServer, WSGIRequestHandler, select_address_family
+from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge, InternalServerError
+from werkzeug.sansio.multipart import (
+    MultipartDecoder, NeedData, Epilogue, Data as MultipartData, Field as MultipartField, File as MultipartFile
+)
+from werkzeug.http import http_date, parse_date, parse_range_header, is_resource_modified
+
+# --- Global base directory for resources ---
+basedir = os.path.dirname(os.path.abspath(__file__))
+icon_ico_path = os.path.join(basedir, 'icon.ico')
+# For the Flask route:
+# The filename as it will appear in the URL and as it is on disk
+icon_web_png_filename = 'iconweb.png'
+# The directory where iconweb.png is located
+icon_web_png_dir = basedir
+
+
+# --- Utility Functions ---
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def format_size(size_bytes):
+    if not isinstance(size_bytes, (int, float)) or size_bytes < 0:
+        return "N/A"
+    if size_bytes == 0:
+        return "0 B"
+    size_name = ("B", "KiB", "MiB", "GiB", "TiB", "PiB", "EiB", "ZiB", "YiB")
+    i = 0
+    while size_bytes >= 1024 and i < len(size_name) - 1:
+        size_bytes /= 1024.0
+        i += 1
+    return f"{size_bytes:.2f} {size_name[i]}"
+
+def get_local_ip():
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            ip = s.getsockname()[0]
+    except Exception:
+        ip = "127.0.0.1"
+    return ip
+
+# --- Logging ---
+# Everything goes through the standard logging module. The GUI does not receive messages one by
+# one: records land in a bounded ring buffer (safe to fill from any thread) and the window drains
+# it in batches on a timer. Level filtering happens in the logger, before a record is formatted.
+LOG_BUFFER_CAPACITY = 5000      # Records held between flushes; the oldest are dropped beyond this
+LOG_VIEW_MAX_LINES = 10000      # Lines kept in the Logs tab
+LOG_FLUSH_INTERVAL_MS = 100
+LOG_FILE_PATH = os.environ.get("EQS_LOG_FILE") or os.path.join(os.path.expanduser("~"), ".eqs", "EQS.log")
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 3
+LOG_LEVELS = {"NOTSET": logging.NOTSET, "DEBUG": logging.DEBUG, "INFO": logging.INFO,
+              "WARNING": logging.WARNING, "ERROR": logging.ERROR, "CRITICAL": logging.CRITICAL}
+
+logger = logging.getLogger("EQS")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+class LogRingBuffer(logging.Handler):
+    def __init__(self, capacity):
+        super().__init__()
+        self._records = collections.deque(maxlen=capacity)
+        self.dropped = 0
+
+    def emit(self, record):
+        # Called with the handler lock held; formatting is deferred until the record is displayed
+        if len(self._records) == self._records.maxlen:
+            self.dropped += 1
+        self._records.append(record)
+
+    def drain(self):
+        # Returns (records, dropped_count) and empties the buffer
+        with self.lock:
+            records = list(self._records)
+            self._records.clear()
+            dropped, self.dropped = self.dropped, 0
+        return records, dropped
+
+log_buffer = LogRingBuffer(LOG_BUFFER_CAPACITY)
+log_buffer.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s", "%H:%M:%S"))
+logger.addHandler(log_buffer)
+_log_file_handler = None
+
+def set_log_level(level_name):
+    # NOTSET on a named logger would defer to the root logger's level, so map it to "everything"
+    logger.setLevel(LOG_LEVELS.get(level_name.upper(), logging.INFO) or 1)
+
+def enable_file_logging(path=LOG_FILE_PATH):
+    global _log_file_handler
+    if _log_file_handler is not None:
+        return _log_file_handler.baseFilename
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    _log_file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    _log_file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+    logger.addHandler(_log_file_handler)
+    return _log_file_handler.baseFilename
+
+def disable_file_logging():
+    global _log_file_handler
+    if _log_file_handler is not None:
+        logger.removeHandler(_log_file_handler)
+        _log_file_handler.close()
+        _log_file_handler = None
+
+# --- Shared file registry ---
+def shared_item_uid(path):
+    # Stable identifier for a shared file, derived from its absolute path
+    normalized = os.path.normcase(os.path.abspath(path))
+    return hashlib.sha1(normalized.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+
+class SharedRegistry:
+    # Every shared file, keyed by its stable path-derived ID. Lookup, insert and remove are
+    # O(1) dict operations; readers take an immutable snapshot that is rebuilt at most once
+    # per change. Item dicts are never mutated once added.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {} # uid -> item, in insertion order
+        self._seq = itertools.count() # Insertion order, used by the "added" listing sort
+        self._snapshot = ()
+        self._snapshot_version = 0
+        self._listeners = []
+        self.version = 0 # Bumped on every change; keys the index page and listing caches
+
+    def add_listener(self, callback):
+        # callback(added_items, removed_items) runs under the registry lock, so listeners see
+        # changes in order; they must only queue work and never call back into the registry
+        self._listeners.append(callback)
+
+    def _notify(self, added, removed):
+        for callback in self._listeners:
+            callback(added, removed)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, uid):
+        return self._items.get(uid)
+
+    def get_by_path(self, path):
+        return self._items.get(shared_item_uid(path))
+
+    def add_many(self, entries):
+        # entries: iterable of (name, size_bytes, path, rel_path, identity), identity being the
+        # file_identity() of the stat the entry was made from or None; returns the items added
+        added = []
+        with self._lock:
+            for name, size_bytes, path, rel_path, identity in entries:
+                uid = shared_item_uid(path)
+                if uid in self._items: # Already shared
+                    continue
+                item = {
+                    'uid': uid,
+                    'seq': next(self._seq),
+                    'name': name,
+                    'rel_path': rel_path or name, # Path inside archives, e.g. "Photos/img.jpg"
+                    'size_bytes': size_bytes,
+                    'path': path,
+                    'identity': identity,
+                }
+                self._items[uid] = item
+                added.append(item)
+            if added:
+                self.version += 1
+                self._notify(added, ())
+        return added
+
+    def remove_many(self, uids):
+        removed = []
+        with self._lock:
+            for uid in uids:
+                item = self._items.pop(uid, None)
+                if item is not None:
+                    removed.append(item)
+            if removed:
+                self.version += 1
+                self._notify((), removed)
+        return removed
+
+    def update_many(self, changes):
+        # changes: iterable of (uid, size_bytes, identity) for files whose content changed. Each
+        # item is replaced by a copy (listeners see the old one removed and the new one added);
+        # returns the new items.
+        updated = []
+        replaced = []
+        with self._lock:
+            for uid, size_bytes, identity in changes:
+                item = self._items.get(uid)
+                if item is None:
+                    continue
+                new_item = dict(item, size_bytes=size_bytes, identity=identity)
+                self._items[uid] = new_item # Keeps its place in insertion order
+                replaced.append(item)
+                updated.append(new_item)
+            if updated:
+                self.version += 1
+                self._notify(updated, replaced)
+        return updated
+
+    def clear(self):
+        with self._lock:
+            if self._items:
+                removed = tuple(self._items.values())
+                self._items.clear()
+                self.version += 1
+                self._notify((), removed)
+
+    def snapshot(self):
+        # Returns (version, items) taken together, so caches are never keyed on a stale list
+        with self._lock:
+            if self._snapshot_version != self.version:
+                self._snapshot = tuple(self._items.values())
+                self._snapshot_version = self.version
+            return self.version, self._snapshot
+
+# --- Flask Server ---
+flask_app = Flask(__name__)
+shared_registry = SharedRegistry()
+# The front end that decides what happens to uploads: the desktop window (EQSApp) or the headless
+# daemon (HeadlessReceiver). It provides accepting_uploads() -> bool and
+# notify_incoming(batch_id, entries), called from server threads with batch_id None for a single
+# file and entries as [(pending_id, relative_path, size, sender_ip), ...].
+upload_receiver = None
+# Fallback staging folder; set_upload_staging_dir() moves it next to the receiving folder
+UPLOAD_TEMP_DIR = tempfile.mkdtemp(prefix="EQS_uploads_")
+_UPLOAD_FALLBACK_DIR = UPLOAD_TEMP_DIR
+incoming_files_buffer = {}
+# Distinguishes ETags across restarts, since the version counter starts over at 0
+_INSTANCE_TAG = f"{os.getpid():x}{int(time.time()):x}"
+_index_page_cache = {}
+_index_page_cache_lock = threading.Lock()
+
+@flask_app.route(f'/{icon_web_png_filename}')
+def serve_web_favicon():
+    return send_from_directory(icon_web_png_dir, icon_web_png_filename, mimetype='image/png')
+
+# SVG Icons (defined as Python strings for easy embedding)
+SVG_DOWNLOAD_ICON = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="currentColor" style="vertical-align: middle; margin-right: 6px; width:18px; height:18px;"><path d="M12 15.586l-4.293-4.293a1 1 0 011.414-1.414L11 12.172V4a1 1 0 112 0v8.172l1.879-1.879a1 1 0 111.414 1.414L12 15.586zM5 18h14a1 1 0 110 2H5a1 1 0 110-2z"></path></svg>"""
+SVG_UPLOAD_BUTTON_ICON = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="currentColor" style="vertical-align: middle; margin-right: 10px; width:20px; height:20px;"><path d="M11 15V9.414l-2.293 2.293a1 1 0 01-1.414-1.414l4-4a1 1 0 011.414 0l4 4a1 1 0 01-1.414 1.414L13 9.414V15a1 1 0 11-2 0zm-1 3H6.5A3.5 3.5 0 013 14.5V13a1 1 0 012 0v1.5A1.5 1.5 0 006.5 16H10a1 1 0 010 2zm10-2h-3.5A1.5 1.5 0 0015 14.5V13a1 1 0 112 0v1.5a3.5 3.5 0 01-3.5 3.5H13a1 1 0 010-2z"></path></svg>"""
+SVG_STATUS_UPLOADING_ICON = """<svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" class="animate-spin" style="vertical-align: middle; margin-right: 8px;"><line x1="12" y1="2" x2="12" y2="6"></line><line x1="12" y1="18" x2="12" y2="22"></line><line x1="4.93" y1="4.93" x2="7.76" y2="7.76"></line><line x1="16.24" y1="16.24" x2="19.07" y2="19.07"></line><line x1="2" y1="12" x2="6" y2="12"></line><line x1="18" y1="12" x2="22" y2="12"></line><line x1="4.93" y1="19.07" x2="7.76" y2="16.24"></line><line x1="16.24" y1="7.76" x2="19.07" y2="4.93"></line></svg>"""
+SVG_STATUS_SUCCESS_ICON = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="currentColor" width="20" height="20" style="vertical-align: middle; margin-right: 8px;"><path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2zm0 18c-4.41 0-8-3.59-8-8s3.59-8 8-8 8 3.59 8 8-3.59 8-8 8zm-2.07-5.83L16.59 7.5 18 8.91l-7.07 7.07-4.5-4.5 1.41-1.41z"></path></svg>"""
+SVG_STATUS_ERROR_ICON = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="currentColor" width="20" height="20" style="vertical-align: middle; margin-right: 8px;"><path d="M12 2C6.48 2 2 6.48 2 12s4.48 10 10 10 10-4.48 10-10S17.52 2 12 2zm0 18c-4.41 0-8-3.59-8-8s3.59-8 8-8 8 3.59 8 8-3.59 8-8 8zm-1-13h2v6h-2zm0 8h2v2h-2z"></path></svg>"""
+
+# Rows rendered into the page itself; the rest are fetched from /api/files as the user scrolls
+INDEX_FIRST_PAGE_SIZE = 100
+LISTING_DEFAULT_PAGE_SIZE = 100
+LISTING_MAX_PAGE_SIZE = 1000
+# Every sort key ends with the item's uid so keys are unique and cursors are unambiguous
+LISTING_SORT_KEYS = {
+    'added': lambda item: (item['seq'], item['uid']),
+    'name': lambda item: (item['name'].casefold(), item['uid']),
+    'size': lambda item: (item['size_bytes'], item['uid']),
+}
+# Type of the first key element for each cursor kind (the second is always the uid); a cursor
+# with other types would make the bisect compare unlike values
+LISTING_CURSOR_TYPES = {'added': int, 'name': str, 'size': int, 'search': int}
+_listing_cache = {}
+_listing_cache_lock = threading.Lock()
+
+# Loads further pages of the file table from /api/files (plain string, not an f-string)
+LISTING_SCRIPT = """
+<script>
+(function() {
+    var table = document.getElementById('filesTable');
+    var body = document.getElementById('filesBody');
+    var sentinel = document.getElementById('filesSentinel');
+    var emptyMessage = document.getElementById('filesEmpty');
+    var searchInput = document.getElementById('filesSearch');
+    var iconTemplate = document.getElementById('downloadIconTemplate');
+    var state = {
+        sort: table.dataset.sort,
+        order: table.dataset.order,
+        query: '',
+        cursor: table.dataset.nextCursor || null,
+        done: !table.dataset.nextCursor,
+        loading: false,
+        generation: 0
+    };
+
+    function appendRows(items) {
+        var fragment = document.createDocumentFragment();
+        items.forEach(function(item) {
+            var row = document.createElement('tr');
+            var selectCell = document.createElement('td');
+            var checkbox = document.createElement('input');
+            checkbox.type = 'checkbox';
+            checkbox.className = 'select-item';
+            checkbox.value = item.id;
+            selectCell.appendChild(checkbox);
+            var nameCell = document.createElement('td');
+            if (item.thumb_url) {
+                // Native lazy loading: the thumbnail is only requested once its row nears the screen
+                var thumb = document.createElement('img');
+                thumb.className = 'thumb';
+                thumb.src = item.thumb_url;
+                thumb.alt = '';
+                thumb.loading = 'lazy';
+                thumb.decoding = 'async';
+                thumb.onerror = function() { eqsThumbError(this); };
+                nameCell.appendChild(thumb);
+            }
+            nameCell.appendChild(document.createTextNode(item.name));
+            var sizeCell = document.createElement('td');
+            sizeCell.textContent = item.size;
+            var actionCell = document.createElement('td');
+            var link = document.createElement('a');
+            link.href = item.download_url;
+            link.className = 'download-link';
+            link.appendChild(iconTemplate.content.cloneNode(true));
+            link.appendChild(document.createTextNode('Download'));
+            actionCell.appendChild(link);
+            row.append(selectCell, nameCell, sizeCell, actionCell);
+            fragment.appendChild(row);
+        });
+        body.appendChild(fragment);
+    }
+
+    function updateVisibility() {
+        var hasRows = body.rows.length > 0;
+        table.style.display = hasRows ? '' : 'none';
+        emptyMessage.textContent = state.query ? 'No files match your search.' : 'No files are currently shared.';
+        emptyMessage.style.display = hasRows || !state.done ? 'none' : 'block';
+    }
+
+    async function loadMore() {
+        if (state.loading || state.done) return;
+        state.loading = true;
+        var generation = state.generation;
+        // Search results come in the order the files were added, so sorting only applies to the full list
+        var params = state.query ? new URLSearchParams({ q: state.query })
+                                 : new URLSearchParams({ sort: state.sort, order: state.order });
+        if (state.cursor) params.set('cursor', state.cursor);
+        try {
+            const response = await fetch((state.query ? '/api/search?' : '/api/files?') + params.toString());
+            const data = await response.json();
+            if (generation !== state.generation) return; // Sort or search changed while loading
+            if (!response.ok) throw new Error(data.error || ('HTTP ' + response.status));
+            appendRows(data.items);
+            state.cursor = data.next_cursor;
+            state.done = !data.next_cursor;
+        } catch (err) {
+            console.error('Could not load the file list:', err);
+            state.done = true;
+        } finally {
+            if (generation === state.generation) {
+                state.loading = false;
+                updateVisibility();
+                // Re-observe so another page is requested if the sentinel is still on screen
+                observer.unobserve(sentinel);
+                observer.observe(sentinel);
+            }
+        }
+    }
+
+    function reload() {
+        state.generation += 1;
+        state.cursor = null;
+        state.done = false;
+        state.loading = false;
+        body.textContent = '';
+        updateSortIndicators();
+        loadMore();
+    }
+
+    function updateSortIndicators() {
+        table.querySelectorAll('th.sortable').forEach(function(header) {
+            header.classList.remove('sort-asc', 'sort-desc');
+            if (!state.query && header.dataset.sort === state.sort) {
+                header.classList.add(state.order === 'desc' ? 'sort-desc' : 'sort-asc');
+            }
+        });
+    }
+
+    table.querySelectorAll('th.sortable').forEach(function(header) {
+        header.addEventListener('click', function() {
+            if (state.query) return;
+            if (state.sort === header.dataset.sort) {
+                state.order = state.order === 'asc' ? 'desc' : 'asc';
+            } else {
+                state.sort = header.dataset.sort;
+                state.order = 'asc';
+            }
+            reload();
+        });
+    });
+
+    // The server searches every shared file; results replace the list a moment after typing stops
+    var searchTimer = null;
+    searchInput.addEventListener('input', function() {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(function() {
+            var query = searchInput.value.trim();
+            if (query === state.query) return;
+            state.query = query;
+            reload();
+        }, 250);
+    });
+
+    // Selected rows are posted to /archive and come back as a single streamed ZIP/TAR
+    document.getElementById('archiveForm').addEventListener('submit', function(e) {
+        var form = e.target;
+        form.querySelectorAll('input[name="id"]').forEach(function(input) { input.remove(); });
+        var selected = body.querySelectorAll('input.select-item:checked');
+        if (!selected.length) {
+            e.preventDefault();
+            alert('Select one or more files first.');
+            return;
+        }
+        selected.forEach(function(checkbox) {
+            var input = document.createElement('input');
+            input.type = 'hidden';
+            input.name = 'id';
+            input.value = checkbox.value;
+            form.appendChild(input);
+        });
+    });
+
+    var observer = new IntersectionObserver(function(entries) {
+        if (entries.some(function(entry) { return entry.isIntersecting; })) loadMore();
+    }, { rootMargin: '600px' });
+    observer.observe(sentinel);
+    updateSortIndicators();
+    updateVisibility();
+})();
+</script>
+"""
+
+
+def _sorted_listing(sort):
+    # Sorted snapshot of the shared items plus their sort keys, rebuilt once per list version
+    version, snapshot = shared_registry.snapshot()
+    with _listing_cache_lock:
+        cached = _listing_cache.get(sort)
+        if cached is None or cached[0] != version:
+            key_func = LISTING_SORT_KEYS[sort]
+            items = sorted(snapshot, key=key_func)
+            cached = (version, items, [key_func(item) for item in items])
+            _listing_cache[sort] = cached
+    return cached[1], cached[2]
+
+def _encode_listing_cursor(sort, key):
+    raw = json.dumps([sort, *key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_listing_cursor(sort, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor.")
+    if cursor_sort != sort or len(key) != 2:
+        raise ValueError("Cursor does not match the requested sort order.")
+    if type(key[0]) is not LISTING_CURSOR_TYPES[sort] or type(key[1]) is not str:
+        raise ValueError("Malformed cursor.")
+    return tuple(key)
+
+def _listing_page(sort='added', descending=False, cursor=None, limit=LISTING_DEFAULT_PAGE_SIZE):
+    # Keyset pagination: the cursor is the sort key of the last item on the previous page,
+    # so pages stay consistent even when items are added or removed in between.
+    items, keys = _sorted_listing(sort)
+    cursor_key = _decode_listing_cursor(sort, cursor) if cursor else None
+    if descending:
+        end = bisect.bisect_left(keys, cursor_key) if cursor_key is not None else len(keys)
+        start = max(0, end - limit)
+        page = items[start:end][::-1]
+        has_more = start > 0
+    else:
+        start = bisect.bisect_right(keys, cursor_key) if cursor_key is not None else 0
+        page = items[start:start + limit]
+        has_more = start + limit < len(items)
+    next_cursor = None
+    if page and has_more:
+        # The last item shown is items[start] when walking backwards
+        next_cursor = _encode_listing_cursor(sort, keys[start] if descending else keys[start + len(page) - 1])
+    return page, next_cursor, len(items)
+
+def _listing_item_json(item):
+    return {
+        'id': item['uid'],
+        'name': item['name'],
+        'size_bytes': item['size_bytes'],
+        'size': format_size(item['size_bytes']),
+        'rel_path': item['rel_path'],
+        'download_url': f"/download/{item['uid']}",
+        'hash': content_hasher.digest_for_item(item['uid']), # None until the file has been hashed
+        'hash_algorithm': content_hasher.algorithm,
+        'thumb_url': _thumbnail_url(item), # None for files without a preview
+    }
+
+# Defined before the table, so images that fail while the page is still loading find it
+THUMB_RETRY_SCRIPT = """
+<script>
+// A thumbnail still being made answers 503; ask again a few times, then give up on the image
+function eqsThumbError(img) {
+    var tries = Number(img.dataset.tries || 0) + 1;
+    if (tries > 4) { img.remove(); return; }
+    img.dataset.tries = tries;
+    setTimeout(function() {
+        var url = new URL(img.src);
+        url.searchParams.set('try', tries);
+        img.src = url.toString();
+    }, 1000 * tries);
+}
+</script>
+"""
+
+def _thumbnail_img(item):
+    url = _thumbnail_url(item)
+    if url is None:
+        return ''
+    return f'<img class="thumb" src="{url}" alt="" loading="lazy" decoding="async" onerror="eqsThumbError(this)">'
+
+def _build_listing_section():
+    page, next_cursor, _ = _listing_page(limit=INDEX_FIRST_PAGE_SIZE)
+    rows = "".join(
+        f'<tr><td><input type="checkbox" class="select-item" value="{item["uid"]}"></td>'
+        f'<td>{_thumbnail_img(item)}{html.escape(item["name"])}</td><td>{format_size(item["size_bytes"])}</td>'
+        f'<td><a href="/download/{item["uid"]}" class="download-link">{SVG_DOWNLOAD_ICON}Download</a></td></tr>'
+        for item in page
+    )
+    folders = sorted({item['rel_path'].split('/', 1)[0] for item in shared_registry.snapshot()[1] if '/' in item['rel_path']}, key=str.casefold)
+    folder_links = " ".join(
+        f'<a href="/archive?folder={urllib.parse.quote(folder)}&amp;format=zip" class="download-link">{SVG_DOWNLOAD_ICON}{html.escape(folder)}</a>'
+        for folder in folders
+    )
+    return f"""{THUMB_RETRY_SCRIPT if THUMBNAILS else ''}<div id="filesEmpty" class="no-files-message"{'' if not page else ' style="display:none;"'}>No files are currently shared.</div>
+    {f'<div class="archive-folders">Shared folders (ZIP): {folder_links}</div>' if folders else ''}
+    <input type="search" id="filesSearch" class="files-search" placeholder="Search shared files" maxlength="{SEARCH_MAX_QUERY_LENGTH}"{'' if page else ' style="display:none;"'}>
+    <form id="archiveForm" class="archive-toolbar" method="post" action="/archive"{'' if page else ' style="display:none;"'}>
+        <button type="submit" name="format" value="zip">Download selected as ZIP</button>
+        <button type="submit" name="format" value="tar">Download selected as TAR</button>
+        <a href="/archive?all=1&amp;format=zip" class="download-link">{SVG_DOWNLOAD_ICON}Download everything (ZIP)</a>
+    </form>
+    <table class="files-table" id="filesTable" data-sort="added" data-order="asc" data-next-cursor="{next_cursor or ''}"{'' if page else ' style="display:none;"'}>
+        <thead><tr><th></th><th class="sortable" data-sort="name">Name</th><th class="sortable" data-sort="size">Size</th><th>Action</th></tr></thead>
+        <tbody id="filesBody">{rows}</tbody>
+    </table>
+    <div id="filesSentinel"></div>
+    <template id="downloadIconTemplate">{SVG_DOWNLOAD_ICON}</template>
+    {LISTING_SCRIPT}"""
+
+# Files at least this large are uploaded through the resumable /api/uploads protocol
+RESUMABLE_UPLOAD_THRESHOLD = 32 * 1024 * 1024
+# Client side of the resumable upload protocol (plain string, not an f-string)
+RESUMABLE_UPLOAD_SCRIPT = """
+<script>
+(function() {
+    var PARALLEL_CHUNKS = 4;
+    var MAX_ATTEMPTS = 8;
+
+    function sleep(ms) {
+        return new Promise(function(resolve) { setTimeout(resolve, ms); });
+    }
+
+    function storageGet(key) {
+        try { return localStorage.getItem(key); } catch (err) { return null; }
+    }
+
+    function storageSet(key, value) {
+        try {
+            if (value === null) localStorage.removeItem(key); else localStorage.setItem(key, value);
+        } catch (err) { /* Private browsing: resuming across page loads is unavailable */ }
+    }
+
+    async function sendChunk(uploadId, file, range) {
+        for (var attempt = 1; ; attempt++) {
+            var response = null;
+            try {
+                response = await fetch('/api/uploads/' + uploadId, {
+                    method: 'PATCH',
+                    headers: { 'Upload-Offset': String(range[0]), 'Content-Type': 'application/offset+octet-stream' },
+                    body: file.slice(range[0], range[1])
+                });
+            } catch (err) {
+                // Network error (e.g. the laptop went to sleep): retry below
+            }
+            if (response && response.ok) return;
+            if (response && response.status >= 400 && response.status < 500) {
+                var data = await response.json().catch(function() { return {}; });
+                throw new Error(data.error || ('HTTP ' + response.status));
+            }
+            if (attempt >= MAX_ATTEMPTS) throw new Error('Upload interrupted. Select the file again to resume.');
+            await sleep(Math.min(30000, 1000 * Math.pow(2, attempt - 1)));
+        }
+    }
+
+    window.eqsResumableUpload = async function(file, onProgress) {
+        var storageKey = 'eqs-upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+        var status = null;
+        var storedId = storageGet(storageKey);
+        if (storedId) {
+            var existing = await fetch('/api/uploads/' + encodeURIComponent(storedId));
+            if (existing.ok) status = await existing.json(); else storageSet(storageKey, null);
+        }
+        if (!status) {
+            var created = await fetch('/api/uploads', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ name: file.name, size: file.size })
+            });
+            status = await created.json();
+            if (!created.ok) return { response: created, data: status };
+            storageSet(storageKey, status.id);
+        }
+
+        var queue = [];
+        status.missing.forEach(function(range) {
+            for (var start = range[0]; start < range[1]; start += status.chunk_size) {
+                queue.push([start, Math.min(start + status.chunk_size, range[1])]);
+            }
+        });
+        var done = status.received;
+        onProgress(done, file.size);
+        async function worker() {
+            while (queue.length) {
+                var range = queue.shift();
+                await sendChunk(status.id, file, range);
+                done += range[1] - range[0];
+                onProgress(done, file.size);
+            }
+        }
+        var workers = [];
+        for (var i = 0; i < PARALLEL_CHUNKS; i++) workers.push(worker());
+        await Promise.all(workers);
+
+        var response = await fetch('/api/uploads/' + status.id + '/complete', { method: 'POST' });
+        var data = await response.json();
+        if (response.ok) storageSet(storageKey, null);
+        return { response: response, data: data };
+    };
+})();
+</script>
+"""
+
+# Single files at least this large are first offered to /api/uploads/dedup by content hash
+DEDUP_MIN_SIZE = 8 * 1024 * 1024
+# Streams a file through SHA-256 and asks the server whether it already has it (plain string, not an f-string)
+DEDUP_UPLOAD_SCRIPT = """
+<script>
+(function() {
+    var HASH_SLICE_SIZE = 4 * 1024 * 1024;
+    var K = new Int32Array([
+        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+    ]);
+
+    // Incremental SHA-256. crypto.subtle only hashes a whole buffer at once and is missing on
+    // plain-http pages anyway, so big files are hashed slice by slice here.
+    function Sha256() {
+        this.h = new Int32Array([0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19]);
+        this.w = new Int32Array(64);
+        this.block = new Uint8Array(64);
+        this.blockLength = 0;
+        this.length = 0;
+    }
+
+    Sha256.prototype.compress = function(data, offset) {
+        var w = this.w, h = this.h, i;
+        for (i = 0; i < 16; i++, offset += 4) {
+            w[i] = (data[offset] << 24) | (data[offset + 1] << 16) | (data[offset + 2] << 8) | data[offset + 3];
+        }
+        for (i = 16; i < 64; i++) {
+            var x = w[i - 15], y = w[i - 2];
+            var s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+            var s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+            w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+        }
+        var a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7];
+        for (i = 0; i < 64; i++) {
+            var t1 = (k + (((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7)))
+                      + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0;
+            var t2 = ((((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10)))
+                      + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+            k = g; g = f; f = e; e = (d + t1) | 0; d = c; c = b; b = a; a = (t1 + t2) | 0;
+        }
+        h[0] = (h[0] + a) | 0; h[1] = (h[1] + b) | 0; h[2] = (h[2] + c) | 0; h[3] = (h[3] + d) | 0;
+        h[4] = (h[4] + e) | 0; h[5] = (h[5] + f) | 0; h[6] = (h[6] + g) | 0; h[7] = (h[7] + k) | 0;
+    };
+
+    Sha256.prototype.update = function(data) {
+        var offset = 0;
+        this.length += data.length;
+        if (this.blockLength) {
+            var take = Math.min(64 - this.blockLength, data.length);
+            this.block.set(data.subarray(0, take), this.blockLength);
+            this.blockLength += take;
+            offset = take;
+            if (this.blockLength < 64) return;
+            this.compress(this.block, 0);
+            this.blockLength = 0;
+        }
+        for (; offset + 64 <= data.length; offset += 64) this.compress(data, offset);
+        if (offset < data.length) {
+            this.block.set(data.subarray(offset), 0);
+            this.blockLength = data.length - offset;
+        }
+    };
+
+    Sha256.prototype.hex = function() {
+        var bits = this.length * 8;
+        var padding = new Uint8Array((this.blockLength < 56 ? 64 : 128) - this.blockLength);
+        var end = padding.length;
+        padding[0] = 0x80;
+        for (var i = 1; i <= 8; i++, bits = Math.floor(bits / 256)) padding[end - i] = bits % 256;
+        this.update(padding);
+        return Array.from(this.h, function(word) { return (word >>> 0).toString(16).padStart(8, '0'); }).join('');
+    };
+
+    async function askServer(body) {
+        var response = await fetch('/api/uploads/dedup', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        return { response: response, data: await response.json() };
+    }
+
+    // Resolves to the server's answer when it already has a file with the same content (nothing
+    // is uploaded then), or to null when the file has to be sent
+    window.eqsDedupUpload = async function(file, onProgress) {
+        try {
+            var check = await askServer({ name: file.name, size: file.size });
+            if (!check.response.ok || !check.data.known) return null; // No shared file of that size: skip hashing
+            var hash = new Sha256();
+            for (var offset = 0; offset < file.size; offset += HASH_SLICE_SIZE) {
+                hash.update(new Uint8Array(await file.slice(offset, offset + HASH_SLICE_SIZE).arrayBuffer()));
+                onProgress(Math.min(offset + HASH_SLICE_SIZE, file.size), file.size);
+            }
+            var result = await askServer({ name: file.name, size: file.size, sha256: hash.hex() });
+            return result.response.status === 202 ? result : null;
+        } catch (err) {
+            console.warn('Duplicate check failed; uploading instead:', err);
+            return null;
+        }
+    };
+})();
+</script>
+"""
+
+
+def _build_index_page(upload_enabled):
+    upload_form_section = f"""
+<style>
+    body {{
+        font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+        background-color: #f4f7f6;
+        color: #333;
+        line-height: 1.6;
+        margin: 0;
+        padding: 20px;
+    }}
+    .EQS-container {{
+        max-width: 800px;
+        margin: 30px auto;
+        padding: 30px 40px;
+        background: #fff;
+        border-radius: 12px;
+        box-shadow: 0 8px 30px rgba(0,0,0,0.08);
+    }}
+    .EQS-heading {{
+        text-align: center;
+        font-size: 2.8em;
+        font-weight: 700;
+        color: #1a73e8; /* Google Blue */
+        margin-bottom: 30px;
+        letter-spacing: -0.5px;
+    }}
+    .section-title {{
+        font-size: 1.6em;
+        color: #202124;
+        margin-top: 30px;
+        margin-bottom: 15px;
+        padding-bottom: 10px;
+        border-bottom: 2px solid #e8eaed;
+    }}
+    .files-table {{
+        width: 100%;
+        border-collapse: collapse;
+        margin-bottom: 30px;
+        font-size: 0.95em;
+    }}
+    .files-table th, .files-table td {{
+        padding: 14px 10px;
+        text-align: left;
+        border-bottom: 1px solid #dfe1e5;
+    }}
+    .files-table th {{
+        background-color: #f1f3f4;
+        color: #3c4043;
+        font-weight: 600;
+        letter-spacing: 0.3px;
+    }}
+    .files-table th.sortable {{
+        cursor: pointer;
+        user-select: none;
+    }}
+    .files-table th.sort-asc::after {{ content: " \\25B2"; font-size: 0.75em; }}
+    .files-table th.sort-desc::after {{ content: " \\25BC"; font-size: 0.75em; }}
+    .files-search {{
+        width: 100%;
+        box-sizing: border-box;
+        padding: 10px 14px;
+        margin-bottom: 15px;
+        border: 1px solid #dfe1e5;
+        border-radius: 5px;
+        font-size: 1em;
+    }}
+    .archive-toolbar, .archive-folders {{
+        display: flex;
+        flex-wrap: wrap;
+        align-items: center;
+        gap: 10px;
+        margin-bottom: 15px;
+    }}
+    .archive-toolbar button {{
+        background: #e8f0fe;
+        color: #1a73e8;
+        border: 1px solid #d2e3fc;
+        border-radius: 5px;
+        padding: 6px 12px;
+        font-weight: 500;
+        cursor: pointer;
+    }}
+    .archive-toolbar button:hover {{
+        background: #d2e3fc;
+    }}
+    .files-table img.thumb {{
+        width: 64px;
+        height: 64px;
+        object-fit: cover;
+        border-radius: 4px;
+        background-color: #f1f3f4;
+        vertical-align: middle;
+        margin-right: 12px;
+    }}
+    .files-table tr:last-child td {{
+        border-bottom: none;
+    }}
+    .files-table tr:hover td {{
+        background-color: #f8f9fa;
+    }}
+    .files-table a.download-link {{
+        display: inline-flex;
+        align-items: center;
+        color: #1a73e8;
+        text-decoration: none;
+        font-weight: 500;
+        padding: 6px 10px;
+        border-radius: 5px;
+        transition: background-color 0.2s ease, color 0.2s ease;
+    }}
+    .files-table a.download-link:hover {{
+        background-color: #e8f0fe;
+        color: #174ea6;
+        text-decoration: none;
+    }}
+    /* SVG styling is mostly inline in this example, but you can add global svg rules here */
+
+    .no-files-message {{
+        color: #5f6368;
+        margin-bottom: 25px;
+        padding: 15px;
+        background-color: #f8f9fa;
+        border-radius: 8px;
+        text-align: center;
+    }}
+    .upload-section {{
+        margin-top: 30px;
+        padding-top: 25px;
+        border-top: 2px solid #e8eaed;
+        text-align: center;
+    }}
+    #fileInput, #folderInput {{
+        display: none; /* Hidden, triggered by label */
+    }}
+    .upload-button-container {{
+        display: flex;
+        flex-direction: column;
+        align-items: center;
+        gap: 10px;
+        margin-bottom: 20px;
+    }}
+    .custom-upload-btn {{ /* This is the <label> acting as a button */
+        display: inline-flex;
+        align-items: center;
+        background: linear-gradient(135deg, #1a73e8 0%, #1e88e5 100%);
+        color: #fff;
+        font-weight: 600;
+        padding: 14px 30px;
+        border: none;
+        border-radius: 8px;
+        cursor: pointer;
+        font-size: 1.1em;
+        transition: background 0.2s ease, box-shadow 0.2s ease;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }}
+    .custom-upload-btn:hover {{
+        background: linear-gradient(135deg, #1765cc 0%, #1a73e8 100%);
+        box-shadow: 0 4px 8px rgba(0,0,0,0.15);
+    }}
+    #selectedFileName {{
+        font-size: 0.95em;
+        color: #5f6368;
+        margin-top: 5px; /* Space from button if shown */
+        font-style: italic;
+        max-width: 100%;
+        overflow: hidden;
+        text-overflow: ellipsis;
+        white-space: nowrap;
+        display: none; /* Initially hidden */
+    }}
+    .status-message {{
+        margin-top: 20px;
+        padding: 12px 18px;
+        border-radius: 8px;
+        font-size: 1.0em;
+        font-weight: 500;
+        display: flex; /* Use flex to align icon and text */
+        align-items: center;
+        justify-content: center; /* Center content if needed */
+        gap: 8px; /* Space between icon and text */
+        min-height: 2em;
+        text-align: left; /* Align text to left within message box */
+    }}
+    .status-message.success {{
+        background-color: #e6f4ea;
+        color: #1e8e3e;
+        border: 1px solid #a8d8b6;
+    }}
+    .status-message.error {{
+        background-color: #fce8e6;
+        color: #d93025;
+        border: 1px solid #f5c1bc;
+    }}
+    .status-message.warning {{ /* For uploading */
+        background-color: #fff8e1;
+        color: #f9ab00;
+        border: 1px solid #fde293;
+    }}
+    .hidden {{ display: none !important; }}
+
+    @media (max-width: 700px) {{
+        body {{ padding: 10px; }}
+        .EQS-container {{
+            padding: 20px;
+            margin: 15px auto;
+        }}
+        .EQS-heading {{ font-size: 2.2em; }}
+        .section-title {{ font-size: 1.4em; }}
+        .files-table th, .files-table td {{ padding: 10px 8px; font-size: 0.9em; }}
+        .custom-upload-btn {{ padding: 12px 22px; font-size: 1em; }}
+        .status-message {{ padding: 10px 15px; font-size: 0.95em; }}
+    }}
+</style>
+<div class="EQS-container">
+    <div class="EQS-heading">Easy Quick Share</div>
+
+    <h2 class="section-title">Available Files</h2>
+    {_build_listing_section()}
+
+    <div class="upload-section">
+        <h2 class="section-title" style="border-bottom:none; margin-bottom:20px;">Upload Files</h2>
+        <form id="uploadForm" method="post" enctype="multipart/form-data">
+            <div class="upload-button-container">
+                <label for="fileInput" class="custom-upload-btn">
+                    {SVG_UPLOAD_BUTTON_ICON}
+                    Choose Files
+                </label>
+                <label for="folderInput" class="custom-upload-btn">
+                    {SVG_UPLOAD_BUTTON_ICON}
+                    Choose Folder
+                </label>
+                <input type="file" name="file" id="fileInput" multiple required onchange="updateSelectedFileNameAndSubmit(this)" />
+                <input type="file" name="file" id="folderInput" webkitdirectory directory multiple onchange="updateSelectedFileNameAndSubmit(this)" />
+                <span id="selectedFileName"></span>
+            </div>
+            <button type="submit" class="hidden"></button> <!-- Hidden submit, triggered by JS -->
+        </form>
+        <div id="statusMessage" class="status-message" style="display:none;"></div>
+    </div>
+    {RESUMABLE_UPLOAD_SCRIPT}
+    {DEDUP_UPLOAD_SCRIPT}
+    <script>
+        const SVG_STATUS_UPLOADING_ICON_JS = `{SVG_STATUS_UPLOADING_ICON}`;
+        const SVG_STATUS_SUCCESS_ICON_JS = `{SVG_STATUS_SUCCESS_ICON}`;
+        const SVG_STATUS_ERROR_ICON_JS = `{SVG_STATUS_ERROR_ICON}`;
+
+        let activeFileInput = null; // Whichever of the file/folder pickers was used last
+
+        function updateSelectedFileNameAndSubmit(input) {{
+            input = input || document.getElementById('fileInput');
+            activeFileInput = input;
+            var span = document.getElementById('selectedFileName');
+            
+            if (input.files && input.files.length > 0) {{
+                span.textContent = 'Selected: ' + (input.files.length === 1 ? input.files[0].name : input.files.length + ' files');
+                span.style.display = 'block';
+                // Trigger form submission automatically
+                document.getElementById('uploadForm').dispatchEvent(new Event('submit', {{ bubbles: true, cancelable: true }}));
+            }} else {{
+                span.textContent = '';
+                span.style.display = 'none';
+            }}
+        }}
+
+        document.getElementById('uploadForm').addEventListener('submit', async function(e) {{
+            e.preventDefault();
+            const statusDiv = document.getElementById('statusMessage');
+            const fileInput = activeFileInput || document.getElementById('fileInput');
+            const selectedFileNameSpan = document.getElementById('selectedFileName');
+
+            statusDiv.textContent = ''; // Clear previous message content
+            statusDiv.className = 'status-message'; // Reset classes
+            statusDiv.style.display = 'none'; // Hide until new message is set
+
+            if (!fileInput.files || fileInput.files.length === 0) {{
+                statusDiv.innerHTML = SVG_STATUS_ERROR_ICON_JS + ' Please select a file to upload.';
+                statusDiv.classList.add('error');
+                statusDiv.style.display = 'flex';
+                return;
+            }}
+
+            statusDiv.innerHTML = SVG_STATUS_UPLOADING_ICON_JS + ' <span id="uploadProgressText">Uploading...</span>';
+            statusDiv.classList.add('warning');
+            statusDiv.style.display = 'flex';
+
+            // Add spinner animation CSS if not already present
+            const styleSheet = document.styleSheets[0];
+            try {{
+                let spinRuleExists = false;
+                for (let i = 0; i < styleSheet.cssRules.length; i++) {{
+                    if (styleSheet.cssRules[i].type === CSSRule.KEYFRAMES_RULE && styleSheet.cssRules[i].name === 'spin') {{
+                        spinRuleExists = true;
+                        break;
+                    }}
+                }}
+                if (!spinRuleExists) {{
+                    styleSheet.insertRule(`
+                        @keyframes spin {{
+                            0% {{ transform: rotate(0deg); }}
+                            100% {{ transform: rotate(360deg); }}
+                        }}`, styleSheet.cssRules.length);
+                }}
+                 // Apply animation to elements with class 'animate-spin'
+                const spinners = statusDiv.querySelectorAll('.animate-spin');
+                spinners.forEach(spinner => {{
+                    spinner.style.animation = 'spin 1s linear infinite';
+                }});
+
+            }} catch (err) {{
+                console.warn("Could not insert or apply spin animation: ", err);
+            }}
+
+            try {{
+                const file = fileInput.files[0];
+                let response, data, known = null;
+                if (fileInput.files.length === 1 && file.size >= {DEDUP_MIN_SIZE}) {{
+                    // Skip the transfer altogether if the server already has this exact file
+                    const progressText = document.getElementById('uploadProgressText');
+                    known = await eqsDedupUpload(file, function(done, total) {{
+                        progressText.textContent = 'Checking... ' + Math.floor(done * 100 / total) + '%';
+                    }});
+                    progressText.textContent = known ? 'Done' : 'Uploading...';
+                }}
+                if (known) {{
+                    ({{ response, data }} = known);
+                }} else if (fileInput.files.length > 1) {{
+                    // Many files (or a whole folder) go up in one request, keeping relative paths
+                    const formData = new FormData();
+                    for (const f of fileInput.files) {{
+                        formData.append('file', f, f.webkitRelativePath || f.name);
+                    }}
+                    document.getElementById('uploadProgressText').textContent = 'Uploading ' + fileInput.files.length + ' files...';
+                    response = await fetch('/upload', {{
+                        method: 'POST',
+                        body: formData,
+                    }});
+                    data = await response.json();
+                }} else if (file.size >= {RESUMABLE_UPLOAD_THRESHOLD}) {{
+                    // Large files go up in parallel chunks and survive dropped connections
+                    const progressText = document.getElementById('uploadProgressText');
+                    ({{ response, data }} = await eqsResumableUpload(file, function(done, total) {{
+                        progressText.textContent = 'Uploading... ' + Math.floor(done * 100 / total) + '%';
+                    }}));
+                }} else {{
+                    // Send the raw file body; the server streams it straight to disk
+                    response = await fetch('/upload/' + encodeURIComponent(file.name), {{
+                        method: 'PUT',
+                        headers: {{ 'Content-Type': 'application/octet-stream' }},
+                        body: file,
+                    }});
+                    data = await response.json();
+                }}
+
+                if (response.ok && data.message) {{ // response.ok checks for 2xx status
+                    statusDiv.innerHTML = SVG_STATUS_SUCCESS_ICON_JS + ' Success: ' + data.message;
+                    statusDiv.classList.remove('warning', 'error');
+                    statusDiv.classList.add('success');
+                }} else {{
+                    let errorMessage = data.error || `Upload failed (HTTP ${'{response.status}'})`;
+                    statusDiv.innerHTML = SVG_STATUS_ERROR_ICON_JS + ' Error: ' + errorMessage;
+                    statusDiv.classList.remove('success', 'warning');
+                    statusDiv.classList.add('error');
+                }}
+            }} catch (error) {{
+                statusDiv.innerHTML = SVG_STATUS_ERROR_ICON_JS + ' Upload failed: Network error or server issue.';
+                statusDiv.classList.remove('success', 'warning');
+                statusDiv.classList.add('error');
+                console.error('Error:', error);
+            }} finally {{
+                fileInput.value = ''; // Clear the file input
+                selectedFileNameSpan.textContent = ''; // Clear the displayed file name
+                selectedFileNameSpan.style.display = 'none'; // Hide the span
+
+                // Optional: Auto-hide status message after a delay
+                // setTimeout(() => {{
+                // if (!statusDiv.classList.contains('warning')) {{ // Don't hide if it's an ongoing 'uploading' message
+                // statusDiv.style.display = 'none';
+                // }}
+                // }}, 7000); // 7 seconds
+            }}
+        }});
+    </script>
+</div>
+"""
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+    <meta charset="UTF-8">
+    <title>EQS Instance</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <link rel="icon" type="image/png" href="/{icon_web_png_filename}">
+    </head>
+    <body>
+        {upload_form_section if upload_enabled else '<p style="color:red; text-align:center; font-size:1.2em; margin-top:50px;">Uploads are not being accepted right now.</p>'}
+    </body>
+    </html>
+    """
+    return html_content
+
+
+@flask_app.route('/')
+def index():
+    upload_enabled = _uploads_available()
+    version = shared_registry.version
+    cache_key = (version, upload_enabled)
+    with _index_page_cache_lock:
+        cached = _index_page_cache.get('entry')
+        if cached is None or cached[0] != cache_key:
+            # Only rebuild when the shared list changed (or the upload state flipped)
+            page = _build_index_page(upload_enabled).encode('utf-8')
+            etag = f"index-{_INSTANCE_TAG}-{version}-{int(upload_enabled)}"
+            cached = (cache_key, page, etag)
+            _index_page_cache['entry'] = cached
+    _, page, etag = cached
+    response = make_response(page)
+    response.mimetype = 'text/html'
+    response.set_etag(etag)
+    # Let browsers keep the page but always revalidate, so a refresh is a cheap 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+# --- Transfer tracking ---
+# Downloads, uploads and saves in progress, for live progress in the window. The thread moving
+# the data only adds to its own Transfer's byte count (no lock on the data path); throughput and
+# ETA are worked out when a reader takes a snapshot, from the byte counts that reader saw over
+# the last TRANSFER_RATE_WINDOW seconds.
+TRANSFER_RATE_WINDOW = 5 # Seconds
+TRANSFER_KEEP_FINISHED = 3 # Seconds a finished transfer stays in snapshots, so short ones show up at all
+TRANSFER_RECENT_MAX = 100 # Finished transfers remembered for that purpose
+TRANSFER_REFRESH_INTERVAL_MS = 500 # How often the window redraws transfer progress
+
+class Transfer:
+    __slots__ = ('id', 'direction', 'name', 'peer', 'total', 'done', 'started_at', 'finished_at', 'ok', 'samples')
+
+    def __init__(self, transfer_id, direction, name, total, peer):
+        self.id = transfer_id
+        self.direction = direction # 'download', 'upload' or 'save' (an accepted file being moved into place)
+        self.name = name
+        self.peer = peer
+        self.total = total # Bytes; 0 when unknown
+        self.done = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.ok = None
+        self.samples = collections.deque() # (time, done) seen by snapshots, for the rolling rate
+
+class TransferRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._active = {}
+        self._recent = collections.deque(maxlen=TRANSFER_RECENT_MAX)
+
+    def start(self, direction, name, total=0, peer='', transfer_id=None):
+        transfer = Transfer(transfer_id or f"{direction}-{next(self._ids)}", direction, name, total or 0, peer)
+        with self._lock:
+            self._active[transfer.id] = transfer
+        return transfer
+
+    def finish(self, transfer, ok=True):
+        with self._lock:
+            if self._active.pop(transfer.id, None) is None:
+                return
+            transfer.finished_at = time.monotonic()
+            transfer.ok = ok
+            self._recent.append(transfer)
+
+    def active_count(self):
+        return len(self._active)
+
+    def snapshot(self):
+        # One dict per transfer in progress (plus those finished in the last few seconds)
+        now = time.monotonic()
+        result = []
+        with self._lock:
+            for transfer in itertools.chain(self._active.values(), self._recent):
+                done = transfer.done
+                if transfer.finished_at is not None:
+                    if now - transfer.finished_at > TRANSFER_KEEP_FINISHED:
+                        continue
+                    rate = done / max(transfer.finished_at - transfer.started_at, 1e-6)
+                else:
+                    samples = transfer.samples
+                    samples.append((now, done))
+                    while len(samples) > 2 and now - samples[1][0] >= TRANSFER_RATE_WINDOW:
+                        samples.popleft()
+                    since, done_then = samples[0]
+                    if now - since >= 1:
+                        rate = (done - done_then) / (now - since)
+                    else: # Too new for a window; use the average so far
+                        rate = done / max(now - transfer.started_at, 1e-6)
+                remaining = max(transfer.total - done, 0)
+                result.append({
+                    'id': transfer.id,
+                    'direction': transfer.direction,
+                    'name': transfer.name,
+                    'peer': transfer.peer,
+                    'done': done,
+                    'total': transfer.total,
+                    'rate': rate,
+                    'eta': remaining / rate if transfer.finished_at is None and transfer.total and rate > 0 else None,
+                    'finished': transfer.finished_at is not None,
+                    'ok': transfer.ok,
+                })
+        return result
+
+transfers = TransferRegistry()
+
+def _tracked_body(body, direction, name, total, peer):
+    # Wraps a response body generator; the transfer is registered when the body starts to flow
+    # and finished when the generator ends or is closed
+    transfer = transfers.start(direction, name, total, peer)
+    ok = False
+    try:
+        for chunk in body:
+            transfer.done += len(chunk)
+            yield chunk
+        ok = True
+    finally:
+        body.close()
+        transfers.finish(transfer, ok)
+
+
+# --- File download helpers ---
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+SENDFILE_PROGRESS_CHUNK = 8 * 1024 * 1024 # Bytes per sendfile call, so progress moves during big files
+# Let the kernel copy file bytes straight to the client socket (socket.sendfile, which falls back
+# to chunked reads where os.sendfile is unavailable)
+DOWNLOAD_USE_SENDFILE = True
+# More ranges than this in one request is not a download manager, so just send the whole file
+MAX_BYTE_RANGES = 64
+
+def _file_etag(st):
+    # Strong validator: changes whenever the file is replaced, resized or rewritten
+    return f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+def _content_disposition(filename):
+    ascii_name = filename.encode('ascii', 'ignore').decode('ascii').replace('"', '').replace('\\', '')
+    if ascii_name == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{ascii_name or 'download'}\"; filename*=UTF-8''{urllib.parse.quote(filename)}"
+
+def _resolve_byte_ranges(range_header, size):
+    # Returns sorted, merged (start, stop) pairs; [] if nothing is satisfiable; None to ignore the header
+    byte_range = parse_range_header(range_header)
+    if byte_range is None or byte_range.units != 'bytes':
+        return None
+    resolved = []
+    for start, stop in byte_range.ranges:
+        if start < 0: # Suffix range, e.g. "bytes=-500"
+            start, stop = max(0, size + start), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            resolved.append((start, stop))
+    if not resolved:
+        return []
+    resolved.sort()
+    merged = [resolved[0]]
+    for start, stop in resolved[1:]:
+        last_start, last_stop = merged[-1]
+        if start <= last_stop: # Overlapping or adjacent
+            merged[-1] = (last_start, max(last_stop, stop))
+        else:
+            merged.append((start, stop))
+    return merged if len(merged) <= MAX_BYTE_RANGES else None
+
+def _if_range_matches(etag, last_modified):
+    if_range = request.headers.get('If-Range', '').strip()
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == f'"{etag}"' # Strong comparison; weak tags never match
+    return parse_date(if_range) == last_modified
+
+def _sendfile_ranges(sock, file_obj, ranges, part_headers=None, closing=b'', track=None, on_sent=None):
+    # The body bypasses the metrics middleware (which only sees the empty chunk) and can't be
+    # wrapped by _tracked_body, so both are told about the bytes here. track is (name, total, peer);
+    # on_sent(count) tells the server how much went out, so it can keep the connection alive.
+    transfer = transfers.start('download', *track) if track else None
+    sent = 0
+    ok = False
+    try:
+        # An empty chunk makes the server flush the status line and headers; after that the
+        # body goes straight onto the connection. Content-Length is always set, so the
+        # server never wraps this response in chunked encoding.
+        yield b''
+        for idx, (start, stop) in enumerate(ranges):
+            if part_headers:
+                sock.sendall(part_headers[idx])
+                sent += len(part_headers[idx])
+            offset = start
+            while offset < stop:
+                count = sock.sendfile(file_obj, offset, min(SENDFILE_PROGRESS_CHUNK, stop - offset))
+                if not count: # The file shrank; the connection will be closed short
+                    break
+                offset += count
+                sent += count
+                if transfer is not None:
+                    transfer.done = sent
+            if part_headers:
+                sock.sendall(b"\r\n")
+                sent += 2
+        if closing:
+            sock.sendall(closing)
+            sent += len(closing)
+        ok = True
+    finally:
+        file_obj.close()
+        server_metrics.add_bytes_sent(sent)
+        if on_sent is not None:
+            on_sent(sent)
+        if transfer is not None:
+            transfer.done = sent
+            transfers.finish(transfer, ok)
+
+def _iter_file_ranges(file_obj, ranges, part_headers=None, closing=b''):
+    try:
+        for idx, (start, stop) in enumerate(ranges):
+            if part_headers:
+                yield part_headers[idx]
+            file_obj.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = file_obj.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            if part_headers:
+                yield b"\r\n"
+        if closing:
+            yield closing
+    finally:
+        file_obj.close()
+
+def _send_shared_file(file_path, download_name):
+    try:
+        file_obj = open(file_path, 'rb')
+    except OSError:
+        abort(404, description="File not found on server or is not a file.")
+    st = os.fstat(file_obj.fileno())
+    etag = _file_etag(st)
+    last_modified = datetime.fromtimestamp(int(st.st_mtime), timezone.utc)
+    mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    headers = {
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': _content_disposition(download_name),
+        'Cache-Control': 'no-cache',
+    }
+    if DOWNLOAD_COMPRESSION and _is_compressible(download_name, mimetype, st.st_size):
+        headers['Vary'] = 'Accept-Encoding' # The same URL may also be sent compressed
+        encoding = request.accept_encodings.best_match(list(CONTENT_ENCODINGS))
+        if encoding:
+            response = _send_compressed_file(file_obj, file_path, st, encoding, etag, last_modified,
+                                             mimetype, headers, download_name)
+            if response is not None:
+                return response
+    headers.update(_digest_headers(st)) # Only for the file as stored, not a compressed variant
+    return _send_file_object(file_obj, st.st_size, etag, last_modified, mimetype, headers, download_name)
+
+def _send_file_object(file_obj, size, etag, last_modified, mimetype, headers, download_name):
+    # Answers the current request from an open file: conditional requests, byte ranges, and a
+    # sendfile or chunked body. Takes ownership of file_obj.
+    headers['ETag'] = f'"{etag}"'
+    if request.if_match and not request.if_match.contains(etag):
+        file_obj.close()
+        return flask_app.response_class(status=412, headers=headers)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        file_obj.close()
+        return flask_app.response_class(status=304, headers=headers)
+
+    status = 200
+    ranges = [(0, size)]
+    part_headers = None
+    closing = b''
+    content_type = mimetype
+    requested = None
+    if 'Range' in request.headers and _if_range_matches(etag, last_modified):
+        requested = _resolve_byte_ranges(request.headers['Range'], size)
+    if requested == []:
+        file_obj.close()
+        headers['Content-Range'] = f"bytes */{size}"
+        return flask_app.response_class(status=416, headers=headers)
+    if requested:
+        status = 206
+        ranges = requested
+        if len(ranges) == 1:
+            start, stop = ranges[0]
+            headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+            content_length = stop - start
+        else:
+            boundary = uuid.uuid4().hex
+            part_headers = [
+                (f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                 f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n").encode('latin-1')
+                for start, stop in ranges
+            ]
+            closing = f"--{boundary}--\r\n".encode('latin-1')
+            content_type = f"multipart/byteranges; boundary={boundary}"
+            content_length = (sum(stop - start + len(header) + 2 for (start, stop), header in zip(ranges, part_headers))
+                              + len(closing))
+    else:
+        content_length = size
+    headers['Content-Length'] = str(content_length)
+
+    sock = request.environ.get('werkzeug.socket')
+    if request.method == 'HEAD':
+        file_obj.close()
+        body = []
+    elif DOWNLOAD_USE_SENDFILE and sock is not None:
+        body = _sendfile_ranges(sock, file_obj, ranges, part_headers, closing,
+                                (download_name, content_length, request.remote_addr),
+                                request.environ.get('eqs.bytes_sent_directly'))
+    else:
+        body = _tracked_body(_iter_file_ranges(file_obj, ranges, part_headers, closing),
+                             'download', download_name, content_length, request.remote_addr)
+    return flask_app.response_class(body, status=status, headers=headers, content_type=content_type,
+                                    direct_passthrough=True)
+
+
+# --- Compressed downloads ---
+try:
+    import zstandard # Optional; without it only gzip is offered
+except ImportError:
+    zstandard = None
+
+# Negotiate Content-Encoding for text-like files; files already sent compressed are kept on disk
+# so later requests (including ranges) are served from the cache like a plain file
+DOWNLOAD_COMPRESSION = True
+COMPRESS_MIN_SIZE = 1024 # Smaller files gain nothing worth the extra round of work
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_ZSTD_LEVEL = 3
+COMPRESSIBLE_TYPES = ('application/json', 'application/xml', 'application/javascript', 'application/x-ndjson',
+                      'application/x-sh', 'application/sql', 'image/svg+xml')
+COMPRESSIBLE_EXTENSIONS = ('.log', '.csv', '.tsv', '.jsonl', '.ndjson', '.md', '.txt', '.yaml', '.yml',
+                           '.ini', '.cfg', '.conf', '.toml')
+CONTENT_ENCODINGS = {'zstd': '.zst', 'gzip': '.gz'} if zstandard else {'gzip': '.gz'} # In order of preference
+CACHE_DIR = os.environ.get("EQS_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".eqs", "cache")
+COMPRESS_CACHE_DIR = os.path.join(CACHE_DIR, "compressed")
+COMPRESS_CACHE_MAX_BYTES = 1024 * 1024 * 1024 # Least recently used variants are removed past this
+
+_compress_cache_lock = threading.Lock()
+_compress_in_progress = set() # Cache paths currently being written by a response
+
+def _is_compressible(download_name, mimetype, size):
+    if size < COMPRESS_MIN_SIZE:
+        return False
+    return (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES or mimetype.endswith(('+xml', '+json'))
+            or download_name.lower().endswith(COMPRESSIBLE_EXTENSIONS))
+
+def _compress_cache_path(file_path, st, encoding):
+    # Keyed by path, size and mtime, so a rewritten file never hits a stale variant
+    key = f"{os.path.abspath(file_path)}\0{st.st_size}\0{st.st_mtime_ns}"
+    return os.path.join(COMPRESS_CACHE_DIR, hashlib.sha1(key.encode('utf-8', 'surrogatepass')).hexdigest()
+                        + CONTENT_ENCODINGS[encoding])
+
+def _new_compressor(encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=COMPRESS_ZSTD_LEVEL).compressobj()
+    # wbits 31 writes a gzip header; zlib leaves its mtime at 0, so the output is reproducible
+    return zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+def _trim_compress_cache():
+    try:
+        entries = []
+        with os.scandir(COMPRESS_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(tuple(CONTENT_ENCODINGS.values())):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= COMPRESS_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def clear_compress_cache():
+    with _compress_cache_lock:
+        shutil.rmtree(COMPRESS_CACHE_DIR, ignore_errors=True)
+
+def _write_cache_part(temp, data, file_path):
+    # Returns the cache file to keep writing to, or None once writing to it failed
+    try:
+        temp.write(data)
+        return temp
+    except OSError as e:
+        logger.debug(f"Compressed copy of '{file_path}' won't be cached: {e}")
+        temp.close()
+        return None
+
+def _iter_compressed(file_obj, file_path, st, encoding, cache_path):
+    # Compresses the file chunk by chunk; the output is also written to a temporary file that
+    # becomes the cached variant once the whole file went through unchanged. Only problems with
+    # the cache are tolerated: a read error propagates, so the connection is dropped instead of
+    # ending a truncated stream cleanly.
+    compressor = _new_compressor(encoding)
+    temp = temp_path = None
+    if cache_path:
+        try:
+            os.makedirs(COMPRESS_CACHE_DIR, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=COMPRESS_CACHE_DIR, prefix=".partial_")
+            temp = os.fdopen(fd, 'wb')
+        except OSError as e:
+            logger.debug(f"Compressed copy of '{file_path}' won't be cached: {e}")
+    complete = False
+    try:
+        while True:
+            chunk = file_obj.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            data = compressor.compress(chunk)
+            if data:
+                if temp:
+                    temp = _write_cache_part(temp, data, file_path)
+                yield data
+        data = compressor.flush()
+        if temp:
+            temp = _write_cache_part(temp, data, file_path)
+        if temp:
+            try:
+                temp.close()
+                current = os.stat(file_path) # Renamed or deleted meanwhile: the stream is fine, the copy isn't kept
+                if (current.st_size, current.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+                    os.replace(temp_path, cache_path)
+                    complete = True
+                    with _compress_cache_lock:
+                        _trim_compress_cache()
+            except OSError as e:
+                logger.debug(f"Compressed copy of '{file_path}' won't be cached: {e}")
+        yield data
+    finally:
+        file_obj.close()
+        if temp:
+            temp.close()
+        if temp_path and not complete:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        if cache_path:
+            with _compress_cache_lock:
+                _compress_in_progress.discard(cache_path)
+
+def _send_compressed_file(file_obj, file_path, st, encoding, etag, last_modified, mimetype, headers, download_name):
+    # Returns a response for the negotiated encoding, or None to send the file as it is
+    cache_path = _compress_cache_path(file_path, st, encoding)
+    variant_etag = f"{etag}-{CONTENT_ENCODINGS[encoding][1:]}"
+    if_range = request.headers.get('If-Range', '').strip()
+    if 'Range' in request.headers and if_range and if_range != f'"{variant_etag}"':
+        return None # A range validated against the plain file must come from the plain file
+    try:
+        cached = open(cache_path, 'rb')
+    except OSError:
+        cached = None
+    if cached is not None:
+        file_obj.close()
+        try:
+            os.utime(cache_path) # Marks the variant as recently used
+        except OSError:
+            pass
+        headers['Content-Encoding'] = encoding
+        return _send_file_object(cached, os.fstat(cached.fileno()).st_size, variant_etag, last_modified,
+                                 mimetype, headers, download_name)
+    if 'Range' in request.headers:
+        return None # Offsets into a variant that is still being produced can't be served
+
+    headers['ETag'] = f'"{variant_etag}"'
+    headers['Content-Encoding'] = encoding
+    if request.if_match and not request.if_match.contains(variant_etag):
+        file_obj.close()
+        return flask_app.response_class(status=412, headers=headers)
+    if not is_resource_modified(request.environ, etag=variant_etag, last_modified=last_modified):
+        file_obj.close()
+        return flask_app.response_class(status=304, headers=headers)
+    if request.method == 'HEAD':
+        file_obj.close()
+        return flask_app.response_class(iter(()), headers=headers, content_type=mimetype) # Length unknown until compressed
+    with _compress_cache_lock:
+        if cache_path in _compress_in_progress:
+            cache_path = None # Another response is already writing this variant
+        else:
+            _compress_in_progress.add(cache_path)
+    body = _tracked_body(_iter_compressed(file_obj, file_path, st, encoding, cache_path),
+                         'download', download_name, 0, request.remote_addr)
+    return flask_app.response_class(body, headers=headers, content_type=mimetype, direct_passthrough=True)
+
+
+# --- Content hashing ---
+# Every shared file is hashed in the background: small files on the dispatcher thread, larger
+# ones on a pool of worker processes (hashing is CPU-bound, and the processes keep it off the
+# GIL the server and window share). Digests are remembered in a SQLite file keyed by the file's
+# identity (device, inode, size, mtime), so sharing the same tree again costs one stat per file.
+CONTENT_HASHING = True
+HASH_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+HASH_INLINE_MAX = 256 * 1024 # Files up to this size are hashed without a round trip to a worker
+HASH_CACHE_PATH = os.path.join(CACHE_DIR, "hashes.sqlite3")
+HASH_CACHE_MAX_ENTRIES = 1_000_000 # Oldest digests are dropped past this
+HASH_COMMIT_EVERY = 500 # Digests written per transaction while a big tree is being hashed
+HASH_SETTLE_TIME = 2.0 # Seconds a file must go unmodified before it is hashed; files being written wait
+# Names in the Repr-Digest (RFC 9530) and legacy Digest (RFC 3230) headers
+DIGEST_HEADER_NAMES = {'sha256': ('sha-256', 'SHA-256'), 'blake3': ('blake3', 'BLAKE3')}
+
+class ContentHasher:
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.algorithm = HASH_ALGORITHM
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pool = None
+        self._in_flight = threading.BoundedSemaphore(HASH_WORKERS * 2)
+        self._digests = {} # file identity -> hex digest, for every digest seen this session
+        self._by_uid = {} # shared item uid -> hex digest
+        self._other_digests = {} # (file identity, algorithm) -> hex digest, for requested algorithms
+        self._deferred = {} # uid -> item, for files modified too recently to hash yet
+        self._deferred_due = 0.0 # When to look at them again (time.monotonic())
+        self._requested = set() # (file identity, algorithm) being hashed on request
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock() # Guards _requested, which pool callbacks also touch, and _pool
+        self._readers = threading.local() # Read-only cache connection of each request thread
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        # Hashes everything shared so far, then whatever is added later
+        if self.running():
+            return
+        self._stop_event.clear()
+        self._queue = queue.Queue() # Anything left from an earlier run is covered by the snapshot below
+        self._deferred = {}
+        self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True, name="EQS-hash")
+        self._thread.start()
+        self._queue.put(('items', shared_registry.snapshot()[1]))
+
+    def stop(self):
+        if not self.running():
+            return
+        self._stop_event.set()
+        self._queue.put(None)
+        with self._lock: # _submit() doesn't make a new pool once the stop event is set
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def on_registry_change(self, added, removed):
+        # Registry listener; runs under the registry lock, so it only queues
+        for item in removed:
+            self._by_uid.pop(item['uid'], None)
+        if added and self.running():
+            self._queue.put(('items', added))
+
+    def digest_for_item(self, uid):
+        return self._by_uid.get(uid)
+
+    def digest_for_stat(self, st):
+        return self._digests.get(file_identity(st))
+
+    def cached_digest(self, identity, algorithm):
+        # Digest of a file version with any algorithm if it has been computed before, else None
+        if algorithm == self.algorithm and identity in self._digests:
+            return self._digests[identity]
+        digest = self._other_digests.get((identity, algorithm))
+        if digest is None:
+            db = self._reader()
+            if db is None:
+                return None
+            try:
+                row = db.execute("SELECT digest FROM hashes WHERE identity = ? AND algorithm = ?",
+                                 (identity, algorithm)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Checksum cache error: {e}")
+                row = None
+            if row:
+                digest = self._other_digests[(identity, algorithm)] = row[0]
+        return digest
+
+    def request_digest(self, path, algorithm):
+        # Has path hashed with algorithm in the background, for a later cached_digest(); only
+        # while hashing is running
+        if self.running():
+            self._queue.put(('request', (path, algorithm)))
+
+    def _reader(self):
+        # A read-only connection kept per thread: lookups from request threads never take the
+        # write lock, and in WAL mode they don't wait for the hashing thread's commits either.
+        # None while the cache doesn't exist yet.
+        db = getattr(self._readers, 'db', None)
+        if db is None:
+            path = os.path.abspath(self.cache_path).replace(os.sep, '/')
+            if not path.startswith('/'): # Windows drive path
+                path = '/' + path
+            try:
+                db = sqlite3.connect(f"file:{urllib.parse.quote(path, safe='/:')}?mode=ro", uri=True)
+            except sqlite3.Error:
+                return None
+            self._readers.db = db
+        return db
+
+    def _open_cache(self):
+        # The hashing thread's connection; the schema is set up and old rows trimmed only here
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            db = sqlite3.connect(self.cache_path)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS hashes (identity TEXT NOT NULL, algorithm TEXT NOT NULL, "
+                       "digest TEXT NOT NULL, UNIQUE (identity, algorithm))")
+            db.execute("DELETE FROM hashes WHERE rowid <= (SELECT max(rowid) FROM hashes) - ?", (HASH_CACHE_MAX_ENTRIES,))
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            logger.warning(f"Checksum cache '{self.cache_path}' is unavailable, checksums won't be kept: {e}")
+            return None
+
+    def _run(self, work_queue):
+        db = self._open_cache()
+        unsaved = 0
+        try:
+            while True:
+                if self._deferred and time.monotonic() >= self._deferred_due:
+                    # Look again at the files that were still being written
+                    message = ('items', list(self._deferred.values()))
+                    self._deferred = {}
+                else:
+                    try:
+                        message = work_queue.get(timeout=max(0, self._deferred_due - time.monotonic())
+                                                 if self._deferred else None)
+                    except queue.Empty:
+                        continue
+                if message is None or self._stop_event.is_set():
+                    break
+                kind, payload = message
+                if kind == 'items':
+                    for item in payload:
+                        if self._stop_event.is_set():
+                            break
+                        unsaved += self._hash_item(db, item)
+                elif kind == 'done':
+                    unsaved += self._store(db, *payload)
+                elif kind == 'request':
+                    self._hash_requested(db, *payload)
+                elif kind == 'request_done':
+                    unsaved += self._store_requested(db, *payload)
+                if db is not None and unsaved and (unsaved >= HASH_COMMIT_EVERY or work_queue.empty()):
+                    db.commit()
+                    unsaved = 0
+        except sqlite3.Error as e:
+            logger.warning(f"Checksum cache error, hashing stopped: {e}")
+        finally:
+            if db is not None:
+                try:
+                    db.commit()
+                    db.close()
+                except sqlite3.Error:
+                    pass
+
+    def _hash_item(self, db, item):
+        # Returns the number of new cache rows written
+        if shared_registry.get(item['uid']) is not item: # Removed (or re-added) since it was queued
+            return 0
+        try:
+            st = os.stat(item['path'])
+        except OSError:
+            return 0
+        if time.time() - st.st_mtime < HASH_SETTLE_TIME: # Still being written; hashing now would be wasted
+            if not self._deferred:
+                self._deferred_due = time.monotonic() + HASH_SETTLE_TIME
+            self._deferred[item['uid']] = item
+            return 0
+        self._deferred.pop(item['uid'], None)
+        identity = file_identity(st)
+        digest = self._digests.get(identity)
+        if digest is None and db is not None:
+            row = db.execute("SELECT digest FROM hashes WHERE identity = ? AND algorithm = ?",
+                             (identity, self.algorithm)).fetchone()
+            if row:
+                digest = self._digests[identity] = row[0]
+        if digest is not None:
+            self._by_uid[item['uid']] = digest
+            return 0
+        if item['size_bytes'] <= HASH_INLINE_MAX:
+            try:
+                return self._store(db, item['uid'], identity, *hash_file(item['path']))
+            except OSError:
+                return 0
+        self._submit(item['path'], self.algorithm, 'done', (item['uid'], identity))
+        return 0
+
+    def _submit(self, path, algorithm, kind, context):
+        # Hashes path on the worker pool; the result comes back on the queue as (kind, (*context,
+        # digest, identity after reading))
+        with self._lock:
+            if self._stop_event.is_set(): # stop() has shut the pool down, or is about to
+                return False
+            pool = self._pool
+            if pool is None:
+                pool = self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        self._in_flight.acquire() # Keeps the pool's queue short, so removals take effect quickly
+        try:
+            future = pool.submit(hash_file, path, algorithm)
+        except RuntimeError: # Pool shut down by stop()
+            self._in_flight.release()
+            return False
+        future.add_done_callback(lambda f: self._worker_done(f, kind, context))
+        return True
+
+    def _worker_done(self, future, kind, context):
+        self._in_flight.release()
+        if future.cancelled() or future.exception() is not None:
+            if kind == 'request_done':
+                with self._lock:
+                    self._requested.discard(context)
+            return
+        self._queue.put((kind, (*context, *future.result())))
+
+    def _hash_requested(self, db, path, algorithm):
+        try:
+            identity = file_identity(os.stat(path))
+        except OSError:
+            return
+        key = (identity, algorithm)
+        if (algorithm == self.algorithm and identity in self._digests) or key in self._other_digests:
+            return
+        if db is not None:
+            row = db.execute("SELECT digest FROM hashes WHERE identity = ? AND algorithm = ?", key).fetchone()
+            if row:
+                self._other_digests[key] = row[0]
+                return
+        with self._lock:
+            if key in self._requested:
+                return
+            self._requested.add(key)
+        if not self._submit(path, algorithm, 'request_done', key):
+            with self._lock:
+                self._requested.discard(key)
+
+    def _store_requested(self, db, identity, algorithm, digest, identity_after):
+        with self._lock:
+            self._requested.discard((identity, algorithm))
+        if identity_after != identity:
+            return 0
+        self._other_digests[(identity, algorithm)] = digest
+        if db is None:
+            return 0
+        db.execute("INSERT OR REPLACE INTO hashes (identity, algorithm, digest) VALUES (?, ?, ?)",
+                   (identity, algorithm, digest))
+        return 1
+
+    def _store(self, db, uid, identity, digest, identity_after):
+        if identity_after != identity: # Written to while it was read
+            return 0
+        self._digests[identity] = digest
+        item = shared_registry.get(uid)
+        if item is not None:
+            try:
+                current = file_identity(os.stat(item['path']))
+            except OSError:
+                current = None
+            if current == identity: # Not modified again since; the new version gets its own result
+                self._by_uid[uid] = digest
+        if db is None:
+            return 0
+        db.execute("INSERT OR REPLACE INTO hashes (identity, algorithm, digest) VALUES (?, ?, ?)",
+                   (identity, self.algorithm, digest))
+        return 1
+
+content_hasher = ContentHasher(HASH_CACHE_PATH)
+shared_registry.add_listener(content_hasher.on_registry_change)
+
+def _digest_headers(st):
+    # Repr-Digest/Digest for the file as stored, when its digest is known; they describe the
+    # whole file, so they are also valid on range responses
+    digest = content_hasher.digest_for_stat(st)
+    if digest is None:
+        return {}
+    value = base64.b64encode(bytes.fromhex(digest)).decode('ascii')
+    repr_name, legacy_name = DIGEST_HEADER_NAMES[content_hasher.algorithm]
+    return {'Repr-Digest': f"{repr_name}=:{value}:", 'Digest': f"{legacy_name}={value}"}
+
+
+# --- Thumbnails ---
+try:
+    from PIL import Image, ImageOps # Optional; without Pillow the listing shows no thumbnails
+except ImportError:
+    Image = ImageOps = None
+
+# Image previews for the web listing. They are made on first request by a small thread pool
+# (Pillow releases the GIL while decoding and scaling) and kept on disk keyed by file identity,
+# so a changed photo gets a new thumbnail and an unchanged one is never decoded twice.
+THUMBNAILS = Image is not None
+THUMB_SIZE = 128 # Pixels, longest side; shown at 64 so they stay sharp on high-DPI screens
+THUMB_QUALITY = 80
+THUMB_WORKERS = max(1, min(4, os.cpu_count() or 1))
+THUMB_MAX_SOURCE_BYTES = 200 * 1024 * 1024 # Bigger files are not decoded just for a preview
+THUMB_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+THUMB_CACHE_DIR = os.path.join(CACHE_DIR, "thumbs")
+THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024 # Least recently used thumbnails are removed past this
+THUMB_MAX_AGE = 7 * 24 * 60 * 60 # Seconds a browser may reuse a thumbnail without asking again
+THUMB_FAILED_MAX = 10000 # Files that could not be decoded, remembered so they aren't retried
+THUMB_WAIT = 0.25 # Seconds a request waits for a thumbnail being made before it is told to retry
+
+def _is_thumbnailable(name, size):
+    return THUMBNAILS and size <= THUMB_MAX_SOURCE_BYTES and name.lower().endswith(THUMB_EXTENSIONS)
+
+def _thumbnail_url(item):
+    # The file's identity in the URL makes browsers fetch a new thumbnail once the file changed
+    # (even at the same size); the server ignores it. Scans and folder watchers record the
+    # identity on the item, so listings don't stat the files; only items added without one are.
+    if not _is_thumbnailable(item['name'], item['size_bytes']):
+        return None
+    identity = item['identity']
+    if identity is None:
+        try:
+            identity = file_identity(os.stat(item['path']))
+        except OSError:
+            return None
+    return f"/thumb/{item['uid']}?v={thumbnailer.cache_key(identity)[:16]}"
+
+def _render_thumbnail(file_path, out_path):
+    with Image.open(file_path) as source:
+        source.draft('RGB', (THUMB_SIZE, THUMB_SIZE)) # JPEG only: decode straight at a reduced scale
+        image = ImageOps.exif_transpose(source) # Phones store the rotation in EXIF
+        image.thumbnail((THUMB_SIZE, THUMB_SIZE))
+        if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(out_path, 'JPEG', quality=THUMB_QUALITY, optimize=True)
+
+class Thumbnailer:
+    # Hands out cached thumbnail files and renders missing ones on the pool. Requests for a
+    # thumbnail that is already being rendered share the same job.
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._pool = None # Started on first use
+        self._pending = {} # cache path -> Future
+        self._failed = collections.OrderedDict() # cache path -> None, oldest first
+        self._cache_bytes = None # Size of the cache on disk, counted on first write
+
+    def cache_key(self, identity):
+        key = f"{identity}:{THUMB_SIZE}:{THUMB_QUALITY}"
+        return hashlib.sha1(key.encode('ascii')).hexdigest()
+
+    def get(self, file_path, st, wait=None):
+        # Returns (path of the thumbnail for this version of the file or None, still being made).
+        # Waits at most wait seconds for a thumbnail that isn't cached yet.
+        cache_path = os.path.join(self.cache_dir, self.cache_key(file_identity(st)) + ".jpg")
+        try:
+            os.utime(cache_path) # Marks the thumbnail as recently used
+            return cache_path, False
+        except OSError:
+            pass
+        with self._lock:
+            if cache_path in self._failed:
+                return None, False
+            future = self._pending.get(cache_path)
+            if future is None:
+                if self._pool is None:
+                    self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=THUMB_WORKERS,
+                                                                       thread_name_prefix="EQS-thumb")
+                future = self._pool.submit(self._render, file_path, st, cache_path)
+                self._pending[cache_path] = future
+        try:
+            return future.result(timeout=wait), False
+        except concurrent.futures.TimeoutError:
+            return None, True
+
+    def _render(self, file_path, st, cache_path):
+        temp_path = f"{cache_path}.partial_{uuid.uuid4().hex}"
+        try:
+            if os.path.exists(cache_path): # Finished just before this job was queued
+                return cache_path
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _render_thumbnail(file_path, temp_path)
+            if file_identity(os.stat(file_path)) != file_identity(st):
+                logger.debug(f"'{file_path}' changed while its thumbnail was made; not cached")
+                return None
+            os.replace(temp_path, cache_path)
+            self._account(os.path.getsize(cache_path))
+            return cache_path
+        except Exception as e: # Pillow raises all sorts of errors on damaged or unusual files
+            logger.debug(f"No thumbnail for '{file_path}': {e!r}")
+            with self._lock:
+                self._failed[cache_path] = None
+                while len(self._failed) > THUMB_FAILED_MAX:
+                    self._failed.popitem(last=False)
+            return None
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            with self._lock:
+                self._pending.pop(cache_path, None)
+
+    def _account(self, added_bytes):
+        with self._lock:
+            if self._cache_bytes is not None:
+                self._cache_bytes += added_bytes
+                if self._cache_bytes <= THUMB_CACHE_MAX_BYTES:
+                    return
+        self._trim()
+
+    def _trim(self):
+        # Counts the cache and removes least recently used thumbnails down to 90% of the limit,
+        # so the directory is not listed again for every thumbnail that follows
+        try:
+            entries = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".jpg"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        if total > THUMB_CACHE_MAX_BYTES:
+            for _, size, path in sorted(entries):
+                if total <= THUMB_CACHE_MAX_BYTES * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+        with self._lock:
+            self._cache_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._failed.clear()
+            self._cache_bytes = None
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+thumbnailer = Thumbnailer(THUMB_CACHE_DIR)
+
+
+# --- Folder / selection archives ---
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+_TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+
+class _ArchiveSink:
+    # Write-only file object that collects what zipfile writes, so the generator can hand it
+    # on chunk by chunk. It has no tell()/seek(), which puts zipfile in streaming mode.
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+def _unique_arcnames(items):
+    # Two selected files can share a relative path (e.g. same name in different folders)
+    seen = set()
+    result = []
+    for item in items:
+        arcname = item['rel_path']
+        stem, ext = os.path.splitext(arcname)
+        counter = 2
+        while arcname in seen:
+            arcname = f"{stem} ({counter}){ext}"
+            counter += 1
+        seen.add(arcname)
+        result.append((item, arcname))
+    return result
+
+def _iter_zip_archive(entries, compression):
+    sink = _ArchiveSink()
+    with zipfile.ZipFile(sink, mode='w', compression=compression, allowZip64=True) as archive:
+        for item, arcname in entries:
+            try:
+                source = open(item['path'], 'rb')
+            except OSError:
+                continue # Vanished since it was shared; leave it out
+            with source:
+                zinfo = zipfile.ZipInfo.from_file(item['path'], arcname)
+                zinfo.compress_type = compression
+                with archive.open(zinfo, mode='w', force_zip64=zinfo.file_size > 0xFFFFFFFF) as dest:
+                    while True:
+                        chunk = source.read(ARCHIVE_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain() # Data descriptor, plus the header of an empty file
+            if data:
+                yield data
+    yield sink.drain() # Central directory
+
+def _tar_members(entries):
+    members = []
+    for item, arcname in entries:
+        try:
+            st = os.stat(item['path'])
+        except OSError:
+            continue
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = st.st_size
+        tarinfo.mtime = int(st.st_mtime)
+        tarinfo.mode = 0o644
+        members.append((item, tarinfo, tarinfo.tobuf(format=tarfile.PAX_FORMAT)))
+    return members
+
+def _tar_archive_length(members):
+    padded = sum(len(header) + -(-tarinfo.size // _TAR_BLOCK_SIZE) * _TAR_BLOCK_SIZE for _, tarinfo, header in members)
+    return padded + 2 * _TAR_BLOCK_SIZE
+
+def _iter_tar_archive(members):
+    for item, tarinfo, header in members:
+        yield header
+        remaining = tarinfo.size
+        try:
+            with open(item['path'], 'rb') as source:
+                while remaining > 0:
+                    chunk = source.read(min(ARCHIVE_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+        except OSError:
+            pass
+        # The header already promised tarinfo.size bytes; pad if the file shrank meanwhile
+        while remaining > 0:
+            filler = min(ARCHIVE_CHUNK_SIZE, remaining)
+            remaining -= filler
+            yield bytes(filler)
+        if tarinfo.size % _TAR_BLOCK_SIZE:
+            yield bytes(_TAR_BLOCK_SIZE - tarinfo.size % _TAR_BLOCK_SIZE)
+    yield bytes(2 * _TAR_BLOCK_SIZE) # End-of-archive marker
+
+@flask_app.route('/archive', methods=['GET', 'POST'])
+def download_archive():
+    # Streams a ZIP or TAR of selected items (id=..., repeatable or comma-separated), of a
+    # shared folder (folder=...), or of everything (all=1). Nothing is staged on disk.
+    archive_format = request.values.get('format', 'zip')
+    if archive_format not in ('zip', 'tar'):
+        abort(400, description="Format must be 'zip' or 'tar'.")
+    _, items = shared_registry.snapshot()
+    folder = request.values.get('folder')
+    if request.values.get('all'):
+        selected = items
+        archive_name = "EQS-shared-files"
+    elif folder:
+        selected = [item for item in items if item['rel_path'].startswith(folder.rstrip('/') + '/')]
+        archive_name = secure_filename(folder) or "folder"
+    else:
+        wanted = {uid for value in request.values.getlist('id') for uid in value.split(',') if uid}
+        selected = sorted(filter(None, map(shared_registry.get, wanted)), key=lambda item: item['seq'])
+        archive_name = "EQS-selection"
+    if not selected:
+        abort(404, description="No shared files match this request.")
+
+    entries = _unique_arcnames(selected)
+    download_name = f"{archive_name}.{archive_format}"
+    headers = {'Content-Disposition': _content_disposition(download_name), 'Cache-Control': 'no-store'}
+    if archive_format == 'tar':
+        members = _tar_members(entries)
+        headers['Content-Length'] = str(_tar_archive_length(members))
+        body = _iter_tar_archive(members)
+        mimetype = 'application/x-tar'
+    else:
+        # Store-only by default so the archive streams at disk speed; deflate on request
+        compression = zipfile.ZIP_DEFLATED if request.values.get('compress') else zipfile.ZIP_STORED
+        body = _iter_zip_archive(entries, compression)
+        mimetype = 'application/zip'
+    body = _tracked_body(body, 'download', download_name, int(headers.get('Content-Length', 0)), request.remote_addr)
+    return flask_app.response_class(body, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+
+@flask_app.route('/api/files')
+def api_list_files():
+    sort = request.args.get('sort', 'added')
+    order = request.args.get('order', 'asc')
+    if sort not in LISTING_SORT_KEYS:
+        return make_response(jsonify(error=f"Unknown sort '{sort}'. Use one of: {', '.join(LISTING_SORT_KEYS)}."), 400)
+    if order not in ('asc', 'desc'):
+        return make_response(jsonify(error="Order must be 'asc' or 'desc'."), 400)
+    try:
+        limit = int(request.args.get('limit', LISTING_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return make_response(jsonify(error="Limit must be an integer."), 400)
+    limit = max(1, min(limit, LISTING_MAX_PAGE_SIZE))
+    try:
+        page, next_cursor, total = _listing_page(sort, order == 'desc', request.args.get('cursor'), limit)
+    except ValueError as e:
+        return make_response(jsonify(error=str(e)), 400)
+    return jsonify(
+        items=[_listing_item_json(item) for item in page],
+        next_cursor=next_cursor,
+        total=total,
+        version=shared_registry.version,
+    )
+
+@flask_app.route('/download/<file_id>')
+def download_file(file_id):
+    item = shared_registry.get(file_id)
+    if item is not None:
+        file_path = item['path']
+        # No stat here: watched folders keep the registry current, and opening a file that is gone
+        # (or is a folder) fails with a 404 just the same
+        return _send_shared_file(file_path, item['name'])
+    else:
+        abort(404, description="Invalid file ID.")
+
+@flask_app.route('/thumb/<file_id>')
+def thumbnail_route(file_id):
+    item = shared_registry.get(file_id)
+    if item is None or not _is_thumbnailable(item['name'], item['size_bytes']):
+        abort(404, description="No thumbnail for this file.")
+    try:
+        st = os.stat(item['path'])
+    except OSError:
+        abort(404, description="File not found on server or is not a file.")
+    etag = thumbnailer.cache_key(file_identity(st))
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': f"public, max-age={THUMB_MAX_AGE}"}
+    if not is_resource_modified(request.environ, etag=etag):
+        return flask_app.response_class(status=304, headers=headers)
+    # A thumbnail that takes longer to make is not waited for, so slow images don't hold server
+    # workers; the page asks again after Retry-After
+    cache_path, pending = thumbnailer.get(item['path'], st, THUMB_WAIT)
+    if pending:
+        return make_response(jsonify(error="Thumbnail is being made."), 503,
+                             {'Retry-After': '1', 'Cache-Control': 'no-store'})
+    if cache_path is None:
+        abort(404, description="This file could not be previewed.")
+    try:
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+    except OSError: # Trimmed from the cache in the meantime
+        abort(404, description="This file could not be previewed.")
+    return flask_app.response_class(data, headers=headers, content_type='image/jpeg')
+
+# --- Search ---
+# Substring search over the shared files' relative paths (folder and file name). Every path is
+# indexed by its trigrams; a posting list holds the insertion numbers ('seq') of the items that
+# contain a trigram, in ascending order, so results come out in "added" order and a page can
+# resume from its cursor with a bisect.
+SEARCH_DEFAULT_PAGE_SIZE = 50
+SEARCH_MAX_QUERY_LENGTH = 200
+SEARCH_COMPACT_MIN_DEAD = 10000 # Removed entries tolerated in posting lists before they are rebuilt
+SEARCH_INDEX_BATCH = 2000 # Items indexed per hold of the index lock, so searches never wait long
+SEARCH_INDEX_QUIET = 0.5 # Seconds without registry changes before queued changes are indexed...
+SEARCH_INDEX_MAX_DELAY = 2.0 # ...or at most this long after the first of them
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SearchIndex:
+    # Registry changes are only queued by the listener (it runs under the registry lock, on the
+    # thread that shares files). A background thread folds them into the index a batch at a time
+    # and is the only writer; searches just read whatever has been indexed so far.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changes = collections.deque() # (added_items, removed_items) not yet applied
+        self._wake = threading.Event()
+        self._thread = None
+        self._entries = {} # seq -> (casefolded rel_path, uid)
+        self._postings = {'': array.array('I')} # trigram -> seqs; '' lists every item
+        self._dead = 0 # Removed seqs still present in posting lists
+
+    def on_registry_change(self, added, removed):
+        self._changes.append((added, removed))
+        if self._thread is None: # Listener calls are serialized by the registry lock
+            self._thread = threading.Thread(target=self._run, daemon=True, name="EQS-search-index")
+            self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let a burst of changes (a folder being shared) finish first, so indexing doesn't
+            # compete with it for the interpreter
+            deadline = time.monotonic() + SEARCH_INDEX_MAX_DELAY
+            while True:
+                self._wake.clear()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._wake.wait(min(SEARCH_INDEX_QUIET, remaining)):
+                    break
+            while self._changes:
+                with self._lock:
+                    self._apply_batch()
+            if self._dead > max(SEARCH_COMPACT_MIN_DEAD, len(self._entries)):
+                self._rebuild()
+
+    def _apply_batch(self):
+        # Applies queued changes until about SEARCH_INDEX_BATCH items have been indexed. A change
+        # that is cut short is put back with only the items still to add.
+        budget = SEARCH_INDEX_BATCH
+        while self._changes and budget > 0:
+            added, removed = self._changes.popleft()
+            if removed:
+                kept = {item['seq'] for item in added} # Re-added with a new size; the path is the same
+                for item in removed:
+                    if item['seq'] not in kept and self._entries.pop(item['seq'], None) is not None:
+                        self._dead += 1
+            for item in added[:budget]:
+                if item['seq'] not in self._entries:
+                    self._index(self._entries, self._postings, item['seq'], item['rel_path'].casefold(), item['uid'])
+            if len(added) > budget:
+                self._changes.appendleft((added[budget:], ()))
+            budget -= len(added)
+
+    @staticmethod
+    def _index(entries, postings_by_gram, seq, key, uid):
+        # Seqs only grow, so appending keeps every posting list sorted
+        entries[seq] = (key, uid)
+        postings_by_gram[''].append(seq)
+        for gram in _trigrams(key):
+            postings = postings_by_gram.get(gram)
+            if postings is None:
+                postings = postings_by_gram[gram] = array.array('I')
+            postings.append(seq)
+
+    def _rebuild(self):
+        # Builds fresh posting lists without the removed seqs. Only this thread writes, so the
+        # snapshot stays current while the new lists are built outside the lock.
+        with self._lock:
+            snapshot = sorted(self._entries.items())
+        entries = {}
+        postings = {'': array.array('I')}
+        for seq, (key, uid) in snapshot:
+            self._index(entries, postings, seq, key, uid)
+        with self._lock:
+            self._entries = entries
+            self._postings = postings
+            self._dead = 0
+
+    def search(self, query, after_seq=None, limit=SEARCH_DEFAULT_PAGE_SIZE):
+        # Returns (uids of items whose path contains every word of the query, (seq, uid) of the
+        # last one if there are more)
+        terms = query.casefold().split()
+        if not terms:
+            return [], None
+        with self._lock:
+            # Candidates come from the rarest trigram of the query and are checked in full;
+            # a query of only one- and two-letter words has to look at every item
+            candidates = self._postings['']
+            for term in terms:
+                for gram in _trigrams(term):
+                    postings = self._postings.get(gram)
+                    if postings is None:
+                        return [], None
+                    if len(postings) < len(candidates):
+                        candidates = postings
+            start = bisect.bisect_right(candidates, after_seq) if after_seq is not None else 0
+            matches = []
+            for index in range(start, len(candidates)):
+                entry = self._entries.get(candidates[index])
+                if entry is None: # Removed
+                    continue
+                if all(term in entry[0] for term in terms):
+                    if len(matches) == limit:
+                        return [uid for _, uid in matches], matches[-1]
+                    matches.append((candidates[index], entry[1]))
+        return [uid for _, uid in matches], None
+
+search_index = SearchIndex()
+shared_registry.add_listener(search_index.on_registry_change)
+
+@flask_app.route('/api/search')
+def api_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return make_response(jsonify(error="Missing search query 'q'."), 400)
+    if len(query) > SEARCH_MAX_QUERY_LENGTH:
+        return make_response(jsonify(error=f"Search query is longer than {SEARCH_MAX_QUERY_LENGTH} characters."), 400)
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return make_response(jsonify(error="Limit must be an integer."), 400)
+    limit = max(1, min(limit, LISTING_MAX_PAGE_SIZE))
+    after_seq = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_seq, _ = _decode_listing_cursor('search', cursor)
+        except ValueError as e:
+            return make_response(jsonify(error=str(e)), 400)
+    uids, last = search_index.search(query, after_seq, limit)
+    items = [item for item in map(shared_registry.get, uids) if item is not None]
+    return jsonify(
+        items=[_listing_item_json(item) for item in items],
+        next_cursor=_encode_listing_cursor('search', last) if last is not None else None,
+        query=query,
+    )
+
+# --- Upload helpers ---
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _uploads_available():
+    return bool(upload_receiver is not None and upload_receiver.accepting_uploads())
+
+# Uploads are staged in a hidden folder inside the receiving folder, so accepting one is a rename
+# on the same filesystem rather than a copy out of the system temp directory.
+UPLOAD_STAGING_DIRNAME = ".eqs-partial"
+FINALIZE_CHUNK_SIZE = 8 * 1024 * 1024
+FINALIZE_PROGRESS_INTERVAL = 0.1 # Seconds between progress callbacks during a cross-device copy
+FINALIZE_WORKERS = 2 # Accepted files are moved into place by at most this many threads at once
+_upload_staging_dirs = {} # receiving folder -> staging folder created for it this session
+
+def set_upload_staging_dir(receiving_folder):
+    # Points new uploads at a per-session folder under receiving_folder. Uploads already in flight
+    # keep their temp paths. Falls back to the current staging folder if it can't be created.
+    global UPLOAD_TEMP_DIR
+    key = os.path.normcase(os.path.abspath(receiving_folder))
+    staging_dir = _upload_staging_dirs.get(key)
+    if staging_dir is None or not os.path.isdir(staging_dir):
+        try:
+            parent = os.path.join(receiving_folder, UPLOAD_STAGING_DIRNAME)
+            os.makedirs(parent, exist_ok=True)
+            if os.name == 'nt':
+                ctypes.windll.kernel32.SetFileAttributesW(parent, 0x02) # FILE_ATTRIBUTE_HIDDEN
+            staging_dir = tempfile.mkdtemp(prefix="session-", dir=parent)
+        except OSError:
+            return UPLOAD_TEMP_DIR
+        _upload_staging_dirs[key] = staging_dir
+    UPLOAD_TEMP_DIR = staging_dir
+    return staging_dir
+
+def remove_upload_staging_dirs():
+    # Deletes every staging folder this session created (and unaccepted uploads in them)
+    for staging_dir in {_UPLOAD_FALLBACK_DIR, UPLOAD_TEMP_DIR, *_upload_staging_dirs.values()}:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        parent = os.path.dirname(staging_dir)
+        if os.path.basename(parent) == UPLOAD_STAGING_DIRNAME:
+            try:
+                os.rmdir(parent) # Only if no other instance is still using it
+            except OSError:
+                pass
+    _upload_staging_dirs.clear()
+
+def _copy_file_chunked(src_path, dst_path, on_progress=None):
+    # Lets the kernel move the data where it can (copy_file_range, then sendfile), falling back
+    # to plain reads and writes. on_progress(copied, total) is called at most every
+    # FINALIZE_PROGRESS_INTERVAL seconds and once at the end.
+    total = os.path.getsize(src_path)
+    copied = 0
+    last_report = time.monotonic()
+    if hasattr(os, 'copy_file_range'):
+        mode = 'copy_file_range'
+    elif hasattr(os, 'sendfile') and sys.platform.startswith('linux'): # Linux can sendfile between files
+        mode = 'sendfile'
+    else:
+        mode = 'read'
+    buffer = None
+    with open(src_path, 'rb', buffering=0) as fin, open(dst_path, 'wb', buffering=0) as fout:
+        in_fd, out_fd = fin.fileno(), fout.fileno()
+        while copied < total:
+            count = min(FINALIZE_CHUNK_SIZE, total - copied)
+            try:
+                if mode == 'copy_file_range':
+                    written = os.copy_file_range(in_fd, out_fd, count)
+                elif mode == 'sendfile':
+                    written = os.sendfile(out_fd, in_fd, None, count)
+                else:
+                    if buffer is None:
+                        buffer = bytearray(FINALIZE_CHUNK_SIZE)
+                    read = fin.readinto(memoryview(buffer)[:count])
+                    written = 0
+                    while written < read:
+                        written += fout.write(memoryview(buffer)[written:read])
+            except OSError as e:
+                # Both calls advance the file offsets, so the next method continues where this one stopped
+                if mode != 'read' and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                    mode = 'sendfile' if mode == 'copy_file_range' and sys.platform.startswith('linux') else 'read'
+                    continue
+                raise
+            if not written:
+                raise IOError(f"source file shrank during copy ({copied} of {total} bytes)")
+            copied += written
+            now = time.monotonic()
+            if on_progress and now - last_report >= FINALIZE_PROGRESS_INTERVAL:
+                on_progress(copied, total)
+                last_report = now
+    if on_progress:
+        on_progress(copied, total)
+    return copied
+
+def finalize_upload(temp_path, final_save_path, on_progress=None, copy=False):
+    # Moves a staged upload into place. On the same filesystem this is one atomic rename; otherwise
+    # (or with copy set) the data is copied next to the target under a temporary name and renamed
+    # over it, so a half-written file never appears at final_save_path. Returns True if copied.
+    target_dir = os.path.dirname(final_save_path) or '.'
+    os.makedirs(target_dir, exist_ok=True) # Files from folder uploads keep their sub-folders
+    if not copy:
+        try:
+            os.replace(temp_path, final_save_path)
+            return False
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    fd, partial_path = tempfile.mkstemp(dir=target_dir, prefix=".eqs-", suffix=".part")
+    os.close(fd)
+    try:
+        _copy_file_chunked(temp_path, partial_path, on_progress)
+        os.replace(partial_path, final_save_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.remove(temp_path)
+    return True
+
+def reserve_save_path(path):
+    # Picks "name.ext", "name (1).ext", ... and creates it empty with O_EXCL, so concurrent
+    # finalizers never pick the same name. finalize_upload() then replaces the placeholder.
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    stem, ext = os.path.splitext(path)
+    for attempt in itertools.count():
+        candidate = path if attempt == 0 else f"{stem} ({attempt}){ext}"
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return candidate
+        except FileExistsError:
+            continue
+
+def save_incoming_file(pending_id, final_save_path, unique_name=False, on_progress=None):
+    # Moves a pending upload to final_save_path (or the first free "name (n).ext" next to it when
+    # unique_name is set) and returns the path used. On failure the staged file is deleted too.
+    pending_info = incoming_files_buffer.get(pending_id)
+    if pending_info is None:
+        raise KeyError(f"no data for pending ID {pending_id}")
+    temp_path = pending_info['temp_path']
+    reserved_path = None
+    # Tracked under the pending ID, so the window can match it to the pending row
+    transfer = transfers.start('save', pending_info['relative_path'], pending_info['size'],
+                               pending_info['sender_ip'], transfer_id=pending_id)
+    ok = False
+
+    def progress(done, total):
+        transfer.done = done
+        if on_progress:
+            on_progress(done, total)
+
+    try:
+        # A deduplicated upload is a hard link to a file that was already here; it is copied out,
+        # so the saved file and the original don't stay one file under two names
+        linked_identity = pending_info.get('linked_identity')
+        if linked_identity is not None and file_identity(os.stat(temp_path)) != linked_identity:
+            raise IOError("the matching file changed before it was saved; send it again")
+        if unique_name:
+            final_save_path = reserved_path = reserve_save_path(final_save_path)
+        # A rename when the staging folder shares the target's filesystem; otherwise a chunked
+        # copy that reports progress as it goes
+        if finalize_upload(temp_path, final_save_path, progress, copy=linked_identity is not None) and linked_identity is None:
+            logger.debug(f"'{os.path.basename(final_save_path)}' was copied across filesystems; staging folder is {UPLOAD_TEMP_DIR}")
+        transfer.done = transfer.total
+        ok = True
+        return final_save_path
+    except BaseException:
+        # Drop the empty placeholder if the file never made it there
+        if reserved_path and os.path.exists(reserved_path) and os.path.getsize(reserved_path) == 0:
+            try:
+                os.remove(reserved_path)
+            except OSError:
+                pass
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        raise
+    finally:
+        transfers.finish(transfer, ok)
+        incoming_files_buffer.pop(pending_id, None)
+
+def discard_incoming_file(pending_id):
+    # Deletes a rejected upload; returns its buffer entry, or None if it was already gone
+    pending_info = incoming_files_buffer.pop(pending_id, None)
+    if pending_info is not None and os.path.exists(pending_info['temp_path']):
+        os.remove(pending_info['temp_path'])
+    return pending_info
+
+class AutoAcceptPolicy:
+    # Decides which incoming files are saved without asking. Every configured condition has to
+    # match; a condition left empty matches anything.
+    def __init__(self, enabled=False, networks=(), max_size=0, extensions=()):
+        self.enabled = enabled
+        self.networks = tuple(networks)  # ipaddress networks; empty = any sender
+        self.max_size = max_size         # bytes; 0 = no limit
+        self.extensions = frozenset(ext.lower().lstrip('.') for ext in extensions) # empty = any type
+
+    @classmethod
+    def from_text(cls, enabled, senders_text, max_size_mib, extensions_text):
+        # Raises ValueError for a malformed address or network
+        networks = [ipaddress.ip_network(token, strict=False) for token in re.split(r'[\s,;]+', senders_text) if token]
+        extensions = [token for token in re.split(r'[\s,;]+', extensions_text) if token.strip('.')]
+        return cls(enabled, networks, int(max_size_mib) * 1024 * 1024, extensions)
+
+    def matches(self, filename, size, sender_ip):
+        if not self.enabled:
+            return False
+        if self.max_size and size > self.max_size:
+            return False
+        if self.extensions and os.path.splitext(filename)[1].lower().lstrip('.') not in self.extensions:
+            return False
+        if self.networks:
+            try:
+                address = ipaddress.ip_address(sender_ip)
+            except ValueError:
+                return False
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            if not any(address in network for network in self.networks):
+                return False
+        return True
+
+auto_accept_policy = AutoAcceptPolicy()
+
+# A single multipart request may carry at most this many files (e.g. one uploaded folder)
+UPLOAD_MAX_FILES_PER_REQUEST = 10000
+UPLOAD_MAX_FIELD_SIZE = 64 * 1024
+
+def _sanitize_relative_path(name):
+    # Keeps the folder structure of a browser folder upload, but no absolute or ".." parts
+    parts = [secure_filename(part) for part in re.split(r'[\\/]+', name)]
+    parts = [part for part in parts if part]
+    return '/'.join(parts)
+
+def _register_incoming_file(original_filename, temp_file_path, sender_ip, batch_id=None, linked_identity=None):
+    file_size = os.path.getsize(temp_file_path)
+    pending_id = os.path.basename(temp_file_path) # Use the unique temp filename as ID
+    incoming_files_buffer[pending_id] = {
+        'original_filename': os.path.basename(original_filename),
+        'relative_path': original_filename,
+        'temp_path': temp_file_path,
+        'size': file_size,
+        'sender_ip': sender_ip,
+        'batch_id': batch_id,
+        'linked_identity': linked_identity, # Set when temp_path is a hard link to a file that was already here
+    }
+    if batch_id is not None:
+        return pending_id
+    upload_receiver.notify_incoming(None, [(pending_id, original_filename, file_size, sender_ip)])
+    return make_response(jsonify(message=f"File '{original_filename}' received by server, awaiting user confirmation in EQS app."), 202)
+
+def _register_incoming_batch(entries, sender_ip):
+    # Registers every file of one request together and notifies the Qt app once
+    batch_id = uuid.uuid4().hex
+    pending = []
+    for entry in entries:
+        pending_id = _register_incoming_file(entry['relative_path'], entry['temp_path'], sender_ip, batch_id=batch_id)
+        pending.append((pending_id, entry['relative_path'], incoming_files_buffer[pending_id]['size'], sender_ip))
+    upload_receiver.notify_incoming(batch_id, pending)
+    return make_response(jsonify(message=f"{len(entries)} files received by server, awaiting user confirmation in EQS app.", batch_id=batch_id), 202)
+
+def _receive_multipart_files(boundary):
+    # Streams a multipart body with werkzeug's incremental decoder, so file parts are never
+    # spooled in memory or copied from a spool file; only "file" parts are kept.
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_parts=UPLOAD_MAX_FILES_PER_REQUEST)
+    stream = request.stream
+    entries = []
+    current = None
+    out = None
+    field_size = 0
+    # One transfer for the whole request body, named after the file being received
+    transfer = transfers.start('upload', "upload", request.content_length, request.remote_addr)
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            transfer.done += len(chunk)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, MultipartFile) and event.name == 'file' and _sanitize_relative_path(event.filename):
+                    relative_path = _sanitize_relative_path(event.filename)
+                    fd, temp_file_path = tempfile.mkstemp(dir=UPLOAD_TEMP_DIR, prefix=f"{os.path.basename(relative_path)}_")
+                    out = os.fdopen(fd, 'wb')
+                    current = {'relative_path': relative_path, 'temp_path': temp_file_path}
+                    transfer.name = relative_path if not entries else f"{relative_path} (file {len(entries) + 1})"
+                elif isinstance(event, (MultipartFile, MultipartField)):
+                    current = None # Empty file inputs and plain form fields are skipped
+                    field_size = 0
+                elif isinstance(event, MultipartData):
+                    if current is not None:
+                        out.write(event.data)
+                        if not event.more_data:
+                            out.close()
+                            out = None
+                            entries.append(current)
+                            current = None
+                    else:
+                        field_size += len(event.data)
+                        if field_size > UPLOAD_MAX_FIELD_SIZE:
+                            raise ValueError("form field too large")
+                event = decoder.next_event()
+            if isinstance(event, Epilogue):
+                break
+            if not chunk:
+                raise IOError("upload ended before the request body was complete")
+    except BaseException:
+        transfers.finish(transfer, False)
+        if out is not None:
+            out.close()
+        for entry in entries + ([current] if current else []):
+            if os.path.exists(entry['temp_path']): # Clean up if save failed
+                os.remove(entry['temp_path'])
+        raise
+    transfers.finish(transfer, True)
+    return entries
+
+# --- Resumable uploads ---
+# A tus-like protocol for large uploads over unreliable links:
+#   POST   /api/uploads                {"name", "size"} -> 201 with the upload id
+#   PATCH  /api/uploads/<id>           Upload-Offset: N, body = bytes to store at N
+#                                      (chunks may arrive out of order and in parallel)
+#   GET    /api/uploads/<id>           contiguous offset plus the ranges still missing
+#   POST   /api/uploads/<id>/complete  hand the assembled file over for confirmation
+#   DELETE /api/uploads/<id>           abandon the upload
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+# Idle sessions are kept this long, so a laptop can sleep overnight and still resume
+RESUMABLE_UPLOAD_TTL = 24 * 60 * 60
+RESUMABLE_UPLOAD_MAX_SIZE = 1024 ** 4 # Largest declared upload size accepted (1 TiB)
+resumable_uploads = {}
+_resumable_uploads_lock = threading.Lock()
+
+class ResumableUpload:
+    def __init__(self, upload_id, original_filename, size, temp_path, sender_ip):
+        self.id = upload_id
+        self.original_filename = original_filename
+        self.size = size
+        self.temp_path = temp_path
+        self.sender_ip = sender_ip
+        self.received = [] # Sorted, non-overlapping (start, stop) ranges already on disk
+        self.active_writers = 0
+        self.completed = False
+        self.last_activity = time.monotonic()
+
+    def mark_received(self, start, stop):
+        merged = []
+        for range_start, range_stop in sorted(self.received + [(start, stop)]):
+            if merged and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_stop))
+            else:
+                merged.append((range_start, range_stop))
+        self.received = merged
+
+    @property
+    def offset(self):
+        # Length of the prefix that has fully arrived
+        if self.received and self.received[0][0] == 0:
+            return self.received[0][1]
+        return 0
+
+    def missing_ranges(self):
+        missing = []
+        position = 0
+        for start, stop in self.received:
+            if start > position:
+                missing.append((position, start))
+            position = stop
+        if position < self.size:
+            missing.append((position, self.size))
+        return missing
+
+    def is_complete(self):
+        return self.offset == self.size
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'name': self.original_filename,
+            'size': self.size,
+            'offset': self.offset,
+            'received': sum(stop - start for start, stop in self.received),
+            'missing': self.missing_ranges(),
+            'chunk_size': RESUMABLE_CHUNK_SIZE,
+            'complete': self.is_complete(),
+        }
+
+def _purge_stale_resumable_uploads():
+    cutoff = time.monotonic() - RESUMABLE_UPLOAD_TTL
+    with _resumable_uploads_lock:
+        stale = [upload for upload in resumable_uploads.values()
+                 if upload.last_activity < cutoff and not upload.active_writers]
+        for upload in stale:
+            del resumable_uploads[upload.id]
+    for upload in stale:
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+
+def _resumable_upload_response(state, status=200):
+    response = make_response(jsonify(state), status)
+    response.headers['Upload-Offset'] = str(state['offset'])
+    response.headers['Upload-Length'] = str(state['size'])
+    return response
+
+@flask_app.route('/api/uploads', methods=['POST'])
+def create_resumable_upload_route():
+    if not _uploads_available():
+        return make_response(jsonify(error="Server is not ready to accept uploads."), 503)
+    payload = request.get_json(silent=True) or {}
+    original_filename = secure_filename(str(payload.get('name', '')))
+    size = payload.get('size')
+    if not original_filename:
+        return make_response(jsonify(error="Invalid file name"), 400)
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        return make_response(jsonify(error="Size must be a non-negative integer"), 400)
+    if size > RESUMABLE_UPLOAD_MAX_SIZE:
+        return make_response(jsonify(error=f"Upload is larger than the limit of {format_size(RESUMABLE_UPLOAD_MAX_SIZE)}"), 413)
+    _purge_stale_resumable_uploads()
+    # The temp file is sparse, so the space still owed to other open uploads is subtracted too
+    try:
+        free = shutil.disk_usage(UPLOAD_TEMP_DIR).free
+    except OSError:
+        free = None
+    if free is not None:
+        with _resumable_uploads_lock:
+            owed = sum(upload.size - sum(stop - start for start, stop in upload.received)
+                       for upload in resumable_uploads.values() if not upload.completed)
+        if size > free - owed:
+            return make_response(jsonify(error="Not enough free space on the server for this upload"), 507)
+    fd, temp_file_path = tempfile.mkstemp(dir=UPLOAD_TEMP_DIR, prefix=f"{original_filename}_")
+    try:
+        os.ftruncate(fd, size) # Reserve the full length up front; chunks are written in place
+    except OSError as e:
+        os.close(fd)
+        os.remove(temp_file_path)
+        return make_response(jsonify(error=f"Could not allocate upload: {str(e)}"), 507)
+    os.close(fd)
+    upload = ResumableUpload(uuid.uuid4().hex, original_filename, size, temp_file_path, request.remote_addr)
+    with _resumable_uploads_lock:
+        resumable_uploads[upload.id] = upload
+        state = upload.to_json()
+    response = _resumable_upload_response(state, 201)
+    response.headers['Location'] = f"/api/uploads/{upload.id}"
+    return response
+
+@flask_app.route('/api/uploads/<upload_id>', methods=['GET'])
+def resumable_upload_status_route(upload_id):
+    with _resumable_uploads_lock:
+        upload = resumable_uploads.get(upload_id)
+        if upload is None or upload.completed:
+            return make_response(jsonify(error="Unknown or expired upload"), 404)
+        state = upload.to_json()
+    return _resumable_upload_response(state)
+
+@flask_app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+def resumable_upload_chunk_route(upload_id):
+    if not _uploads_available():
+        return make_response(jsonify(error="Server is not ready to accept uploads."), 503)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return make_response(jsonify(error="Missing or invalid Upload-Offset header"), 400)
+    with _resumable_uploads_lock:
+        upload = resumable_uploads.get(upload_id)
+        if upload is None or upload.completed:
+            return make_response(jsonify(error="Unknown or expired upload"), 404)
+        length = request.content_length
+        if offset < 0 or offset > upload.size or (length is not None and offset + length > upload.size):
+            return make_response(jsonify(error="Chunk lies outside the upload"), 400)
+        upload.active_writers += 1
+
+    written = 0
+    error = None
+    transfer = transfers.start('upload', upload.original_filename, length, request.remote_addr)
+    try:
+        buffer = bytearray(UPLOAD_CHUNK_SIZE)
+        view = memoryview(buffer)
+        stream = request.stream
+        with open(upload.temp_path, 'r+b') as out:
+            out.seek(offset)
+            while True:
+                count = stream.readinto(buffer)
+                if not count:
+                    break
+                if offset + written + count > upload.size:
+                    raise ValueError("Chunk extends past the end of the upload")
+                out.write(view[:count])
+                written += count
+                transfer.done = written
+    except Exception as e:
+        error = e
+    finally:
+        transfers.finish(transfer, error is None)
+        with _resumable_uploads_lock:
+            upload.active_writers -= 1
+            if written:
+                # Whatever reached the disk counts, so an interrupted chunk resumes where it stopped
+                upload.mark_received(offset, offset + written)
+            upload.last_activity = time.monotonic()
+            state = upload.to_json()
+    if error is not None:
+        status = 400 if isinstance(error, ValueError) else 500
+        return make_response(jsonify(error=f"Error saving chunk: {str(error)}", **state), status)
+    return _resumable_upload_response(state)
+
+@flask_app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_resumable_upload_route(upload_id):
+    if not _uploads_available():
+        return make_response(jsonify(error="Server is not ready to accept uploads."), 503)
+    with _resumable_uploads_lock:
+        upload = resumable_uploads.get(upload_id)
+        if upload is None or upload.completed:
+            return make_response(jsonify(error="Unknown or expired upload"), 404)
+        if upload.active_writers or not upload.is_complete():
+            return make_response(jsonify(error="Upload is not complete yet", **upload.to_json()), 409)
+        upload.completed = True
+        del resumable_uploads[upload_id]
+    return _register_incoming_file(upload.original_filename, upload.temp_path, upload.sender_ip)
+
+@flask_app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def cancel_resumable_upload_route(upload_id):
+    with _resumable_uploads_lock:
+        upload = resumable_uploads.get(upload_id)
+        if upload is None or upload.completed:
+            return make_response(jsonify(error="Unknown or expired upload"), 404)
+        if upload.active_writers:
+            return make_response(jsonify(error="Upload has chunks in flight"), 409)
+        del resumable_uploads[upload_id]
+    if os.path.exists(upload.temp_path):
+        os.remove(upload.temp_path)
+    return make_response('', 204)
+
+@flask_app.route('/upload/<name>', methods=['PUT'])
+def upload_raw_file_route(name):
+    # Raw request body = file contents. No multipart parsing and no spooling: the body is
+    # copied in fixed-size chunks straight into its temp file.
+    if not _uploads_available():
+        return make_response(jsonify(error="Server is not ready to accept uploads."), 503)
+    original_filename = secure_filename(name)
+    if not original_filename:
+        return make_response(jsonify(error="Invalid file name"), 400)
+    expected_size = request.content_length
+    fd, temp_file_path = tempfile.mkstemp(dir=UPLOAD_TEMP_DIR, prefix=f"{original_filename}_")
+    transfer = transfers.start('upload', original_filename, expected_size, request.remote_addr)
+    ok = False
+    try:
+        received = 0
+        buffer = bytearray(UPLOAD_CHUNK_SIZE)
+        view = memoryview(buffer)
+        stream = request.stream
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                count = stream.readinto(buffer)
+                if not count:
+                    break
+                out.write(view[:count])
+                received += count
+                transfer.done = received
+        if expected_size is not None and received != expected_size:
+            raise IOError(f"upload incomplete ({received} of {expected_size} bytes received)")
+        ok = True
+        return _register_incoming_file(original_filename, temp_file_path, request.remote_addr)
+    except Exception as e:
+        if os.path.exists(temp_file_path): # Clean up if save failed
+            os.remove(temp_file_path)
+        return make_response(jsonify(error=f"Error saving file: {str(e)}"), 500)
+    finally:
+        transfers.finish(transfer, ok)
+
+@flask_app.route('/upload', methods=['POST'])
+def upload_file_route():
+    # Accepts any number of "file" parts. Each part is written to its own temp file while
+    # the body streams in, and the whole request is handed to the app as one batch.
+    if not _uploads_available():
+        return make_response(jsonify(error="Server is not ready to accept uploads."), 503)
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return make_response(jsonify(error="No file part in the request"), 400)
+    try:
+        entries = _receive_multipart_files(boundary)
+    except RequestEntityTooLarge:
+        return make_response(jsonify(error=f"Too many files in one request (limit {UPLOAD_MAX_FILES_PER_REQUEST})."), 413)
+    except Exception as e:
+        return make_response(jsonify(error=f"Error saving file: {str(e)}"), 500)
+    if not entries:
+        return make_response(jsonify(error="No selected file"), 400)
+    if len(entries) == 1:
+        entry = entries[0]
+        return _register_incoming_file(entry['relative_path'], entry['temp_path'], request.remote_addr)
+    return _register_incoming_batch(entries, request.remote_addr)
+
+
+# --- Upload deduplication ---
+# Before sending a big file the web page asks whether a shared file of that size exists. Only then
+# does it hash the file and send the SHA-256. On a match the existing bytes are staged as the
+# upload (a hard link, or a local copy across filesystems) and nothing is transferred. Only shared
+# files are matched, so the answers tell the sender nothing the file list doesn't already show.
+# Digests come from the checksum cache; the first request asks the background hasher for any
+# that are missing, so they are usually ready by the time the page has hashed its copy.
+#   POST /api/uploads/dedup   {"name", "size"}            -> {"known": true/false}
+#   POST /api/uploads/dedup   {"name", "size", "sha256"}  -> 202 as for an upload, or {"deduplicated": false}
+DEDUP_ALGORITHM = 'sha256' # What the web page computes
+DEDUP_MAX_CANDIDATES = 8 # Same-size files looked at per check at most
+
+def _dedup_candidates(size):
+    return [item for item in shared_registry.snapshot()[1] if item['size_bytes'] == size][:DEDUP_MAX_CANDIDATES]
+
+def _stage_existing_file(source_path, identity, name):
+    # Stages a file that is already here as a new upload. Returns (temp path, linked): a hard
+    # link shares the source's bytes, so save_incoming_file copies it out rather than renaming it.
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_TEMP_DIR, prefix=f"{name}_")
+    os.close(fd)
+    link_path = f"{temp_path}.link"
+    try:
+        try:
+            os.link(source_path, link_path)
+            os.replace(link_path, temp_path)
+            linked = True
+        except OSError: # Other filesystem, or no hard links there
+            _copy_file_chunked(source_path, temp_path)
+            linked = False
+        if file_identity(os.stat(source_path)) != identity:
+            raise IOError(f"'{source_path}' changed while it was staged")
+        return temp_path, linked
+    except BaseException:
+        for path in (link_path, temp_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+
+@flask_app.route('/api/uploads/dedup', methods=['POST'])
+def dedup_upload_route():
+    if not _uploads_available():
+        return make_response(jsonify(error="Server is not ready to accept uploads."), 503)
+    data = request.get_json(silent=True) or {}
+    original_filename = secure_filename(str(data.get('name', '')))
+    size = data.get('size')
+    digest = data.get(DEDUP_ALGORITHM)
+    if not original_filename:
+        return make_response(jsonify(error="Invalid file name"), 400)
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        return make_response(jsonify(error="Size must be a non-negative integer."), 400)
+    if digest is not None and not (isinstance(digest, str) and re.fullmatch(r'[0-9a-fA-F]{64}', digest)):
+        return make_response(jsonify(error=f"{DEDUP_ALGORITHM} must be 64 hexadecimal digits."), 400)
+
+    candidates = _dedup_candidates(size)
+    if digest is None:
+        for item in candidates:
+            content_hasher.request_digest(item['path'], DEDUP_ALGORITHM)
+        return jsonify(known=bool(candidates))
+    digest = digest.lower()
+    for item in candidates:
+        path = item['path']
+        try:
+            identity = file_identity(os.stat(path))
+            found = content_hasher.cached_digest(identity, DEDUP_ALGORITHM)
+            if found is None: # Not hashed yet; it will be for the next upload
+                content_hasher.request_digest(path, DEDUP_ALGORITHM)
+                continue
+            if found != digest:
+                continue
+            temp_path, linked = _stage_existing_file(path, identity, original_filename)
+        except OSError as e:
+            logger.debug(f"Skipping '{path}' as a copy of '{original_filename}': {e}")
+            continue
+        logger.info(f"'{original_filename}' from {request.remote_addr} is already here ('{path}'); "
+                    f"{format_size(size)} not transferred.")
+        return _register_incoming_file(original_filename, temp_path, request.remote_addr,
+                                       linked_identity=identity if linked else None)
+    return jsonify(deduplicated=False)
+
+
+# --- Pending upload API ---
+# Lets a headless daemon's operator (or a script) see and decide uploads that the auto-accept
+# policy did not take. Only available when the receiver has an API token.
+#   GET  /api/pending             uploads awaiting a decision
+#   POST /api/pending/<id>        {"action": "accept" | "reject"}
+def _pending_api_denied():
+    token = getattr(upload_receiver, 'api_token', None)
+    if not token:
+        return make_response(jsonify(error="The pending upload API is not enabled."), 404)
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+        response = make_response(jsonify(error="Missing or invalid API token."), 401)
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response
+    return None
+
+@flask_app.route('/api/pending', methods=['GET'])
+def api_pending_list():
+    denied = _pending_api_denied()
+    if denied:
+        return denied
+    return jsonify(items=upload_receiver.pending_files())
+
+@flask_app.route('/api/pending/<pending_id>', methods=['POST'])
+def api_pending_decide(pending_id):
+    denied = _pending_api_denied()
+    if denied:
+        return denied
+    action = (request.get_json(silent=True) or {}).get('action')
+    if action not in ('accept', 'reject'):
+        return make_response(jsonify(error="Action must be 'accept' or 'reject'."), 400)
+    decide = upload_receiver.accept if action == 'accept' else upload_receiver.reject
+    if not decide(pending_id):
+        return make_response(jsonify(error="Unknown pending ID, or it was already decided."), 404)
+    return make_response(jsonify(id=pending_id, action=action), 202 if action == 'accept' else 200)
+
+
+# --- Metrics ---
+# Load counters in the Prometheus text format, served at /metrics. A request costs one lock
+# round-trip when it is routed and one when its response is closed; response bodies are counted
+# per chunk without locking, and sendfile downloads report their size once at the end.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300) # Seconds
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# (route, method) -> direction, for the in-flight transfer gauge
+TRANSFER_ROUTES = {
+    ('/download/<file_id>', 'GET'): 'download',
+    ('/archive', 'GET'): 'download',
+    ('/archive', 'POST'): 'download',
+    ('/upload', 'POST'): 'upload',
+    ('/upload/<name>', 'PUT'): 'upload',
+    ('/api/uploads/<upload_id>', 'PATCH'): 'upload',
+}
+
+def _metric_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class ServerMetrics:
+    # Thread-safe counters shared by every server thread. Routes are labelled by their URL rule
+    # ("/download/<file_id>"), never by the requested path, so the number of series stays fixed.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = collections.Counter() # (route, method, status) -> requests answered
+        self.latency = {} # route -> [count per bucket (+Inf last), sum of seconds]
+        self.in_flight = collections.Counter() # route -> requests being handled
+        self.transfers = collections.Counter() # 'download' / 'upload' -> transfers in progress
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.server = None # The running HTTP server, for its worker counts
+
+    def request_started(self, route, method):
+        transfer = TRANSFER_ROUTES.get((route, method))
+        with self._lock:
+            self.in_flight[route] += 1
+            if transfer:
+                self.transfers[transfer] += 1
+
+    def request_finished(self, route, method, status, elapsed, sent, received, started):
+        bucket = bisect.bisect_left(METRICS_LATENCY_BUCKETS, elapsed)
+        transfer = TRANSFER_ROUTES.get((route, method)) if started else None
+        with self._lock:
+            self.requests[(route, method, status)] += 1
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = [[0] * (len(METRICS_LATENCY_BUCKETS) + 1), 0.0]
+            histogram[0][bucket] += 1
+            histogram[1] += elapsed
+            self.bytes_sent += sent
+            self.bytes_received += received
+            if started:
+                self.in_flight[route] -= 1
+            if transfer:
+                self.transfers[transfer] -= 1
+
+    def add_bytes_sent(self, count):
+        with self._lock:
+            self.bytes_sent += count
+
+    def render(self):
+        with self._lock:
+            requests = sorted(self.requests.items())
+            latency = sorted((route, list(counts), total) for route, (counts, total) in self.latency.items())
+            in_flight = sorted(self.in_flight.items())
+            transfers = dict(self.transfers)
+            bytes_sent, bytes_received = self.bytes_sent, self.bytes_received
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name, value, **labels):
+            label_text = ",".join(f'{key}="{_metric_label(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        header("eqs_http_requests_total", "counter", "HTTP requests answered, by route, method and status code.")
+        for (route, method, status), count in requests:
+            sample("eqs_http_requests_total", count, route=route, method=method, status=status)
+        header("eqs_http_request_duration_seconds", "histogram",
+               "Time from receiving a request to closing its response, including the body transfer.")
+        for route, counts, total in latency:
+            cumulative = 0
+            for bound, count in zip((*METRICS_LATENCY_BUCKETS, "+Inf"), counts):
+                cumulative += count
+                sample("eqs_http_request_duration_seconds_bucket", cumulative, route=route, le=bound)
+            sample("eqs_http_request_duration_seconds_sum", f"{total:.6f}", route=route)
+            sample("eqs_http_request_duration_seconds_count", cumulative, route=route)
+        header("eqs_http_requests_in_flight", "gauge", "Requests being handled, by route.")
+        for route, count in in_flight:
+            sample("eqs_http_requests_in_flight", count, route=route)
+        header("eqs_transfers_in_flight", "gauge", "Downloads and uploads in progress.")
+        for direction in ('download', 'upload'):
+            sample("eqs_transfers_in_flight", transfers.get(direction, 0), direction=direction)
+        header("eqs_http_sent_bytes_total", "counter", "Response body bytes sent.")
+        sample("eqs_http_sent_bytes_total", bytes_sent)
+        header("eqs_http_received_bytes_total", "counter", "Request body bytes received.")
+        sample("eqs_http_received_bytes_total", bytes_received)
+        header("eqs_upload_queue_depth", "gauge", "Uploads received and waiting to be accepted or rejected.")
+        sample("eqs_upload_queue_depth", len(incoming_files_buffer))
+        header("eqs_shared_files", "gauge", "Files currently shared.")
+        sample("eqs_shared_files", len(shared_registry))
+        header("eqs_threads", "gauge", "Threads in the EQS process.")
+        sample("eqs_threads", threading.active_count())
+        stats = getattr(self.server, 'stats', None) # Only the pool backend keeps these
+        if stats is not None:
+            stats = stats()
+            header("eqs_server_workers", "gauge", "Worker threads of the pool server.")
+            sample("eqs_server_workers", stats['workers'])
+            header("eqs_server_workers_busy", "gauge", "Pool workers serving a connection.")
+            sample("eqs_server_workers_busy", stats['busy'])
+            header("eqs_server_connections_queued", "gauge", "Accepted connections waiting for a worker.")
+            sample("eqs_server_connections_queued", stats['queued'])
+            header("eqs_server_connections_rejected_total", "counter", "Connections refused with 503 because the queue stayed full.")
+            sample("eqs_server_connections_rejected_total", stats['rejected'])
+        return "\n".join(lines) + "\n"
+
+server_metrics = ServerMetrics()
+
+class _CountingInput(io.RawIOBase):
+    # Request body wrapper that counts what the application reads
+    def __init__(self, stream):
+        self._stream = stream
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        count = self._stream.readinto(b)
+        self.count += count or 0
+        return count
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.count += len(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self._stream.readline(size)
+        self.count += len(data)
+        return data
+
+class _MeteredResponse:
+    # Passes the response body through, counting it, and records the request when the server
+    # closes the response (i.e. after the last byte was written or the client went away)
+    def __init__(self, iterable, on_close):
+        self._iterable = iterable
+        self._on_close = on_close
+        self.sent = 0
+
+    def __iter__(self):
+        for chunk in self._iterable:
+            self.sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close:
+                on_close(self.sent)
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        started_at = time.perf_counter()
+        body = None
+        if environ.get('CONTENT_LENGTH', '0') not in ('', '0') or environ.get('HTTP_TRANSFER_ENCODING'):
+            body = environ['wsgi.input'] = _CountingInput(environ['wsgi.input'])
+        status = ['500']
+
+        def metered_start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        def finished(sent):
+            route = environ.get('eqs.metrics_route')
+            self.metrics.request_finished(route or 'other', environ.get('REQUEST_METHOD', ''), status[0],
+                                          time.perf_counter() - started_at, sent,
+                                          body.count if body is not None else 0, route is not None)
+
+        try:
+            iterable = self.app(environ, metered_start_response)
+        except BaseException:
+            finished(0)
+            raise
+        return _MeteredResponse(iterable, finished)
+
+flask_app.wsgi_app = MetricsMiddleware(flask_app.wsgi_app, server_metrics)
+
+@flask_app.before_request
+def _metrics_request_started():
+    route = request.url_rule.rule if request.url_rule is not None else 'other'
+    request.environ['eqs.metrics_route'] = route
+    server_metrics.request_started(route, request.method)
+
+@flask_app.route('/metrics')
+def metrics_route():
+    response = make_response(server_metrics.render())
+    response.headers['Content-Type'] = METRICS_CONTENT_TYPE
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+# --- HTTP server backends ---
+# "pool" is a bounded server: a fixed set of worker threads takes accepted connections from a
+# queue of limited size, connections are kept alive between requests, and sockets time out.
+# "threaded" is werkzeug's development server (one unbounded thread and one request per
+# connection), kept for troubleshooting. Options apply the next time the server starts.
+SERVER_BACKEND = 'pool'
+SERVER_WORKERS = 32                 # Connections served at once
+SERVER_MAX_PENDING = 64             # Accepted connections waiting for a worker
+SERVER_QUEUE_WAIT = 2               # Seconds to wait for room in a full queue before refusing with 503
+SERVER_LISTEN_BACKLOG = 128         # Connections the OS holds before they are accepted
+SERVER_KEEP_ALIVE_TIMEOUT = 5       # Seconds an idle kept-alive connection waits for its next request
+SERVER_HEADER_TIMEOUT = 10          # Seconds a new connection may take to start its request, and each header read may stall
+SERVER_REQUEST_TIMEOUT = 60         # Seconds a single socket read or write may stall
+SERVER_MAX_KEEP_ALIVE_REQUESTS = 100
+# Unread request body the server will skip to reuse a connection; beyond this it just closes it
+KEEP_ALIVE_DRAIN_LIMIT = 1024 * 1024
+_SERVER_BUSY_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                         b"Content-Type: text/plain\r\nContent-Length: 12\r\nConnection: close\r\n\r\nServer busy.")
+
+class _RequestBodyReader(io.RawIOBase):
+    # wsgi.input for one request on a kept-alive connection. It never reads past the request's
+    # Content-Length and remembers how much is left, so the rest can be skipped afterwards.
+    def __init__(self, rfile, length):
+        super().__init__()
+        self._rfile = rfile
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')[:self.remaining]
+        if not len(view):
+            return 0
+        count = self._rfile.readinto(view) or 0
+        self.remaining -= count
+        return count
+
+    def drain(self, limit):
+        # Returns True if the connection is positioned at the next request
+        if self.remaining > limit:
+            return False
+        while self.remaining:
+            if not self.read(min(UPLOAD_CHUNK_SIZE, self.remaining)):
+                return False
+        return True
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    # werkzeug's handler answers one request and closes the connection. This one serves
+    # HTTP/1.1 requests back to back on the same connection until the client closes it, it
+    # sits idle for SERVER_KEEP_ALIVE_TIMEOUT, or the server needs the worker for someone else.
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; with Nagle on, the body of a kept-alive
+        # response waits for the client's delayed ACK (~40 ms)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.requests_handled = 0
+
+    def handle_one_request(self):
+        # Wait for the request line quietly; an idle timeout is not an error. A new connection
+        # gets the short header timeout, so idle sockets can't hold every worker for long.
+        self.connection.settimeout(self.server.keep_alive_timeout if self.requests_handled
+                                   else self.server.header_timeout)
+        try:
+            if not self.rfile.peek(1):
+                self.close_connection = True
+                return
+        except OSError:
+            self.close_connection = True
+            return
+        # Request line and headers; run_wsgi switches to the request timeout for the body
+        self.connection.settimeout(self.server.header_timeout)
+        super().handle_one_request()
+        self.requests_handled += 1
+        if (self.requests_handled >= self.server.max_keep_alive_requests
+                or self.server.shutting_down or self.server.is_saturated()):
+            self.close_connection = True
+
+    def run_wsgi(self):
+        self.connection.settimeout(self.server.request_timeout)
+        if self.headers.get("Expect", "").lower().strip(" \t") == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        self.environ = environ = self.make_environ()
+        body = None
+        if not environ.get('wsgi.input_terminated'): # Chunked request bodies keep werkzeug's reader
+            try:
+                length = max(0, int(environ.get('CONTENT_LENGTH') or 0))
+            except ValueError:
+                length = 0
+                self.close_connection = True
+            body = environ['wsgi.input'] = _RequestBodyReader(self.rfile, length)
+        status_set = headers_set = None
+        headers_sent = False
+        chunked = False
+        expected_length = None
+        written = 0
+
+        def count_direct_write(count):
+            # Bytes the application sent straight to the socket (sendfile)
+            nonlocal written
+            written += count
+        environ['eqs.bytes_sent_directly'] = count_direct_write
+
+        def write(data):
+            nonlocal headers_sent, chunked, expected_length, written
+            if not headers_sent:
+                code_str, _, msg = status_set.partition(' ')
+                code = int(code_str)
+                self.send_response(code, msg)
+                for key, value in headers_set:
+                    lower_key = key.lower()
+                    if lower_key == 'connection': # Hop-by-hop; decided below
+                        if 'close' in value.lower():
+                            self.close_connection = True
+                        continue
+                    if lower_key == 'content-length':
+                        expected_length = int(value)
+                    self.send_header(key, value)
+                if environ['REQUEST_METHOD'] == 'HEAD' or 100 <= code < 200 or code in (204, 304):
+                    expected_length = 0
+                elif expected_length is None:
+                    if self.request_version == 'HTTP/1.1':
+                        chunked = True
+                        self.send_header('Transfer-Encoding', 'chunked')
+                    else:
+                        self.close_connection = True # The body ends when the connection does
+                if (self.server.shutting_down or self.requests_handled + 1 >= self.server.max_keep_alive_requests
+                        or (body is not None and body.remaining > KEEP_ALIVE_DRAIN_LIMIT)):
+                    self.close_connection = True # Announced here, so clients don't reuse a closing connection
+                self.send_header('Connection', 'close' if self.close_connection else 'keep-alive')
+                self.end_headers()
+                headers_sent = True
+            if data:
+                if chunked:
+                    self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                else:
+                    self.wfile.write(data)
+                written += len(data)
+
+        def start_response(status, headers, exc_info=None):
+            nonlocal status_set, headers_set
+            if exc_info:
+                try:
+                    if headers_sent:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None
+            elif headers_set:
+                raise AssertionError("Headers already set")
+            status_set = status
+            headers_set = headers
+            return write
+
+        def execute(app):
+            application_iter = app(environ, start_response)
+            try:
+                for data in application_iter:
+                    write(data)
+                if not headers_sent:
+                    write(b"")
+                if chunked:
+                    self.wfile.write(b"0\r\n\r\n")
+            finally:
+                if hasattr(application_iter, "close"):
+                    application_iter.close()
+
+        try:
+            execute(self.server.app)
+        except (ConnectionError, TimeoutError):
+            self.close_connection = True
+            raise
+        except Exception:
+            self.close_connection = True
+            if self.server.passthrough_errors:
+                raise
+            logger.error(f"Error handling {self.command} {self.path}", exc_info=True)
+            if not headers_sent:
+                status_set = headers_set = None
+                try:
+                    execute(InternalServerError())
+                except Exception:
+                    pass
+            return
+        # The connection can only carry another request if this response had exactly the length
+        # it announced (bodies sent with sendfile report their bytes through the environ) and the
+        # request body has been read to its end. Either failing here means something went wrong
+        # mid-response, after the headers promised keep-alive.
+        if expected_length is not None and written != expected_length:
+            self.close_connection = True
+        if not self.close_connection and (body is None or not body.drain(KEEP_ALIVE_DRAIN_LIMIT)):
+            self.close_connection = True
+
+class PooledWSGIServer(BaseWSGIServer):
+    # Accepted connections are queued for a fixed pool of daemon worker threads instead of each
+    # getting a thread of its own. A full queue stalls the accept loop (new clients wait in the
+    # listen backlog) and, if it stays full, new connections get a 503. Workers give up
+    # kept-alive connections while other connections are waiting.
+    multithread = True
+
+    def __init__(self, host, port, app, fd, workers=SERVER_WORKERS, max_pending=SERVER_MAX_PENDING,
+                 keep_alive_timeout=SERVER_KEEP_ALIVE_TIMEOUT, header_timeout=SERVER_HEADER_TIMEOUT,
+                 request_timeout=SERVER_REQUEST_TIMEOUT, max_keep_alive_requests=SERVER_MAX_KEEP_ALIVE_REQUESTS):
+        self.keep_alive_timeout = keep_alive_timeout
+        self.header_timeout = header_timeout
+        self.request_timeout = request_timeout
+        self.max_keep_alive_requests = max(1, max_keep_alive_requests)
+        self.shutting_down = False
+        self.rejected_connections = 0
+        self._connections = queue.Queue(maxsize=max(1, max_pending))
+        self._busy_lock = threading.Lock()
+        self._busy_workers = 0
+        self._stop_event = threading.Event()
+        # werkzeug calls server_close() on its placeholder socket during __init__ when given an fd
+        super().__init__(host, port, app, handler=KeepAliveRequestHandler, fd=fd)
+        self.shutting_down = False
+        self._stop_event.clear()
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"EQS-http-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        # Runs on the accept loop: while it waits for room in the queue, further clients wait in
+        # the listen backlog. Only a queue that stays full gets connections refused.
+        try:
+            self._connections.put((request, client_address), timeout=SERVER_QUEUE_WAIT)
+        except queue.Full:
+            self.rejected_connections += 1
+            try:
+                request.sendall(_SERVER_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def is_saturated(self):
+        return not self._connections.empty()
+
+    def stats(self):
+        return {'workers': len(self._workers), 'busy': self._busy_workers,
+                'queued': self._connections.qsize(), 'rejected': self.rejected_connections}
+
+    def _worker_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                request, client_address = self._connections.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._busy_lock:
+                self._busy_workers += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._busy_lock:
+                    self._busy_workers -= 1
+
+    def server_close(self):
+        # Stops accepting and drops connections still queued; requests in progress run to
+        # completion (their connections are not kept alive) on the daemon workers
+        self.shutting_down = True
+        super().server_close()
+        self._stop_event.set()
+        while True:
+            try:
+                request, _ = self._connections.get_nowait()
+            except queue.Empty:
+                break
+            self.shutdown_request(request)
+
+def _bind_listener(host, port):
+    # Binding here (rather than inside werkzeug, which calls sys.exit() when the port is taken)
+    # turns a busy port into an OSError the caller can report
+    family = select_address_family(host, port)
+    return socket.create_server((host, port), family=family, backlog=SERVER_LISTEN_BACKLOG)
+
+def _make_pool_server(host, port, app, fd, **options):
+    return PooledWSGIServer(host, port, app, fd, **options)
+
+def _make_threaded_server(host, port, app, fd, **options):
+    # werkzeug's server has a thread per connection and no keep-alive, so none of the pool's
+    # options mean anything to it
+    if options:
+        raise ValueError(f"The 'threaded' backend takes no options (got {', '.join(sorted(options))}).")
+    return make_server(host, port, app, threaded=True, fd=fd)
+
+SERVER_BACKENDS = {
+    'pool': _make_pool_server,
+    'threaded': _make_threaded_server,
+}
+
+class ServerThread(threading.Thread):
+    def __init__(self, app, host='0.0.0.0', port=8080, backend=None, **options):
+        # options (workers, max_pending, keep_alive_timeout, ...) are passed to the backend
+        super().__init__(daemon=True, name="EQS-server")
+        self.backend = backend or SERVER_BACKEND
+        if self.backend not in SERVER_BACKENDS:
+            raise ValueError(f"Unknown server backend '{self.backend}'. Use one of: {', '.join(SERVER_BACKENDS)}.")
+        with _bind_listener(host, port) as listener:
+            # werkzeug duplicates the descriptor, so the original can be closed right away
+            self.srv = SERVER_BACKENDS[self.backend](host, port, app, listener.fileno(), **options)
+        self.host = host
+        self.port = self.srv.port # The actual port when 0 was requested
+        self.app_context = app.app_context()
+
+    def run(self):
+        with self.app_context:
+            logger.info(f"HTTP server ({self.backend}) starting on http://{self.host}:{self.port}")
+            server_metrics.server = self.srv
+            self.srv.serve_forever()
+
+    def shutdown(self):
+        logger.debug("Shutting down the HTTP server...")
+        if server_metrics.server is self.srv:
+            server_metrics.server = None
+        self.srv.shutdown()
+
+class FolderScanThread(threading.Thread):
+    # Walks a folder tree with os.scandir off the GUI thread and reports the files it finds
+    # in batches, so huge or slow (network) folders never block the UI.
+    BATCH_SIZE = 1000
+    BATCH_INTERVAL = 0.25 # Seconds; small batches still show up promptly on slow shares
+
+    def __init__(self, root, on_batch, on_progress, on_finished):
+        super().__init__(daemon=True)
+        self.root = root
+        self.on_batch = on_batch # list of (name, size_bytes, path, rel_path, identity)
+        self.on_progress = on_progress # (file_count, total_bytes)
+        self.on_finished = on_finished # (file_count, cancelled, error_count)
+        self.file_count = 0
+        self.total_bytes = 0
+        self.error_count = 0
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        root_name = os.path.basename(os.path.normpath(self.root)) or self.root
+        pending_dirs = collections.deque([(self.root, root_name)])
+        batch = []
+        last_flush = time.monotonic()
+        try:
+            while pending_dirs and not self._cancel_event.is_set():
+                dir_path, rel_dir = pending_dirs.popleft()
+                try:
+                    with os.scandir(dir_path) as it:
+                        for entry in it:
+                            if self._cancel_event.is_set():
+                                break
+                            if _is_eqs_temp_name(entry.name):
+                                continue
+                            try:
+                                # Symlinked folders are not followed, so link cycles can't trap the scan
+                                if entry.is_dir(follow_symlinks=False):
+                                    pending_dirs.append((entry.path, f"{rel_dir}/{entry.name}"))
+                                elif entry.is_file():
+                                    # DirEntry caches its stat result (free on Windows, one call elsewhere)
+                                    st = entry.stat()
+                                    size = st.st_size
+                                    batch.append((entry.name, size, entry.path, f"{rel_dir}/{entry.name}", file_identity(st)))
+                                    self.file_count += 1
+                                    self.total_bytes += size
+                            except OSError:
+                                self.error_count += 1
+                            if len(batch) >= self.BATCH_SIZE or (batch and time.monotonic() - last_flush >= self.BATCH_INTERVAL):
+                                self._flush(batch)
+                                batch = []
+                                last_flush = time.monotonic()
+                except OSError: # e.g. permission denied on a sub-folder
+                    self.error_count += 1
+            if batch:
+                self._flush(batch)
+        finally:
+            self.on_finished(self.file_count, self._cancel_event.is_set(), self.error_count)
+
+    def _flush(self, batch):
+        self.on_batch(batch)
+        self.on_progress(self.file_count, self.total_bytes)
+
+# --- Folder watching ---
+# Keeps the registry in step with a shared folder after it was added: files created in it are
+# shared, deleted ones dropped, and changed ones updated, each from its own event instead of a
+# new scan. Uses inotify on Linux; elsewhere (or when the inotify watch limit is reached) the
+# folder is re-listed every WATCH_POLL_INTERVAL seconds and compared with the previous listing.
+WATCH_DEBOUNCE = 0.5 # Seconds; events for a file being written are coalesced into one stat per interval
+WATCH_POLL_INTERVAL = 5.0 # Seconds between listings in polling mode
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                  | _IN_ONLYDIR | _IN_DONT_FOLLOW)
+_INOTIFY_EVENT = struct.Struct('iIII') # wd, mask, cookie, len; followed by len bytes of name
+_libc = None
+
+def _is_eqs_temp_name(name):
+    # Staged uploads and half-saved files, e.g. when the receiving folder is inside a shared one
+    return name == UPLOAD_STAGING_DIRNAME or name.startswith('.eqs-')
+
+def _inotify_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return _libc
+
+class FolderWatcher(threading.Thread):
+    def __init__(self, root, on_change=None):
+        super().__init__(daemon=True, name="EQS-watch")
+        self.root = os.path.abspath(root)
+        self.root_name = os.path.basename(os.path.normpath(root)) or root # As FolderScanThread names it
+        self.on_change = on_change # (added_items, removed_items, updated_items), from this thread
+        self._seen = {} # file path -> (size, mtime_ns) when the watcher last looked at it
+        self._started_ns = time.time_ns() # Files not modified since are as the folder scan found them
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        if sys.platform.startswith('linux'):
+            try:
+                self._watch_inotify()
+                return
+            except OSError as e:
+                logger.info(f"Watching '{self.root}' by polling every {WATCH_POLL_INTERVAL:g} s ({e}).")
+        self._watch_polling()
+
+    def _rel_path(self, path):
+        return f"{self.root_name}/{os.path.relpath(path, self.root).replace(os.sep, '/')}"
+
+    def _walk(self, top, with_files=True, on_dir=None):
+        # Returns {file path: (size, mtime_ns)} under top; on_dir(path) is called for every folder
+        files = {}
+        pending_dirs = [top]
+        while pending_dirs and not self._stop_event.is_set():
+            dir_path = pending_dirs.pop()
+            if on_dir is not None:
+                on_dir(dir_path)
+            try:
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        if _is_eqs_temp_name(entry.name):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending_dirs.append(entry.path)
+                            elif with_files and entry.is_file():
+                                st = entry.stat()
+                                files[entry.path] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+        return files
+
+    def _apply(self, dirty, removed_dirs=()):
+        # dirty: {path: 'created' | 'changed' | 'removed'}. Every path is stat'ed once; a file that
+        # was never shared (e.g. removed from the list by the user) is only added if it is new.
+        # Events that leave size and mtime as they were last seen change nothing: every registry
+        # update invalidates the page caches and has the file hashed again.
+        new_entries = []
+        updates = []
+        gone = []
+        for path, kind in dirty.items():
+            item = shared_registry.get_by_path(path)
+            try:
+                st = os.stat(path)
+                is_file = stat.S_ISREG(st.st_mode)
+            except OSError:
+                is_file = False
+            if not is_file:
+                self._seen.pop(path, None)
+                if item is not None:
+                    gone.append(item['uid'])
+                continue
+            state = (st.st_size, st.st_mtime_ns)
+            previous = self._seen.get(path)
+            if previous is None and st.st_mtime_ns < self._started_ns:
+                previous = (item['size_bytes'], st.st_mtime_ns) if item is not None else None
+            self._seen[path] = state
+            if item is None:
+                if kind == 'created':
+                    new_entries.append((os.path.basename(path), st.st_size, path, self._rel_path(path), file_identity(st)))
+            elif state != previous or item['size_bytes'] != st.st_size:
+                updates.append((item['uid'], st.st_size, file_identity(st)))
+        if removed_dirs:
+            prefixes = tuple(os.path.join(os.path.abspath(path), '') for path in removed_dirs)
+            gone.extend(item['uid'] for item in shared_registry.snapshot()[1]
+                        if os.path.abspath(item['path']).startswith(prefixes))
+            for path in [path for path in self._seen if path.startswith(prefixes)]:
+                del self._seen[path]
+        removed = shared_registry.remove_many(gone)
+        added = shared_registry.add_many(new_entries)
+        updated = shared_registry.update_many(updates)
+        if added or removed or updated:
+            logger.debug(f"'{self.root_name}' changed: {len(added)} added, {len(removed)} removed, {len(updated)} updated.")
+            if self.on_change is not None:
+                self.on_change(added, removed, updated)
+
+    def _shared_state(self):
+        # {path: size} of the registry's files under the root, for comparing with a listing
+        prefix = os.path.join(self.root, '')
+        return {os.path.abspath(item['path']): item['size_bytes'] for item in shared_registry.snapshot()[1]
+                if os.path.abspath(item['path']).startswith(prefix)}
+
+    def _diff(self, previous, current):
+        dirty = {path: 'removed' for path in previous.keys() - current.keys()}
+        for path, state in current.items():
+            old = previous.get(path)
+            if old is None:
+                dirty[path] = 'created'
+            elif old != state:
+                dirty[path] = 'changed'
+        return dirty
+
+    def _watch_polling(self):
+        previous = self._walk(self.root)
+        while not self._stop_event.wait(WATCH_POLL_INTERVAL):
+            current = self._walk(self.root)
+            if self._stop_event.is_set():
+                break
+            if not os.path.isdir(self.root):
+                self._apply({}, removed_dirs=[self.root])
+                break
+            self._apply(self._diff(previous, current))
+            previous = current
+
+    def _watch_inotify(self):
+        libc = _inotify_libc()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        watches = {} # wd -> folder path
+        paths = {} # folder path -> wd
+
+        def add_watch(dir_path):
+            wd = libc.inotify_add_watch(fd, os.fsencode(dir_path), _IN_WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+                return # Vanished or unreadable folder
+            watches[wd] = dir_path
+            paths[dir_path] = wd
+
+        def forget_dirs(dir_path):
+            prefix = os.path.join(dir_path, '')
+            for path in [path for path in paths if path == dir_path or path.startswith(prefix)]:
+                wd = paths.pop(path)
+                watches.pop(wd, None)
+                libc.inotify_rm_watch(fd, wd)
+
+        try:
+            self._walk(self.root, with_files=False, on_dir=add_watch)
+            dirty = {}
+            removed_dirs = []
+            last_apply = time.monotonic()
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], WATCH_DEBOUNCE)
+                overflow = False
+                if readable:
+                    try:
+                        data = os.read(fd, 256 * 1024)
+                    except BlockingIOError:
+                        data = b''
+                    offset = 0
+                    while offset + _INOTIFY_EVENT.size <= len(data):
+                        wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                        name = os.fsdecode(data[offset + _INOTIFY_EVENT.size:offset + _INOTIFY_EVENT.size + length].rstrip(b'\0'))
+                        offset += _INOTIFY_EVENT.size + length
+                        if mask & _IN_Q_OVERFLOW:
+                            overflow = True
+                            continue
+                        dir_path = watches.get(wd)
+                        if dir_path is None or _is_eqs_temp_name(name):
+                            continue
+                        if mask & _IN_IGNORED: # Folder deleted (or moved away and forgotten)
+                            watches.pop(wd, None)
+                            paths.pop(dir_path, None)
+                            continue
+                        path = os.path.join(dir_path, name)
+                        if mask & _IN_ISDIR:
+                            if mask & (_IN_CREATE | _IN_MOVED_TO):
+                                # Only the new sub-tree is listed
+                                for file_path in self._walk(path, on_dir=add_watch):
+                                    dirty[file_path] = 'created'
+                            elif mask & (_IN_MOVED_FROM | _IN_DELETE):
+                                forget_dirs(path)
+                                removed_dirs.append(path)
+                        elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                            dirty[path] = 'created'
+                        elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                            dirty[path] = 'removed'
+                        else:
+                            dirty.setdefault(path, 'changed')
+                if overflow: # Events were lost: compare a full listing with the registry once
+                    logger.warning(f"Too many changes in '{self.root}' at once; re-reading the folder.")
+                    self._apply(self._diff(self._shared_state(), {path: state[0] for path, state in self._walk(self.root).items()}))
+                    dirty = {}
+                    removed_dirs = []
+                if self.root not in paths: # The shared folder itself is gone
+                    self._apply({}, removed_dirs=[self.root])
+                    break
+                if (dirty or removed_dirs) and time.monotonic() - last_apply >= WATCH_DEBOUNCE:
+                    self._apply(dirty, removed_dirs)
+                    dirty = {}
+                    removed_dirs = []
+                    last_apply = time.monotonic()
+        finally:
+            os.close(fd)
+
+# --- Headless mode ---
+class HeadlessReceiver:
+    # Decides uploads without a GUI: files matching the auto-accept policy are saved into the
+    # receiving folder right away, the rest wait for a decision through /api/pending.
+    def __init__(self, receiving_folder, policy, api_token=None):
+        self.receiving_folder = receiving_folder
+        self.policy = policy
+        self.api_token = api_token
+        self.server_thread = None
+        self.finalize_pool = concurrent.futures.ThreadPoolExecutor(max_workers=FINALIZE_WORKERS, thread_name_prefix="EQS-finalize")
+        self._lock = threading.Lock()
+        self._pending = {} # pending_id -> listing entry, for uploads awaiting a decision
+
+    def accepting_uploads(self):
+        return self.server_thread is not None and self.server_thread.is_alive()
+
+    def notify_incoming(self, batch_id, entries):
+        total_size = sum(size for _, _, size, _ in entries)
+        sender_ips = sorted({sender_ip for _, _, _, sender_ip in entries})
+        logger.info(f"Incoming {len(entries)} file(s) ({format_size(total_size)}) from {', '.join(sender_ips)}.")
+        for pending_id, relative_path, size, sender_ip in entries:
+            with self._lock:
+                self._pending[pending_id] = {'id': pending_id, 'name': relative_path, 'size_bytes': size,
+                                             'sender_ip': sender_ip, 'batch_id': batch_id}
+            if self.policy.matches(relative_path, size, sender_ip):
+                self.accept(pending_id)
+            else:
+                logger.info(f"'{relative_path}' is waiting for a decision (ID {pending_id}).")
+
+    def pending_files(self):
+        with self._lock:
+            return list(self._pending.values())
+
+    def accept(self, pending_id):
+        with self._lock:
+            if self._pending.pop(pending_id, None) is None:
+                return False
+        pending_info = incoming_files_buffer.get(pending_id)
+        if pending_info is None:
+            return False
+        final_save_path = os.path.join(self.receiving_folder, *pending_info['relative_path'].split('/'))
+        self.finalize_pool.submit(self._save, pending_id, final_save_path)
+        return True
+
+    def reject(self, pending_id):
+        with self._lock:
+            entry = self._pending.pop(pending_id, None)
+        if entry is None:
+            return False
+        try:
+            discard_incoming_file(pending_id)
+        except OSError as e:
+            logger.warning(f"Error deleting rejected upload {pending_id}: {e}")
+        logger.info(f"Rejected '{entry['name']}'.")
+        return True
+
+    def _save(self, pending_id, final_save_path):
+        try:
+            saved_path = save_incoming_file(pending_id, final_save_path, unique_name=True)
+            logger.info(f"Saved '{saved_path}'.")
+        except Exception as e:
+            logger.error(f"Failed to save upload {pending_id}: {e}")
+
+def run_headless(share_paths, receiving_folder, host='0.0.0.0', port=8080, backend=None,
+                 server_options=None, policy=None, api_token=None):
+    # Serves share_paths (files or folders) until SIGINT/SIGTERM. Returns the exit status.
+    global upload_receiver
+    logger.removeHandler(log_buffer) # Nobody drains it without a window
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(console)
+
+    os.makedirs(receiving_folder, exist_ok=True)
+    receiver = HeadlessReceiver(receiving_folder, policy or AutoAcceptPolicy(), api_token)
+    set_upload_staging_dir(receiving_folder)
+    try:
+        receiver.server_thread = ServerThread(flask_app, host=host, port=port, backend=backend, **(server_options or {}))
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not start the server: {e}")
+        remove_upload_staging_dirs()
+        return 1
+    upload_receiver = receiver
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+    receiver.server_thread.start()
+    if CONTENT_HASHING:
+        content_hasher.start()
+
+    scans = []
+    watchers = []
+    for path in share_paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            st = os.stat(path)
+            shared_registry.add_many([(os.path.basename(path), st.st_size, path, None, file_identity(st))])
+        elif os.path.isdir(path):
+            def on_finished(file_count, cancelled, error_count, path=path):
+                logger.info(f"Sharing {file_count} file(s) from '{path}'" + (f" ({error_count} unreadable)" if error_count else "") + ".")
+            scan = FolderScanThread(path, shared_registry.add_many, lambda *_: None, on_finished)
+            watcher = FolderWatcher(path) # Started with the scan, so nothing created meanwhile is missed
+            watcher.start()
+            scan.start()
+            scans.append(scan)
+            watchers.append(watcher)
+        else:
+            logger.warning(f"Not sharing '{path}': no such file or folder.")
+    logger.info(f"Receiving into '{receiving_folder}'. Auto-accept {'enabled' if receiver.policy.enabled else 'disabled'}.")
+    if api_token:
+        logger.info("Pending uploads can be listed and decided through /api/pending with the API token.")
+
+    try:
+        while not stop_event.is_set() and receiver.server_thread.is_alive():
+            stop_event.wait(1)
+    finally:
+        logger.info("Shutting down...")
+        for scan in scans:
+            scan.cancel()
+        for watcher in watchers:
+            watcher.stop()
+        content_hasher.stop()
+        receiver.server_thread.shutdown()
+        receiver.server_thread.join(timeout=5)
+        upload_receiver = None
+        receiver.finalize_pool.shutdown(wait=True) # Saves in progress are finished, not cut off
+        undecided = len(receiver.pending_files())
+        if undecided:
+            logger.warning(f"Discarding {undecided} upload(s) that were never accepted.")
+        remove_upload_staging_dirs()
+    return 0
@@ -0,0 +1,69 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The checksum and compression caches live under EQS_CACHE_DIR, which is read at import
+_CACHE_DIR = tempfile.mkdtemp(prefix="EQS_test_cache_")
+os.environ["EQS_CACHE_DIR"] = _CACHE_DIR
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import eqs_server
+
+
+class RecordingReceiver:
+    # Stands in for the window (or HeadlessReceiver): accepts uploads and records what arrived
+    def __init__(self):
+        self.incoming = [] # (batch_id, [(pending_id, relative_path, size, sender_ip), ...])
+
+    def accepting_uploads(self):
+        return True
+
+    def notify_incoming(self, batch_id, entries):
+        self.incoming.append((batch_id, list(entries)))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    eqs_server.remove_upload_staging_dirs()
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    eqs_server.shared_registry.clear()
+    yield eqs_server.shared_registry
+    eqs_server.shared_registry.clear()
+
+
+@pytest.fixture
+def client():
+    return eqs_server.flask_app.test_client()
+
+
+@pytest.fixture
+def share(tmp_path):
+    # share({"rel/path.ext": b"content", ...}) writes the files under tmp_path/<root> and shares
+    # them like a folder scan would; returns {rel_path: item}
+    def share_files(files, root="Shared"):
+        entries = []
+        for rel_path, content in files.items():
+            path = tmp_path.joinpath(root, *rel_path.split("/"))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+            entries.append((path.name, len(content), str(path), f"{root}/{rel_path}", None))
+        items = eqs_server.shared_registry.add_many(entries)
+        return {item['rel_path'][len(root) + 1:]: item for item in items}
+    return share_files
+
+
+@pytest.fixture
+def receiver(tmp_path, monkeypatch):
+    receiver = RecordingReceiver()
+    staging_dir = tmp_path / "staging"
+    staging_dir.mkdir()
+    monkeypatch.setattr(eqs_server, "upload_receiver", receiver)
+    monkeypatch.setattr(eqs_server, "UPLOAD_TEMP_DIR", str(staging_dir))
+    yield receiver
+    eqs_server.resumable_uploads.clear()
+    eqs_server.incoming_files_buffer.clear()
@@ -0,0 +1,115 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import eqs_server
+
+FILES = {
+    "Photos/a.jpg": b"jpeg" * 1000,
+    "Photos/2024/b.jpg": b"more jpeg" * 500,
+    "Docs/readme.txt": b"hello\n" * 100,
+    "empty.dat": b"",
+}
+
+
+@pytest.fixture
+def items(share):
+    return share(FILES)
+
+
+def _zip_contents(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        return {info.filename: (archive.read(info), info.compress_type) for info in archive.infolist()}
+
+
+def _tar_contents(data):
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+
+def test_zip_of_everything(client, items):
+    response = client.get('/archive?all=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert 'EQS-shared-files.zip' in response.headers['Content-Disposition']
+    contents = _zip_contents(response.data)
+    assert {name: data for name, (data, _) in contents.items()} == {f"Shared/{path}": data for path, data in FILES.items()}
+    assert {compression for _, compression in contents.values()} == {zipfile.ZIP_STORED}
+
+
+def test_zip_can_be_deflated(client, items):
+    contents = _zip_contents(client.get('/archive?all=1&compress=1').data)
+    assert contents["Shared/Docs/readme.txt"] == (FILES["Docs/readme.txt"], zipfile.ZIP_DEFLATED)
+
+
+def test_tar_of_a_folder_has_exact_length(client, items):
+    response = client.get('/archive', query_string={'folder': 'Shared/Photos', 'format': 'tar'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-tar'
+    assert response.headers['Content-Length'] == str(len(response.data))
+    assert _tar_contents(response.data) == {
+        "Shared/Photos/a.jpg": FILES["Photos/a.jpg"],
+        "Shared/Photos/2024/b.jpg": FILES["Photos/2024/b.jpg"],
+    }
+
+
+def test_selection_by_id_can_be_posted(client, items):
+    ids = [items["Docs/readme.txt"]['uid'], items["empty.dat"]['uid']]
+    response = client.post('/archive', data={'id': ids, 'format': 'zip'})
+    assert 'EQS-selection.zip' in response.headers['Content-Disposition']
+    assert set(_zip_contents(response.data)) == {"Shared/Docs/readme.txt", "Shared/empty.dat"}
+    # Comma-separated ids in one parameter work the same
+    response = client.get('/archive', query_string={'id': ','.join(ids)})
+    assert set(_zip_contents(response.data)) == {"Shared/Docs/readme.txt", "Shared/empty.dat"}
+
+
+def test_duplicate_paths_get_numbered(client, tmp_path):
+    # Two shared folders with the same name put their files under the same relative path
+    entries = []
+    for parent, content in (("one", b"one"), ("two", b"two")):
+        path = tmp_path / parent / "same.txt"
+        path.parent.mkdir()
+        path.write_bytes(content)
+        entries.append(("same.txt", len(content), str(path), "Same/x/same.txt", None))
+    ids = ','.join(item['uid'] for item in eqs_server.shared_registry.add_many(entries))
+    contents = _zip_contents(client.get('/archive', query_string={'id': ids}).data)
+    assert {name: data for name, (data, _) in contents.items()} == {
+        "Same/x/same.txt": b"one", "Same/x/same (2).txt": b"two",
+    }
+
+
+def test_vanished_file_keeps_the_archive_valid(client, items):
+    os.remove(items["Photos/a.jpg"]['path'])
+    assert "Shared/Photos/a.jpg" not in _zip_contents(client.get('/archive?all=1').data)
+    response = client.get('/archive?all=1&format=tar')
+    assert response.headers['Content-Length'] == str(len(response.data))
+    assert "Shared/Photos/a.jpg" not in _tar_contents(response.data)
+
+
+def test_shrunk_file_is_padded_in_tar(client, items, monkeypatch):
+    # The file shrinks after its header (and the Content-Length) promised the old size
+    build_members = eqs_server._tar_members
+    def shrinking_members(entries):
+        members = build_members(entries)
+        with open(items["Docs/readme.txt"]['path'], 'wb') as f:
+            f.write(b"short")
+        return members
+    monkeypatch.setattr(eqs_server, '_tar_members', shrinking_members)
+    response = client.get('/archive?all=1&format=tar')
+    assert response.headers['Content-Length'] == str(len(response.data))
+    readme = _tar_contents(response.data)["Shared/Docs/readme.txt"]
+    assert readme == b"short" + bytes(len(FILES["Docs/readme.txt"]) - 5)
+
+
+@pytest.mark.parametrize("query, status", [
+    ('format=rar&all=1', 400),
+    ('folder=Nowhere', 404),
+    ('id=0123456789abcdef', 404),
+    ('', 404),
+])
+def test_bad_requests(client, items, query, status):
+    assert client.get(f'/archive?{query}').status_code == status
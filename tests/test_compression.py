@@ -0,0 +1,103 @@
+import gzip
+import os
+
+import pytest
+
+import eqs_server
+
+TEXT = b"".join(b"%d,some,comma,separated,values\n" % i for i in range(20000))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "compressed"
+    monkeypatch.setattr(eqs_server, 'COMPRESS_CACHE_DIR', str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture
+def item(share):
+    return share({"data.csv": TEXT})["data.csv"]
+
+
+def _get(client, item, **headers):
+    headers.setdefault('Accept-Encoding', 'gzip')
+    return client.get(f"/download/{item['uid']}", headers=headers)
+
+
+def _cached_files(cache_dir):
+    return sorted(os.listdir(cache_dir)) if cache_dir.exists() else []
+
+
+def test_text_is_sent_gzipped_and_cached(client, item, cache_dir):
+    response = _get(client, item)
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'].endswith('-gz"')
+    assert gzip.decompress(response.data) == TEXT
+    cached = _cached_files(cache_dir)
+    assert len(cached) == 1 and cached[0].endswith('.gz')
+
+    # The next request is served from the cached copy, with a length and byte ranges
+    again = _get(client, item)
+    assert again.data == response.data
+    assert again.headers['Content-Length'] == str(len(response.data))
+    partial = _get(client, item, Range='bytes=0-9')
+    assert partial.status_code == 206
+    assert partial.data == response.data[:10]
+
+
+def test_plain_file_without_accept_encoding(client, item, cache_dir):
+    response = client.get(f"/download/{item['uid']}")
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == TEXT
+    assert _cached_files(cache_dir) == []
+
+
+def test_small_and_binary_files_are_not_compressed(client, share):
+    items = share({"tiny.txt": b"hi", "blob.bin": TEXT})
+    for item in items.values():
+        assert 'Content-Encoding' not in _get(client, item).headers
+
+
+def test_range_validated_against_plain_file_is_sent_plain(client, item):
+    etag = client.get(f"/download/{item['uid']}").headers['ETag']
+    response = _get(client, item, Range='bytes=0-9', **{'If-Range': etag})
+    assert response.status_code == 206
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == TEXT[:10]
+
+
+def test_failing_cache_write_still_sends_a_complete_stream(client, item, cache_dir, monkeypatch):
+    def failing_write(temp, data, file_path):
+        temp.close()
+        return None
+    monkeypatch.setattr(eqs_server, '_write_cache_part', failing_write)
+    assert gzip.decompress(_get(client, item).data) == TEXT
+    assert _cached_files(cache_dir) == [] # Neither a variant nor a partial file is left behind
+
+
+class _FailingFile:
+    # Reads the first chunk, then fails like a disk error would
+    def __init__(self, file_obj):
+        self._file = file_obj
+        self._reads = 0
+
+    def read(self, size=-1):
+        self._reads += 1
+        if self._reads > 1:
+            raise OSError("read error")
+        return self._file.read(size)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def test_read_error_does_not_end_the_stream_cleanly(client, item, cache_dir, monkeypatch):
+    monkeypatch.setattr(eqs_server, 'DOWNLOAD_CHUNK_SIZE', 4096)
+    monkeypatch.setattr(eqs_server, 'open', lambda *args: _FailingFile(open(*args)), raising=False)
+    response = _get(client, item)
+    with pytest.raises(OSError):
+        response.get_data()
+    assert _cached_files(cache_dir) == []
@@ -0,0 +1,125 @@
+import os
+import re
+
+import pytest
+from werkzeug.http import http_date, parse_date
+
+CONTENT = bytes(range(256)) * 4 # 1 KiB that shows where every byte came from
+
+
+@pytest.fixture
+def item(share):
+    return share({"data.bin": CONTENT})["data.bin"]
+
+
+def _get(client, item, **headers):
+    return client.get(f"/download/{item['uid']}", headers=headers)
+
+
+def test_full_download_has_validators(client, item):
+    response = _get(client, item)
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['Content-Length'] == str(len(CONTENT))
+    assert re.fullmatch(r'"[0-9a-f-]+"', response.headers['ETag'])
+    assert parse_date(response.headers['Last-Modified']) is not None
+    assert 'data.bin' in response.headers['Content-Disposition']
+
+
+def test_unknown_file_is_404(client, item):
+    assert client.get('/download/0123456789abcdef').status_code == 404
+
+
+def test_revalidation_is_304(client, item):
+    etag = _get(client, item).headers['ETag']
+    response = _get(client, item, **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_changed_file_gets_a_new_etag(client, item):
+    etag = _get(client, item).headers['ETag']
+    with open(item['path'], 'r+b') as f:
+        f.write(b'changed')
+    st = os.stat(item['path'])
+    os.utime(item['path'], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert _get(client, item, **{'If-None-Match': etag}).status_code == 200
+
+
+@pytest.mark.parametrize("range_header, start, stop", [
+    ('bytes=10-19', 10, 20),
+    ('bytes=1000-', 1000, 1024),
+    ('bytes=-5', 1019, 1024),
+    ('bytes=1000-5000', 1000, 1024), # Clamped to the end of the file
+    ('bytes=0-9,10-14', 0, 15), # Adjacent ranges are merged
+])
+def test_single_range(client, item, range_header, start, stop):
+    response = _get(client, item, Range=range_header)
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes {start}-{stop - 1}/{len(CONTENT)}"
+    assert response.headers['Content-Length'] == str(stop - start)
+    assert response.data == CONTENT[start:stop]
+
+
+def test_multiple_ranges_are_multipart(client, item):
+    response = _get(client, item, Range='bytes=0-3,100-103')
+    assert response.status_code == 206
+    content_type = response.headers['Content-Type']
+    assert content_type.startswith('multipart/byteranges; boundary=')
+    boundary = content_type.split('boundary=')[1].encode()
+    assert response.headers['Content-Length'] == str(len(response.data))
+    parts = response.data.split(b'--' + boundary)
+    assert parts[0] == b'' and parts[-1] == b'--\r\n'
+    bodies = []
+    for part in parts[1:-1]:
+        head, body = part.split(b'\r\n\r\n', 1)
+        assert b'Content-Range: bytes ' in head
+        bodies.append(body[:-2]) # Each part ends with CRLF before the next boundary
+    assert bodies == [CONTENT[0:4], CONTENT[100:104]]
+
+
+def test_unsatisfiable_range_is_416(client, item):
+    response = _get(client, item, Range='bytes=5000-6000')
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("range_header", ['items=0-5', 'bytes=abc', 'bytes=' + ','.join(f"{i * 10}-{i * 10}" for i in range(65))])
+def test_ignored_range_sends_whole_file(client, item, range_header):
+    response = _get(client, item, Range=range_header)
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_range_with_current_etag_sends_range(client, item):
+    etag = _get(client, item).headers['ETag']
+    response = _get(client, item, Range='bytes=0-9', **{'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == CONTENT[:10]
+
+
+def test_if_range_with_current_date_sends_range(client, item):
+    last_modified = _get(client, item).headers['Last-Modified']
+    response = _get(client, item, Range='bytes=0-9', **{'If-Range': last_modified})
+    assert response.status_code == 206
+
+
+@pytest.mark.parametrize("if_range", ['"stale-etag"', 'W/"weak"', http_date(0)])
+def test_if_range_mismatch_sends_whole_file(client, item, if_range):
+    response = _get(client, item, Range='bytes=0-9', **{'If-Range': if_range})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_match_mismatch_is_412(client, item):
+    assert _get(client, item, **{'If-Match': '"other"'}).status_code == 412
+    etag = _get(client, item).headers['ETag']
+    assert _get(client, item, **{'If-Match': etag}).status_code == 200
+
+
+def test_head_sends_headers_only(client, item):
+    response = client.head(f"/download/{item['uid']}", headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.headers['Content-Length'] == '10'
+    assert response.data == b''
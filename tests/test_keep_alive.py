@@ -0,0 +1,80 @@
+import http.client
+import os
+import socket
+import time
+
+import pytest
+
+import eqs_server
+
+CONTENT = os.urandom(3 * 1024 * 1024) # Larger than a socket buffer, so sendfile loops
+
+
+@pytest.fixture
+def server():
+    # The pool backend on an ephemeral loopback port, with short timeouts to keep the tests quick
+    thread = eqs_server.ServerThread(eqs_server.flask_app, host='127.0.0.1', port=0, backend='pool',
+                                     workers=2, header_timeout=0.5, max_keep_alive_requests=8)
+    thread.start()
+    yield thread
+    thread.shutdown()
+
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=10)
+    yield connection
+    connection.close()
+
+
+def _get(connection, path, **headers):
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_connection_is_reused_after_sendfile_downloads(connection, share):
+    items = share({"big.bin": CONTENT, "log.txt": b"a line of text\n" * 10000})
+    url = f"/download/{items['big.bin']['uid']}"
+    response, body = _get(connection, url)
+    assert response.status == 200 and body == CONTENT
+    assert response.getheader('Connection') == 'keep-alive'
+    local_address = connection.sock.getsockname()
+
+    response, body = _get(connection, url, Range='bytes=0-9,1000-1999')
+    assert response.status == 206
+    for _ in range(2): # Compressed on the fly, then sent from the compressed copy on disk
+        response, body = _get(connection, f"/download/{items['log.txt']['uid']}", **{'Accept-Encoding': 'gzip'})
+        assert response.getheader('Content-Encoding') == 'gzip'
+    response, body = _get(connection, '/api/files')
+    assert response.status == 200
+    assert connection.sock.getsockname() == local_address # No reconnect in between
+
+
+def test_last_request_announces_close(connection, share):
+    item = share({"small.bin": b"x" * 100})["small.bin"]
+    for _ in range(7):
+        assert _get(connection, f"/download/{item['uid']}")[0].getheader('Connection') == 'keep-alive'
+    response, _ = _get(connection, f"/download/{item['uid']}")
+    assert response.getheader('Connection') == 'close'
+
+
+def test_idle_new_connection_is_closed(server):
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as sock:
+        start = time.monotonic()
+        assert sock.recv(1) == b''
+        assert time.monotonic() - start < 3
+
+
+def test_partial_request_line_times_out(server):
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as sock:
+        sock.sendall(b"GET /api/files HTTP/1.1\r\nHost: x\r\n") # Headers never finished
+        start = time.monotonic()
+        while sock.recv(4096):
+            pass
+        assert time.monotonic() - start < 3
+
+
+def test_threaded_backend_rejects_pool_options():
+    with pytest.raises(ValueError):
+        eqs_server.ServerThread(eqs_server.flask_app, host='127.0.0.1', port=0, backend='threaded', workers=2)
@@ -0,0 +1,99 @@
+import base64
+import json
+
+import pytest
+
+
+def _names(response):
+    return [item['name'] for item in response.get_json()['items']]
+
+
+def _walk(client, **params):
+    # Follows next_cursor to the end; returns every page's item names in order
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, cursor=cursor) if cursor else params
+        response = client.get('/api/files', query_string=query)
+        assert response.status_code == 200
+        data = response.get_json()
+        pages.append([item['name'] for item in data['items']])
+        cursor = data['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def _cursor(*parts):
+    return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode().rstrip('=')
+
+
+@pytest.fixture
+def files(share):
+    # Sizes differ from the name order, so every sort gives a different sequence
+    share({f"file_{i:02d}.bin": b"x" * ((i * 7) % 25) for i in range(25)})
+    return sorted((f"file_{i:02d}.bin", (i * 7) % 25) for i in range(25))
+
+
+def test_first_page_reports_total_and_cursor(client, files):
+    data = client.get('/api/files?limit=10').get_json()
+    assert data['total'] == 25
+    assert len(data['items']) == 10
+    assert data['next_cursor']
+    item = data['items'][0]
+    assert item['download_url'] == f"/download/{item['id']}"
+
+
+@pytest.mark.parametrize("sort, order", [
+    ('added', 'asc'), ('added', 'desc'), ('name', 'asc'), ('name', 'desc'), ('size', 'asc'), ('size', 'desc'),
+])
+def test_pages_cover_every_file_once_in_order(client, files, sort, order):
+    pages = _walk(client, sort=sort, order=order, limit=7)
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    names = [name for page in pages for name in page]
+    single = _names(client.get('/api/files', query_string={'sort': sort, 'order': order, 'limit': 1000}))
+    assert names == single
+    assert sorted(names) == [name for name, _ in files]
+    if sort == 'size':
+        sizes = dict(files)
+        assert [sizes[name] for name in names] == sorted(sizes[name] for name in names)[::1 if order == 'asc' else -1]
+    elif sort == 'name':
+        assert names == sorted(names, reverse=order == 'desc')
+
+
+def test_cursor_stays_put_when_files_are_added(client, share, files):
+    first = client.get('/api/files?sort=name&limit=5').get_json()
+    share({"file_00a.bin": b"", "zzz.bin": b""}, root="More")
+    second = client.get('/api/files', query_string={'sort': 'name', 'limit': 5, 'cursor': first['next_cursor']})
+    # The new file sorts before the cursor and is not repeated; the rest continues after file_04
+    assert _names(second) == ["file_05.bin", "file_06.bin", "file_07.bin", "file_08.bin", "file_09.bin"]
+
+
+def test_limit_is_clamped(client, files):
+    assert len(_names(client.get('/api/files?limit=0'))) == 1
+    assert len(_names(client.get('/api/files?limit=100000'))) == 25
+
+
+@pytest.mark.parametrize("query", [
+    "sort=colour",
+    "order=sideways",
+    "limit=ten",
+    "cursor=not-base64!",
+    f"cursor={_cursor('added', 1)}",
+    f"sort=name&cursor={_cursor('added', 1, 'abc')}",
+    # Well-formed JSON whose key types don't fit the sort order
+    f"sort=name&cursor={_cursor('name', 1, 2)}",
+    f"sort=size&cursor={_cursor('size', 'big', 'abc')}",
+    f"cursor={_cursor('added', 1.5, 'abc')}",
+    f"cursor={_cursor('added', True, 'abc')}",
+    f"cursor={_cursor('added', 1, None)}",
+])
+def test_bad_parameters_are_rejected(client, files, query):
+    response = client.get(f'/api/files?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+
+def test_listing_cursor_is_rejected_by_search(client, files):
+    listing = client.get('/api/files?limit=1').get_json()
+    response = client.get('/api/search', query_string={'q': 'file', 'cursor': listing['next_cursor']})
+    assert response.status_code == 400
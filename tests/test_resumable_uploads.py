@@ -0,0 +1,123 @@
+import collections
+import os
+
+import pytest
+
+import eqs_server
+
+CONTENT = os.urandom(10_000)
+
+
+def _create(client, name="big.bin", size=len(CONTENT)):
+    return client.post('/api/uploads', json={'name': name, 'size': size})
+
+
+def _patch(client, upload_id, offset, data):
+    return client.patch(f'/api/uploads/{upload_id}', data=data, headers={'Upload-Offset': str(offset)})
+
+
+@pytest.fixture
+def upload(client, receiver):
+    response = _create(client)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_create_reports_empty_upload(client, receiver):
+    response = _create(client)
+    state = response.get_json()
+    assert response.headers['Location'] == f"/api/uploads/{state['id']}"
+    assert response.headers['Upload-Offset'] == '0'
+    assert response.headers['Upload-Length'] == str(len(CONTENT))
+    assert state['missing'] == [[0, len(CONTENT)]]
+    assert not state['complete']
+
+
+def test_out_of_order_chunks_assemble_the_file(client, receiver, upload):
+    upload_id = upload['id']
+    response = _patch(client, upload_id, 6000, CONTENT[6000:])
+    assert response.status_code == 200
+    assert response.headers['Upload-Offset'] == '0' # Nothing contiguous from the start yet
+    assert response.get_json()['missing'] == [[0, 6000]]
+
+    assert _patch(client, upload_id, 0, CONTENT[:3000]).status_code == 200
+    status = client.get(f'/api/uploads/{upload_id}').get_json()
+    assert status['offset'] == 3000
+    assert status['missing'] == [[3000, 6000]]
+
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.status_code == 409
+
+    assert _patch(client, upload_id, 3000, CONTENT[3000:6000]).get_json()['complete']
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.status_code == 202
+
+    (batch_id, [(pending_id, name, size, _)]), = receiver.incoming
+    assert (batch_id, name, size) == (None, 'big.bin', len(CONTENT))
+    with open(eqs_server.incoming_files_buffer[pending_id]['temp_path'], 'rb') as f:
+        assert f.read() == CONTENT
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+
+
+def test_resent_chunk_is_harmless(client, receiver, upload):
+    upload_id = upload['id']
+    _patch(client, upload_id, 0, CONTENT[:5000])
+    _patch(client, upload_id, 0, CONTENT[:5000])
+    assert _patch(client, upload_id, 5000, CONTENT[5000:]).get_json()['complete']
+
+
+@pytest.mark.parametrize("offset, length", [(-1, 10), (len(CONTENT) - 5, 10), (len(CONTENT) + 1, 0)])
+def test_chunk_outside_the_upload_is_rejected(client, receiver, upload, offset, length):
+    assert _patch(client, upload['id'], offset, b'x' * length).status_code == 400
+
+
+def test_chunk_needs_an_offset(client, receiver, upload):
+    assert client.patch(f"/api/uploads/{upload['id']}", data=b'x').status_code == 400
+    assert _patch(client, upload['id'], 'zero', b'x').status_code == 400
+
+
+def test_unknown_upload_is_404(client, receiver):
+    assert client.get('/api/uploads/nope').status_code == 404
+    assert _patch(client, 'nope', 0, b'x').status_code == 404
+    assert client.post('/api/uploads/nope/complete').status_code == 404
+    assert client.delete('/api/uploads/nope').status_code == 404
+
+
+def test_cancel_removes_the_temp_file(client, receiver, upload):
+    temp_path = eqs_server.resumable_uploads[upload['id']].temp_path
+    assert os.path.exists(temp_path)
+    assert client.delete(f"/api/uploads/{upload['id']}").status_code == 204
+    assert not os.path.exists(temp_path)
+    assert client.get(f"/api/uploads/{upload['id']}").status_code == 404
+
+
+@pytest.mark.parametrize("payload", [
+    {'name': '', 'size': 1},
+    {'name': '../..', 'size': 1},
+    {'name': 'a.bin'},
+    {'name': 'a.bin', 'size': -1},
+    {'name': 'a.bin', 'size': '10'},
+    {'name': 'a.bin', 'size': True},
+])
+def test_invalid_upload_is_rejected(client, receiver, payload):
+    assert client.post('/api/uploads', json=payload).status_code == 400
+
+
+def test_upload_over_the_size_limit_is_413(client, receiver):
+    assert _create(client, size=eqs_server.RESUMABLE_UPLOAD_MAX_SIZE + 1).status_code == 413
+
+
+def test_upload_that_doesnt_fit_on_disk_is_507(client, receiver, monkeypatch):
+    usage = collections.namedtuple('usage', 'total used free')
+    monkeypatch.setattr(eqs_server.shutil, 'disk_usage', lambda path: usage(20_000, 5_000, 15_000))
+    assert _create(client, size=10_000).status_code == 201
+    # Only 5 000 bytes are left once the first upload's sparse file is filled in
+    assert _create(client, size=6_000).status_code == 507
+    assert _create(client, size=5_000).status_code == 201
+
+
+def test_uploads_are_refused_while_receiving_is_off(client, receiver, upload, monkeypatch):
+    monkeypatch.setattr(eqs_server, 'upload_receiver', None)
+    assert _create(client).status_code == 503
+    assert _patch(client, upload['id'], 0, CONTENT[:10]).status_code == 503
+    assert client.post(f"/api/uploads/{upload['id']}/complete").status_code == 503